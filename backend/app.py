@@ -3,8 +3,9 @@ CodeFlow Backend - Flask API
 Provides endpoints for code explanation, generation, and execution.
 """
 
+import copy
 import json
-from flask import Flask, request, jsonify, redirect
+from flask import Flask, request, jsonify, redirect, Response, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 import subprocess
@@ -30,13 +31,39 @@ CORS(app, origins=_cors_origins)
 
 # --- Codebase Map (visualize flow) ---
 try:
-    from codebase_parser import build_codebase_map
-    from github_fetcher import fetch_repo_files
+    from codebase_graph import CodebaseGraph
+    from codebase_parser import build_codebase_map, build_codebase_graph, stream_codebase_graph, update_codebase_graph
+    from codebase_parser import USES_EDGE_BUDGET, USES_MODES
+    from repo_snapshots import iter_snapshot_files, repo_snapshot
+    from map_store import map_store
+    from map_queries import import_cycles, select_context, shortest_path, top_files, transitive
+    from map_views import expand_node, summarize_map
+    from map_wire import COMPACT_CONTENT_TYPE, compact_body
+    from upload_ingest import TAR_EXTENSIONS, iter_directory_files, iter_tar_files, iter_zip_files
 except ImportError:
     build_codebase_map = None
-    fetch_repo_files = None
-
-CODE_EXTENSIONS = {".py", ".js", ".jsx", ".ts", ".tsx", ".java", ".go", ".rb", ".rs", ".c", ".cpp", ".h"}
+    build_codebase_graph = None
+    stream_codebase_graph = None
+    update_codebase_graph = None
+    USES_EDGE_BUDGET = 0
+    USES_MODES = ()
+    repo_snapshot = None
+    iter_snapshot_files = None
+    map_store = None
+    expand_node = None
+    transitive = None
+    summarize_map = None
+    compact_body = None
+    iter_zip_files = None
+    iter_tar_files = None
+    iter_directory_files = None
+    TAR_EXTENSIONS = ()
+    COMPACT_CONTENT_TYPE = "application/vnd.codeflow.map+json"
+
+
+def _client_files(raw_files):
+    """Keep only path/content from client-supplied files. A client "sha" is never trusted as a parse cache key."""
+    return [{"path": f.get("path", ""), "content": f.get("content", "")} for f in raw_files if isinstance(f, dict)]
 
 
 def _is_anthropic_credit_error(err):
@@ -59,59 +86,63 @@ def codebase_map():
     """
     Build codebase map for visualization.
     Accepts:
-    - JSON: { "githubUrl": "https://github.com/owner/repo" }
+    - JSON: { "githubUrl": "https://github.com/owner/repo" } (optional "ref", "path", "include",
+      "exclude", "fetchMode", "followImports"; see github_fetcher)
     - JSON: { "files": [{ "path": "x/y.py", "content": "..." }] }
-    - multipart: file (zip of project)
+    - JSON: { "localPath": "/srv/repos/app" } (a directory under LOCAL_REPO_ROOTS on the server)
+    - multipart: file (zip, .tar.gz or .tar of project)
+    Options: "stream", "format": "compact", "depth", "usesMode", "usesBudget".
     """
     if not build_codebase_map:
         return jsonify({"error": "codebase_parser not available"}), 500
+    if _stream_format():
+        return _stream_codebase_map(_stream_format())
 
     files = []
+    snapshot = None
 
     # 1. GitHub URL (optional githubToken for private repos)
     if request.is_json:
         data = request.get_json() or {}
         url = (data.get("githubUrl") or "").strip()
         token = (data.get("githubToken") or "").strip() or None
-        if url and fetch_repo_files:
+        if url and repo_snapshot:
             try:
-                files = fetch_repo_files(url, token=token)
+                snapshot = repo_snapshot(url, token=token, **_github_options(data))
+                files = snapshot.files
             except ValueError as e:
                 return jsonify({"error": str(e)}), 400
             except RuntimeError as e:
                 return jsonify({"error": str(e)}), 400
         elif data.get("files"):
-            files = data["files"]
+            files = _client_files(data["files"])
+        elif data.get("localPath"):
+            try:
+                files = list(_iter_local_files(data["localPath"]))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
 
-    # 2. Zip upload
+    # 2. Archive upload
     if not files and "file" in request.files:
-        f = request.files["file"]
-        if f.filename and f.filename.lower().endswith(".zip"):
-            try:
-                data = f.read()
-                with zipfile.ZipFile(BytesIO(data), "r") as z:
-                    for name in z.namelist():
-                        if name.endswith("/"):
-                            continue
-                        ext = "." + name.split(".")[-1].lower() if "." in name else ""
-                        if ext in CODE_EXTENSIONS:
-                            try:
-                                content = z.read(name).decode("utf-8", errors="replace")
-                                files.append({"path": name, "content": content})
-                            except Exception:
-                                pass
-            except zipfile.BadZipFile:
-                return jsonify({"error": "Invalid zip file"}), 400
-        else:
-            return jsonify({"error": "Upload a .zip file of your project"}), 400
+        try:
+            files = list(_iter_upload(request.files["file"]))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
     if not files:
         return jsonify({
-            "error": "Provide githubUrl (JSON), files (JSON), or upload a .zip file"
+            "error": "Provide githubUrl (JSON), files (JSON), localPath (JSON), or upload a .zip / .tar.gz file"
         }), 400
 
     try:
-        result = build_codebase_map(files)
+        uses_mode, uses_budget = _uses_options()
+        graph = _codebase_graph(files, snapshot, uses_mode, uses_budget)
+        depth = _lod_depth()
+        view = summarize_map(graph, depth) if depth is not None else graph.to_dict()
+        result = {"mapId": map_store.put(graph), **view}
+        if snapshot is not None:
+            result["commit"] = snapshot.commit
+            result["coverage"] = snapshot.coverage
         inc = False
         if request.is_json:
             inc = (request.get_json() or {}).get("includeContent", False)
@@ -120,46 +151,321 @@ def codebase_map():
         include_content = bool(inc)
         if include_content:
             result["filesWithContent"] = [{"path": f["path"], "content": f.get("content", "")} for f in files]
+        if depth is None and _wants_compact():
+            body, encoding = compact_body({"success": True, **result}, request.headers.get("Accept-Encoding", ""))
+            response = Response(body, content_type=COMPACT_CONTENT_TYPE)
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+            response.headers["Vary"] = "Accept, Accept-Encoding"
+            return response
         return jsonify({"success": True, **result})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-def _load_codebase_files():
-    """Load codebase files from request (GitHub URL, JSON files, or zip). Same logic as codebase_map."""
-    files = []
+def _github_options(data):
+    """fetchMode, followImports and the repo scope options (ref, path, include, exclude) from a JSON body."""
+    follow = data.get("followImports")
+    return {"mode": data.get("fetchMode"), "follow_imports": None if follow is None else bool(follow),
+            "ref": data.get("ref"), "path": data.get("path"), "include": data.get("include"),
+            "exclude": data.get("exclude")}
+
+
+def _wants_compact():
+    """True if the client negotiated the compact map format."""
+    data = request.get_json(silent=True) if request.is_json else None
+    fmt = str((data or {}).get("format") or request.form.get("format") or request.args.get("format") or "").lower()
+    return fmt == "compact" or COMPACT_CONTENT_TYPE in request.headers.get("Accept", "")
+
+
+def _uses_options():
+    """(usesMode, usesBudget) from JSON, form or query. Clients may lower the budget but not raise it."""
+    data = (request.get_json(silent=True) if request.is_json else None) or {}
+    mode = str(data.get("usesMode") or request.form.get("usesMode") or request.args.get("usesMode") or "").lower()
+    raw = data.get("usesBudget", request.form.get("usesBudget", request.args.get("usesBudget")))
+    try:
+        budget = min(USES_EDGE_BUDGET, max(0, int(raw)))
+    except (TypeError, ValueError):
+        budget = None
+    return (mode if mode in USES_MODES else None), budget
+
+
+def _lod_depth():
+    """Requested level-of-detail depth ("depth" in JSON, form or query), or None for the full map."""
+    data = request.get_json(silent=True) if request.is_json else None
+    raw = (data or {}).get("depth", request.form.get("depth", request.args.get("depth")))
+    if raw in (None, ""):
+        return None
+    try:
+        return max(1, int(raw))
+    except (TypeError, ValueError):
+        return None
+
+
+@app.route("/api/codebase-map/expand", methods=["POST"])
+def codebase_map_expand():
+    """
+    Expand one folder or file of a map built by /api/codebase-map.
+    JSON: { "mapId": "...", "nodeId": "src/components", "visible": ["ids currently shown"] }
+    Returns its children with counts, parent -> child edges and rolled-up dependency edges.
+    """
+    if not map_store:
+        return jsonify({"error": "codebase_parser not available"}), 500
+    data = request.get_json(silent=True) or {}
+    map_id = data.get("mapId")
+    if not isinstance(map_id, str):
+        return jsonify({"error": "mapId must be a string"}), 400
+    graph = map_store.get(map_id)
+    if graph is None:
+        return jsonify({"error": "Map not found or expired. Rebuild it with /api/codebase-map"}), 404
+    visible = [v for v in (data.get("visible") or []) if isinstance(v, str)]
+    try:
+        return jsonify({"success": True, **expand_node(graph, data.get("nodeId") or "", visible)})
+    except KeyError:
+        return jsonify({"error": "Unknown nodeId"}), 404
+
+
+SYMBOL_SEARCH_LIMIT = 50
+
+
+@app.route("/api/codebase-map/symbols", methods=["POST"])
+def codebase_map_symbols():
+    """
+    Look up definitions in a map built by /api/codebase-map, via its symbol index.
+    JSON: { "mapId": "...", "name": "useAuth" } for one name, or { "mapId": "...", "prefix": "use" }
+    Returns symbols: [{ name, definitions: [node ids], referencedBy: [paths] }] (prefix matches capped).
+    """
+    if not map_store:
+        return jsonify({"error": "codebase_parser not available"}), 500
+    data = request.get_json(silent=True) or {}
+    map_id = data.get("mapId")
+    if not isinstance(map_id, str):
+        return jsonify({"error": "mapId must be a string"}), 400
+    graph = map_store.get(map_id)
+    if graph is None:
+        return jsonify({"error": "Map not found or expired. Rebuild it with /api/codebase-map"}), 404
+    name, prefix = data.get("name"), str(data.get("prefix") or "").lower()
+    if isinstance(name, str) and name:
+        names = [name] if graph.definitions(name) else []
+    elif prefix:
+        names = sorted(n for n in graph.symbols if n.lower().startswith(prefix))[:SYMBOL_SEARCH_LIMIT]
+    else:
+        return jsonify({"error": "Provide name or prefix"}), 400
+    symbols = [
+        {"name": n, "definitions": graph.definitions(n), "referencedBy": graph.referencing_files(n)}
+        for n in names
+    ]
+    return jsonify({"success": True, "symbols": symbols})
+
+
+@app.route("/api/codebase-map/query", methods=["POST"])
+def codebase_map_query():
+    """
+    Query the file dependency graph of a map built by /api/codebase-map (see map_queries).
+    JSON: { "mapId": "...", "query": ... } with
+    - "dependents" / "dependencies": "file": path, optional "maxDepth" -> files [{id, depth}]
+    - "path": "from", "to" -> path [file ids] (null if unreachable)
+    - "cycles" -> cycles [[file ids]], largest first
+    - "top": "by": "fanIn" | "fanOut", "k" (default 20) -> files [{id, fanIn, fanOut}]
+    """
+    if not transitive:
+        return jsonify({"error": "codebase_parser not available"}), 500
+    data = request.get_json(silent=True) or {}
+    map_id = data.get("mapId")
+    if not isinstance(map_id, str):
+        return jsonify({"error": "mapId must be a string"}), 400
+    graph = map_store.get(map_id)
+    if graph is None:
+        return jsonify({"error": "Map not found or expired. Rebuild it with /api/codebase-map"}), 404
+    query = data.get("query")
+    try:
+        if query in ("dependents", "dependencies"):
+            max_depth = data.get("maxDepth")
+            result = transitive(graph, str(data.get("file") or ""), query,
+                                max_depth=int(max_depth) if max_depth is not None else None)
+        elif query == "path":
+            result = {"path": shortest_path(graph, str(data.get("from") or ""), str(data.get("to") or ""))}
+        elif query == "cycles":
+            result = {"cycles": import_cycles(graph)}
+        elif query == "top":
+            result = {"files": top_files(graph, data.get("by") or "fanIn", min(500, int(data.get("k") or 20)))}
+        else:
+            return jsonify({"error": "query must be dependents, dependencies, path, cycles or top"}), 400
+    except KeyError as e:
+        return jsonify({"error": f"Unknown file: {e.args[0]}"}), 404
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"success": True, "query": query, **result})
+
+
+def _stream_format():
+    """'ndjson' or 'sse' if the client asked for a streamed map, else None."""
+    data = request.get_json(silent=True) if request.is_json else None
+    flag = str((data or {}).get("stream") or request.form.get("stream") or request.args.get("stream") or "").lower()
+    accept = request.headers.get("Accept", "")
+    if flag == "sse" or "text/event-stream" in accept:
+        return "sse"
+    if flag in ("1", "true", "yes", "ndjson") or "application/x-ndjson" in accept:
+        return "ndjson"
+    return None
+
+
+def _stream_codebase_map(fmt):
+    """
+    Stream a codebase map while files are fetched and parsed.
+    Each event is one JSON object: {"node": {...}}, {"edge": {...}}, then
+    {"done": true, "files": [...], "mapId": "..."} (plus "coverage" for GitHub repos),
+    or {"error": "..."} if the build fails.
+    NDJSON sends one object per line; SSE sends "data: <json>" events.
+    """
+    files = None
+    coverage = {}
     if request.is_json:
         data = request.get_json() or {}
         url = (data.get("githubUrl") or "").strip()
         token = (data.get("githubToken") or "").strip() or None
-        if url and fetch_repo_files:
+        if url and iter_snapshot_files:
             try:
-                files = fetch_repo_files(url, token=token)
-            except (ValueError, RuntimeError):
-                raise
+                files = iter_snapshot_files(url, token=token, coverage=coverage, **_github_options(data))
+            except (ValueError, RuntimeError) as e:
+                return jsonify({"error": str(e)}), 400
         elif data.get("files"):
-            files = data["files"]
-    if not files and "file" in request.files:
-        f = request.files["file"]
-        if f.filename and f.filename.lower().endswith(".zip"):
+            files = _client_files(data["files"])
+        elif data.get("localPath"):
             try:
-                raw = f.read()
-                with zipfile.ZipFile(BytesIO(raw), "r") as z:
-                    for name in z.namelist():
-                        if name.endswith("/"):
-                            continue
-                        ext = "." + name.split(".")[-1].lower() if "." in name else ""
-                        if ext in CODE_EXTENSIONS:
-                            try:
-                                content = z.read(name).decode("utf-8", errors="replace")
-                                files.append({"path": name, "content": content})
-                            except Exception:
-                                pass
-            except zipfile.BadZipFile:
-                raise ValueError("Invalid zip file")
-        else:
-            raise ValueError("Upload a .zip file of your project")
-    return files
+                files = _iter_local_files(data["localPath"])
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+    if files is None and "file" in request.files:
+        try:
+            files = _iter_upload(request.files["file"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    if files is None:
+        return jsonify({
+            "error": "Provide githubUrl (JSON), files (JSON), localPath (JSON), or upload a .zip / .tar.gz file"
+        }), 400
+
+    uses_mode, uses_budget = _uses_options()
+
+    def events():
+        graph = CodebaseGraph()
+        graph.uses_mode, graph.uses_budget = uses_mode, uses_budget
+        try:
+            for event in stream_codebase_graph(files, graph):
+                if event.get("done"):
+                    event["mapId"] = map_store.put(graph)
+                    if coverage:
+                        event["coverage"] = coverage
+                yield event
+        except Exception as e:
+            yield {"error": str(e)}
+
+    def encode():
+        for event in events():
+            line = json.dumps(event, separators=(",", ":"))
+            yield f"data: {line}\n\n" if fmt == "sse" else line + "\n"
+
+    mimetype = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return Response(stream_with_context(encode()), mimetype=mimetype, headers={"X-Accel-Buffering": "no"})
+
+
+@app.route("/api/codebase-map/update", methods=["POST"])
+def codebase_map_update():
+    """
+    Incrementally update a map built by /api/codebase-map.
+    JSON: { "mapId": "...", "added": [{path, content}], "modified": [{path, content}], "deleted": ["path"] }
+    Only changed files are parsed and only edges touching them are recomputed.
+    Returns the full updated map; 404 if the map id expired (rebuild with /api/codebase-map).
+    """
+    if not update_codebase_graph:
+        return jsonify({"error": "codebase_parser not available"}), 500
+    data = request.get_json(silent=True) or {}
+    map_id = data.get("mapId")
+    if not isinstance(map_id, str):
+        return jsonify({"error": "mapId must be a string"}), 400
+    graph = map_store.get(map_id)
+    if graph is None:
+        return jsonify({"error": "Map not found or expired. Rebuild it with /api/codebase-map"}), 404
+    deleted = [p for p in (data.get("deleted") or []) if isinstance(p, str)]
+    try:
+        if graph.shared:
+            graph = copy.deepcopy(graph)  # the snapshot's graph stays as fetched
+            graph.shared = False
+            map_store.put(graph, map_id)
+        update_codebase_graph(
+            graph,
+            added=_client_files(data.get("added") or []),
+            modified=_client_files(data.get("modified") or []),
+            deleted=deleted,
+        )
+        return jsonify({"success": True, "mapId": map_id, **graph.to_dict()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def _load_codebase():
+    """
+    Load codebase files from request (GitHub URL, JSON files, server directory, or archive). Same logic as codebase_map.
+    Returns (files, snapshot); snapshot is the cached repo_snapshots.Snapshot for GitHub URLs, else None.
+    """
+    files = []
+    if request.is_json:
+        data = request.get_json() or {}
+        url = (data.get("githubUrl") or "").strip()
+        token = (data.get("githubToken") or "").strip() or None
+        if url and repo_snapshot:
+            snapshot = repo_snapshot(url, token=token, **_github_options(data))
+            return snapshot.files, snapshot
+        elif data.get("files"):
+            files = _client_files(data["files"])
+        elif data.get("localPath"):
+            files = list(_iter_local_files(data["localPath"]))
+    if not files and "file" in request.files:
+        files = list(_iter_upload(request.files["file"]))
+    return files, None
+
+
+def _codebase_graph(files, snapshot, uses_mode=None, uses_budget=None):
+    """Map of files, built once per snapshot with the default uses options (other options are not cached)."""
+    def build():
+        return build_codebase_graph(files, uses_mode=uses_mode, uses_budget=uses_budget)
+    if snapshot is None or uses_mode is not None or uses_budget is not None:
+        return build()
+    return snapshot.derive("graph", build)
+
+
+def _codebase_context(files, snapshot, max_files, max_nodes=0, max_edges=0, query=""):
+    """select_context over the codebase map, cached on the snapshot for GitHub repos unless there is a query."""
+    def build():
+        return select_context(_codebase_graph(files, snapshot), files, max_files, max_nodes=max_nodes,
+                              max_edges=max_edges, query=query)
+    if snapshot is None or query:
+        return build()
+    return snapshot.derive(("context", max_files, max_nodes, max_edges), build)
+
+
+def _iter_upload(f):
+    """
+    Open an uploaded .zip, .tar.gz or .tar and return an iterator of its code files as {path, content}.
+    Raises ValueError for other, oversized or corrupt uploads; see upload_ingest for
+    the per-file, total and compression-ratio limits. Members are decoded lazily.
+    """
+    name = (f.filename or "").lower()
+    if not name.endswith((".zip",) + TAR_EXTENSIONS):
+        raise ValueError("Upload a .zip or .tar.gz file of your project")
+    if not iter_zip_files:
+        raise ValueError("Archive uploads are not available")
+    return iter_zip_files(f.stream) if name.endswith(".zip") else iter_tar_files(f.stream)
+
+
+def _iter_local_files(path):
+    """Code files of a directory on the server (must be under LOCAL_REPO_ROOTS). Raises ValueError."""
+    if not iter_directory_files:
+        raise ValueError("Server-side directories are not available")
+    if not isinstance(path, str):
+        raise ValueError("localPath must be a string")
+    return iter_directory_files(path)
 
 
 def _get_report_system_prompt(length_pages: int) -> str:
@@ -219,13 +525,13 @@ def codebase_report():
     if not build_codebase_map:
         return jsonify({"error": "codebase_parser not available"}), 500
     try:
-        files = _load_codebase_files()
+        files, snapshot = _load_codebase()
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except (ValueError, RuntimeError) as e:
         return jsonify({"error": str(e)}), 400
     if not files:
-        return jsonify({"error": "Provide githubUrl, files, or zip"}), 400
+        return jsonify({"error": "Provide githubUrl, files, localPath, or an archive"}), 400
 
     data = request.get_json() or {}
     length_pages = int(data.get("reportLength", data.get("report_length", 1)))
@@ -239,19 +545,19 @@ def codebase_report():
 
     # Build context: structure + key file snippets (truncate large files)
     try:
-        result = build_codebase_map(files)
+        files, nodes, edges = _codebase_context(files, snapshot, 30, max_nodes=80, max_edges=50)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
     nodes_summary = []
-    for n in (result.get("nodes") or [])[:80]:
+    for n in nodes:
         nodes_summary.append(f"- {n.get('type', '?')}: {n.get('label', '?')} (id: {n.get('id', '')})")
     edges_summary = []
-    for e in (result.get("edges") or [])[:50]:
+    for e in edges:
         edges_summary.append(f"- {e.get('source', '')} → {e.get('target', '')}")
 
     file_previews = []
-    for f in files[:30]:
+    for f in files:
         content = (f.get("content") or "")[:1200]
         file_previews.append(f"=== {f.get('path', '')} ===\n{content}\n")
 
@@ -304,13 +610,13 @@ def codebase_flashcards():
     if not build_codebase_map:
         return jsonify({"error": "codebase_parser not available"}), 500
     try:
-        files = _load_codebase_files()
+        files, snapshot = _load_codebase()
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except (ValueError, RuntimeError) as e:
         return jsonify({"error": str(e)}), 400
     if not files:
-        return jsonify({"error": "Provide githubUrl, files, or zip"}), 400
+        return jsonify({"error": "Provide githubUrl, files, localPath, or an archive"}), 400
 
     data = request.get_json() or {}
     flashcard_count = int(data.get("flashcardCount", data.get("flashcard_count", 10)))
@@ -326,15 +632,15 @@ def codebase_flashcards():
         return jsonify({"error": "ANTHROPIC_API_KEY not set for AI flashcards"}), 500
 
     try:
-        result = build_codebase_map(files)
+        files, nodes, _ = _codebase_context(files, snapshot, 25, max_nodes=80)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
     nodes_summary = []
-    for n in (result.get("nodes") or [])[:80]:
+    for n in nodes:
         nodes_summary.append(f"- {n.get('type', '?')}: {n.get('label', '?')} (id: {n.get('id', '')})")
     file_previews = []
-    for f in files[:25]:
+    for f in files:
         content = (f.get("content") or "")[:800]
         file_previews.append(f"=== {f.get('path', '')} ===\n{content}\n")
 
@@ -432,13 +738,13 @@ def codebase_chat():
     if not build_codebase_map:
         return jsonify({"error": "codebase_parser not available"}), 500
     try:
-        files = _load_codebase_files()
+        files, snapshot = _load_codebase()
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except (ValueError, RuntimeError) as e:
         return jsonify({"error": str(e)}), 400
     if not files:
-        return jsonify({"error": "Provide githubUrl, files, or zip"}), 400
+        return jsonify({"error": "Provide githubUrl, files, localPath, or an archive"}), 400
 
     data = request.get_json() or {}
     message = (data.get("message") or "").strip()
@@ -454,15 +760,15 @@ def codebase_chat():
         return jsonify({"error": "ANTHROPIC_API_KEY not set for AI chat"}), 500
 
     try:
-        result = build_codebase_map(files)
+        files, nodes, _ = _codebase_context(files, snapshot, 40, max_nodes=100, query=message)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
     nodes_summary = []
-    for n in (result.get("nodes") or [])[:100]:
+    for n in nodes:
         nodes_summary.append(f"- {n.get('type', '?')}: {n.get('label', '?')} (id: {n.get('id', '')})")
     file_previews = []
-    for f in files[:40]:
+    for f in files:
         content = (f.get("content") or "")[:1500]
         file_previews.append(f"=== {f.get('path', '')} ===\n{content}\n")
 
@@ -0,0 +1,562 @@
+"""
+Offline benchmark suite for the codebase map pipeline.
+
+Generates synthetic Python, JS, Java, Go, Rust, Ruby and C repos (default
+100, 1k, 10k and 50k files) with a realistic import graph: nested packages, a
+few heavily imported hub modules (Zipf-like fan-in), relative and absolute
+imports, and stdlib / npm imports that do not resolve. For each repo it times and memory-profiles
+parse_file, extract_imports, resolve_import_to_file and build_codebase_map
+(cold and warm parse cache), PageRank context selection for the LLM
+endpoints, the retained size of the in-memory graph, plus the compact wire format.
+
+    python bench_codebase_map.py                         # all sizes, table output
+    python bench_codebase_map.py --sizes 100,1000 --json out.json
+    python bench_codebase_map.py --sizes 100,1000 --compare baseline.json
+    python bench_codebase_map.py --sizes 20000 --langs py --repeat 1   # graph memory at 20k files
+
+--json writes machine-readable results tagged with the git commit; --compare
+prints ratios against an earlier run and exits 1 if any stage is slower than
+--threshold (default 1.25x). --check-targets exits 1 if a language's
+scan_file throughput is below SCAN_TARGET_MB_PER_S. Every run also checks, on a
+--check-files repo per language, that optimized paths give the same result as
+the plain one (an incremental update or a streamed build vs a full build, graph
+queries vs brute force, .gitignore handling vs git) and exits 1 on a mismatch.
+"""
+import argparse
+import functools
+import gc
+import gzip
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from code_files import SKIP_DIRS, is_code_path
+from codebase_parser import (
+    PathIndex, build_codebase_graph, build_codebase_map, extract_imports, parse_file, parse_cache, scan_file,
+    stream_codebase_graph, update_codebase_graph,
+)
+from map_queries import import_cycles, select_context, shortest_path, top_files, transitive
+from map_wire import compact_body
+from upload_ingest import _walk_directory
+
+DEFAULT_SIZES = (100, 1000, 10000, 50000)
+LANGS = ("py", "js", "java", "go", "rs", "rb", "c")
+# Minimum scan_file throughput per language (MB/s, one core); --check-targets fails below it
+SCAN_TARGET_MB_PER_S = {"py": 5.0, "js": 5.0, "java": 5.0, "go": 5.0, "rs": 5.0, "rb": 5.0, "c": 5.0}
+CHECK_FILES = 1000  # repo size for the equivalence checks (results must match, any mismatch exits 1)
+
+PY_STDLIB = ("os", "sys", "json", "typing", "collections", "logging", "dataclasses")
+JS_PACKAGES = ("react", "lodash", "axios", "react-dom/client")
+
+
+def _zipf_pick(rng, items, exponent=1.1):
+    """Pick an item with probability ~ 1 / rank^exponent (rank 1 = items[0])."""
+    weights = [1.0 / (i + 1) ** exponent for i in range(len(items))]
+    return rng.choices(items, weights=weights, k=1)[0]
+
+
+def _module_paths(n_files, rng):
+    """Nested package layout: packages up to 3 levels deep, a new package every ~12 modules."""
+    paths = []
+    packages = ["core", "utils"]
+    while len(paths) < n_files:
+        pkg = rng.choice(packages)
+        if rng.random() < 0.08 and pkg.count("/") < 2:
+            packages.append(f"{pkg}/sub{len(packages)}")
+        paths.append(f"{pkg}/m{len(paths)}")
+    return paths
+
+
+def make_python_repo(n_files, seed=0):
+    """Synthetic Python project with classes, functions, routes and a hub-heavy import graph."""
+    rng = random.Random(seed)
+    modules = _module_paths(n_files, rng)
+    hubs = modules[: max(5, n_files // 50)]
+    files = []
+    for i, mod in enumerate(modules):
+        lines = [f"import {rng.choice(PY_STDLIB)}"]
+        for _ in range(rng.randint(2, 6)):
+            target = _zipf_pick(rng, hubs) if rng.random() < 0.6 else rng.choice(modules)
+            if target.rsplit("/", 1)[0] == mod.rsplit("/", 1)[0] and rng.random() < 0.5:
+                lines.append(f"from .{target.rsplit('/', 1)[1]} import helper")
+            else:
+                lines.append(f"from {target.replace('/', '.')} import helper")
+        lines.append("")
+        lines.append("def helper(value):")
+        lines.append("    return value")
+        lines.append("")
+        for j in range(rng.randint(1, 3)):
+            lines.append(f"class Model{i}_{j}:")
+            lines.append(f"    \"\"\"Model {j} of module {i}.\"\"\"")
+            for k in range(rng.randint(1, 4)):
+                lines.append(f"    def method_{k}(self, value):")
+                lines.append("        # transform the value")
+                lines.append(f"        return helper(value) + {k}")
+            lines.append("")
+        for j in range(rng.randint(1, 5)):
+            if rng.random() < 0.1:
+                lines.append(f"@app.route(\"/api/m{i}/{j}\")")
+            lines.append(f"def func_{i}_{j}(x, y=None):")
+            lines.append("    total = 0")
+            lines.append("    for item in range(x):")
+            lines.append("        total += item")
+            lines.append("    return total")
+            lines.append("")
+        files.append({"path": f"{mod}.py", "content": "\n".join(lines)})
+    return files
+
+
+def make_js_repo(n_files, seed=0):
+    """Synthetic React project with components, hooks and relative imports to hub modules."""
+    rng = random.Random(seed)
+    modules = [f"src/{p}" for p in _module_paths(n_files, rng)]
+    hubs = modules[: max(5, n_files // 50)]
+    files = []
+    for i, mod in enumerate(modules):
+        up = "../" * (mod.count("/") - 1)
+        lines = [f"import {rng.choice(['React', 'axios', '_'])} from '{rng.choice(JS_PACKAGES)}'"]
+        for _ in range(rng.randint(2, 6)):
+            target = _zipf_pick(rng, hubs) if rng.random() < 0.6 else rng.choice(modules)
+            lines.append(f"import {{ helper }} from './{up}{target[4:]}'")
+        lines.append("")
+        lines.append("export function helper(value) {")
+        lines.append("  return value")
+        lines.append("}")
+        lines.append("")
+        for j in range(rng.randint(1, 3)):
+            lines.append(f"// Component {j} of module {i}")
+            lines.append(f"export function Widget{i}x{j}(props) {{")
+            lines.append("  const value = helper(props.value)")
+            lines.append("  return <div className=\"widget\">{value}</div>")
+            lines.append("}")
+            lines.append("")
+        for j in range(rng.randint(1, 4)):
+            lines.append(f"export const useThing{i}x{j} = () => {{")
+            lines.append("  return null")
+            lines.append("}")
+        files.append({"path": f"{mod}.jsx", "content": "\n".join(lines)})
+    return files
+
+
+def _java_file(i, mod, targets, n_types, n_funcs):
+    pkg = mod.rsplit("/", 1)[0]
+    lines = [f"package {pkg.replace('/', '.')};", "", "import java.util.List;"]
+    lines += [f"import {t.rsplit('/', 1)[0].replace('/', '.')}.M{t.rsplit('m', 1)[1]};" for t in targets]
+    lines += ["", f"public class M{i} {{", "    public static int helper(int v) {", "        return v;", "    }", "}"]
+    for j in range(n_types):
+        lines += ["", f"class Model{i}x{j} {{", "    private final List<String> names;"]
+        for k, t in zip(range(n_funcs), itertools.cycle(targets)):
+            lines += [f"    // method {k}", f"    public int method{k}(int value) {{",
+                      f"        return M{t.rsplit('m', 1)[1]}.helper(value) + {k};", "    }"]
+        lines.append("}")
+    return f"src/main/java/{pkg}/M{i}.java", lines
+
+
+def _go_file(i, mod, targets, n_types, n_funcs):
+    lines = [f"package {mod.rsplit('/', 1)[0].rsplit('/', 1)[-1]}", "", "import (", "    \"fmt\""]
+    lines += [f"    \"github.com/acme/app/{t.rsplit('/', 1)[0]}\"" for t in targets]
+    lines += [")", "", f"func Helper{i}(v int) int {{", "    return v", "}"]
+    for j in range(n_types):
+        lines += ["", f"type Model{i}x{j} struct {{", "    Name string", "}"]
+        for k in range(n_funcs):
+            lines += ["", f"func (m *Model{i}x{j}) Method{k}(value int) int {{", "    // transform the value",
+                      "    fmt.Println(m.Name)", f"    return Helper{i}(value) + {k}", "}"]
+    return f"{mod}.go", lines
+
+
+def _rust_file(i, mod, targets, n_types, n_funcs):
+    lines = ["use std::collections::HashMap;"] + [f"use crate::{t.replace('/', '::')}::helper;" for t in targets]
+    lines += ["", "pub fn helper(v: i32) -> i32 {", "    v", "}"]
+    for j in range(n_types):
+        lines += ["", f"pub struct Model{i}x{j} {{", "    names: HashMap<String, i32>,", "}", "", f"impl Model{i}x{j} {{"]
+        for k in range(n_funcs):
+            lines += [f"    /// method {k}", f"    pub fn method_{k}(&self, value: i32) -> i32 {{",
+                      f"        helper(value) + {k}", "    }"]
+        lines.append("}")
+    return f"src/{mod}.rs", lines
+
+
+def _ruby_file(i, mod, targets, n_types, n_funcs):
+    lines = ["require 'json'"] + [f"require '{t}'" for t in targets]
+    lines += ["", "module Helpers", "  def self.helper(value)", "    value", "  end", "end"]
+    for j in range(n_types):
+        lines += ["", f"class Model{i}x{j} < Base"]
+        for k in range(n_funcs):
+            lines += [f"  # method {k}", f"  def method_{k}(value)", f"    Helpers.helper(value) + {k}", "  end"]
+        lines.append("end")
+    return f"lib/{mod}.rb", lines
+
+
+def _c_file(i, mod, targets, n_types, n_funcs):
+    lines = ["#include <stdio.h>"] + [f"#include \"{t}.h\"" for t in targets]
+    lines += ["", "static int helper(int v)", "{", "    return v;", "}"]
+    for j in range(n_types):
+        lines += ["", f"struct model_{i}_{j} {{", "    int value;", "};"]
+    for k in range(n_funcs * n_types):
+        lines += ["", f"/* function {k} */", f"int func_{i}_{k}(struct model_{i}_0 *m, int value) {{",
+                  f"    return helper(value) + m->value + {k};", "}"]
+    return f"{mod}.{'h' if i % 5 == 0 else 'c'}", lines
+
+
+PLUGIN_TEMPLATES = {"java": _java_file, "go": _go_file, "rs": _rust_file, "rb": _ruby_file, "c": _c_file}
+
+
+def make_plugin_repo(n_files, lang, seed=0):
+    """Synthetic Java, Go, Rust, Ruby or C project with the same module layout and hub-heavy imports."""
+    rng = random.Random(seed)
+    modules = _module_paths(n_files, rng)
+    hubs = modules[: max(5, n_files // 50)]
+    files = []
+    for i, mod in enumerate(modules):
+        targets = [_zipf_pick(rng, hubs) if rng.random() < 0.6 else rng.choice(modules) for _ in range(rng.randint(2, 6))]
+        path, lines = PLUGIN_TEMPLATES[lang](i, mod, targets, rng.randint(1, 3), rng.randint(1, 4))
+        files.append({"path": path, "content": "\n".join(lines)})
+    return files
+
+
+def make_repo(n_files, lang="py", seed=0):
+    if lang in PLUGIN_TEMPLATES:
+        return make_plugin_repo(n_files, lang, seed)
+    return make_python_repo(n_files, seed) if lang == "py" else make_js_repo(n_files, seed)
+
+
+def _measure(fn, memory, repeat=1):
+    """
+    Run fn `repeat` times; returns (result, best seconds, peak KB or None).
+    Memory is traced in a separate, untimed run so tracemalloc overhead does not skew timings.
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        seconds = min(seconds, time.perf_counter() - start)
+    peak_kb = None
+    if memory:
+        del result
+        gc.collect()
+        tracemalloc.start()
+        result = fn()
+        peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return result, seconds, peak_kb
+
+
+def _graph_memory(files):
+    """
+    (retained KB, peak KB) of a cold build_codebase_graph: what the in-memory
+    graph costs once the parse cache is dropped, and the high-water mark while building.
+    """
+    parse_cache.clear()
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    graph = build_codebase_graph(files, parallel=False)
+    parse_cache.clear()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del graph
+    return (current - base) / 1024, (peak - base) / 1024
+
+
+def bench_repo(lang, n_files, memory=True, repeat=3):
+    """All stages for one synthetic repo (best of `repeat` timings). Returns a list of result rows."""
+    files = make_repo(n_files, lang)
+    measure = functools.partial(_measure, repeat=repeat)
+    size_mb = sum(len(f["content"]) for f in files) / 1e6
+    rows = []
+
+    def row(stage, seconds, peak_kb, **extra):
+        rows.append({"lang": lang, "files": n_files, "stage": stage, "seconds": round(seconds, 6),
+                     "peak_kb": round(peak_kb, 1) if peak_kb is not None else None, **extra})
+
+    _, s, m = measure(lambda: [parse_file(f["content"], f["path"]) for f in files], memory)
+    row("parse_file", s, m, mb_per_s=round(size_mb / s, 2))
+    imports, s, m = measure(lambda: [extract_imports(f["content"], f["path"]) for f in files], memory)
+    row("extract_imports", s, m, mb_per_s=round(size_mb / s, 2))
+    _, s, m = measure(lambda: [scan_file(f["content"], f["path"]) for f in files], memory)
+    row("scan_file", s, m, mb_per_s=round(size_mb / s, 2), target_mb_per_s=SCAN_TARGET_MB_PER_S.get(lang))
+
+    paths = [f["path"] for f in files]
+    flat = [imp for imps in imports for imp in imps]
+    index, s, m = measure(lambda: PathIndex(paths), memory)
+    row("path_index", s, m)
+    resolved, s, _ = measure(lambda: [index.resolve(imp) for imp in flat], False)
+    row("resolve_import_to_file", s, None, imports=len(flat),
+        resolved=sum(1 for r in resolved if r), us_per_import=round(s / max(1, len(flat)) * 1e6, 3))
+
+    def cold_build():
+        parse_cache.clear()
+        return build_codebase_map(files)
+
+    result, s, m = measure(cold_build, memory)
+    row("build_codebase_map", s, m, nodes=len(result["nodes"]), edges=len(result["edges"]),
+        us_per_elem=round(s / (len(result["nodes"]) + len(result["edges"])) * 1e6, 3),
+        collapsed_uses=result["usesEdges"]["collapsedPairs"])
+    _, s, _ = measure(lambda: build_codebase_map(files), False)
+    row("build_codebase_map_warm", s, None)
+
+    graph = build_codebase_graph(files)
+
+    def cold_rank(graph):
+        graph.query_cache.clear()
+        return select_context(graph, files, 40, max_nodes=100, max_edges=50)
+
+    _, s, m = measure(functools.partial(cold_rank, graph), memory)
+    row("rank_context", s, m, ms=round(s * 1000, 2))
+    del graph
+    if memory:
+        retained_kb, peak_kb = _graph_memory(files)
+        row("build_codebase_graph", 0.0, peak_kb, retained_kb=round(retained_kb, 1))
+
+    body = json.dumps(result).encode("utf-8")
+    compact, s, _ = measure(lambda: compact_body(result, "gzip")[0], False)
+    row("wire_compact_gzip", s, None, bytes=len(compact), json_bytes=len(body),
+        json_gzip_bytes=len(gzip.compress(body, compresslevel=6)))
+    parse_cache.clear()
+    return rows
+
+
+def _map_key(result):
+    """Order-independent form of a map: (sorted node JSON, sorted edge JSON, usesEdges)."""
+    return (sorted(json.dumps(n, sort_keys=True) for n in result["nodes"]),
+            sorted(json.dumps(e, sort_keys=True) for e in result["edges"]),
+            result.get("usesEdges"))
+
+
+def _delta(files, seed=0):
+    """A file delta touching ~10% of a repo, hubs included: (added, modified, deleted, expected file list)."""
+    rng = random.Random(seed)
+    n = len(files)
+    picked = rng.sample(range(n), max(3, n // 10))
+    third = len(picked) // 3
+    deleted = {files[i]["path"] for i in picked[:third] + [0]}
+    modified = {files[i]["path"]: files[rng.randrange(n)]["content"] for i in picked[third:2 * third]}
+    added = []
+    for k, i in enumerate(picked[2 * third:]):
+        folder, _, name = files[i]["path"].rpartition("/")
+        ext = name[name.rfind("."):] if "." in name else ""
+        added.append({"path": f"{folder}/added{k}{ext}".lstrip("/"), "content": files[rng.randrange(n)]["content"]})
+    expected = [{"path": f["path"], "content": modified.get(f["path"], f["content"])}
+                for f in files if f["path"] not in deleted] + added
+    modified = [{"path": p, "content": c} for p, c in modified.items() if p not in deleted]
+    return added, modified, sorted(deleted), expected
+
+
+def _streamed_map(files):
+    """The map stream_codebase_graph sends, assembled from its node/edge events like a client would."""
+    nodes, edges, uses = {}, {}, None
+    for event in stream_codebase_graph(iter(files)):
+        if "node" in event:
+            nodes[event["node"]["id"]] = event["node"]
+        elif "edge" in event:
+            e = event["edge"]
+            edges[(e["source"], e["target"], e.get("type"))] = e
+        else:
+            uses = event.get("usesEdges")
+    return {"nodes": list(nodes.values()), "edges": list(edges.values()), "usesEdges": uses}
+
+
+def _reachable(adjacency, start):
+    """{file id: hops} for everything reachable from start, by relaxing one hop at a time."""
+    depth, frontier, d = {}, {start}, 0
+    while frontier:
+        d += 1
+        frontier = {n for f in frontier for n in adjacency.get(f, ()) if n not in depth and n != start}
+        depth.update((n, d) for n in frontier)
+    return depth
+
+
+def _query_mismatches(graph, n_samples=20, seed=0):
+    """map_queries results that differ from brute force over the serialized dependency edges."""
+    ids = [f"file:{p}" for p in graph.file_paths]
+    forward, backward = {}, {}
+    for e in graph.to_dict()["edges"]:
+        if e.get("type") == "dependency":
+            forward.setdefault(e["source"], set()).add(e["target"])
+            backward.setdefault(e["target"], set()).add(e["source"])
+    reach = {i: _reachable(forward, i) for i in ids}
+    wrong = []
+    rng = random.Random(seed)
+    for start in rng.sample(ids, min(n_samples, len(ids))):
+        for direction, adjacency in (("dependencies", forward), ("dependents", backward)):
+            got = transitive(graph, start, direction, limit=len(ids))["files"]
+            if {f["id"]: f["depth"] for f in got} != _reachable(adjacency, start):
+                wrong.append(f"transitive {direction} {start}")
+        target = rng.choice(ids)
+        path = shortest_path(graph, start, target)
+        hops = 0 if target == start else reach[start].get(target)
+        if path is None:
+            ok = hops is None
+        else:
+            ok = (path[0], path[-1]) == (start, target) and len(path) - 1 == hops and all(
+                b in forward.get(a, ()) for a, b in zip(path, path[1:]))
+        if not ok:
+            wrong.append(f"shortest_path {start} {target}")
+    cycles = set()
+    for i in ids:
+        component = tuple(sorted([i] + [j for j in reach[i] if i in reach[j] and j != i]))
+        if len(component) > 1 or i in forward.get(i, ()):
+            cycles.add(component)
+    if {tuple(c) for c in import_cycles(graph)} != cycles:
+        wrong.append("import_cycles")
+    for by, adjacency in (("fanIn", backward), ("fanOut", forward)):
+        best = sorted(ids, key=lambda i: (-len(adjacency.get(i, ())), i))[:20]
+        if [r["id"] for r in top_files(graph, by, 20)] != best:
+            wrong.append(f"top_files {by}")
+    return wrong
+
+
+def check_repo(lang, n_files):
+    """
+    Equivalence checks on one synthetic repo, printed one per line.
+    Returns the names of the checks that did not match.
+    """
+    files = make_repo(n_files, lang)
+    failed = []
+
+    def check(name, ok):
+        print(f"{lang:<4} {n_files:>6} check {name:<22} {'ok' if ok else 'MISMATCH'}")
+        if not ok:
+            failed.append(f"{lang} {n_files} {name}")
+
+    added, modified, deleted, expected = _delta(files)
+    graph = build_codebase_graph(files)
+    update_codebase_graph(graph, added=added, modified=modified, deleted=deleted)
+    check("update vs rebuild", _map_key(graph.to_dict()) == _map_key(build_codebase_map(expected)))
+    check("stream vs build", _map_key(_streamed_map(files)) == _map_key(build_codebase_map(files)))
+    wrong = _query_mismatches(build_codebase_graph(files))
+    for name in wrong[:5]:
+        print(f"  {name}")
+    check("queries vs brute force", not wrong)
+    parse_cache.clear()
+    return failed
+
+
+# .gitignore files for the gitignore check: anchored, dir-only, negated, ** and nested patterns
+GITIGNORE_TREE = {
+    ".gitignore": "*.gen.py\n/top.py\nlogs/\n!keep.gen.py\nsrc/**/tmp_*.js\n[ab]?.rb\n# comment\n\n",
+    "src/.gitignore": "secret.py\n/local/\n!important.js\nvendor\n",
+    "src/deep/.gitignore": "*.go\n!main.go\n",
+}
+GITIGNORE_FILES = (
+    "top.py", "a/top.py", "x.gen.py", "keep.gen.py", "a/b/y.gen.py", "logs/a.py", "a/logs/b.py", "logs.py",
+    "src/a/tmp_x.js", "src/tmp_y.js", "lib/tmp_z.js", "ab.rb", "a1.rb", "cd.rb", "src/secret.py",
+    "src/deep/secret.py", "secret.py", "src/local/a.py", "src/deep/local/a.py", "src/important.js",
+    "src/vendor/important.js", "src/vendor/x.py", "vendor/x.py", "src/deep/a.go", "src/deep/main.go",
+    "src/deep/more/b.go", "src/c.go", "node_modules/x.js", "src/ok.py",
+)
+
+
+def check_gitignore():
+    """
+    Files iter_directory_files keeps from GITIGNORE_TREE vs what `git check-ignore`
+    leaves. Returns the names of failed checks; skipped when git is not installed.
+    """
+    if shutil.which("git") is None:
+        print("check gitignore vs git                skipped (no git)")
+        return []
+    with tempfile.TemporaryDirectory() as root:
+        subprocess.run(["git", "init", "-q", root], check=True, timeout=30)
+        for path, content in list(GITIGNORE_TREE.items()) + [(p, "x = 1\n") for p in GITIGNORE_FILES]:
+            os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(root, path), "w", encoding="utf-8") as fh:
+                fh.write(content)
+        out = subprocess.run(["git", "check-ignore", "--stdin"], cwd=root, input="\n".join(GITIGNORE_FILES),
+                             capture_output=True, text=True, timeout=30)
+        ignored = set(out.stdout.split())
+        expected = {p for p in GITIGNORE_FILES if p not in ignored and is_code_path(p)
+                    and not SKIP_DIRS.intersection(p.split("/")[:-1])}
+        got = {f["path"] for f in _walk_directory(os.path.realpath(root))}
+    ok = got == expected
+    print(f"check gitignore vs git                {'ok' if ok else 'MISMATCH'}")
+    for path in sorted(got ^ expected):
+        print(f"  {path}: {'kept' if path in got else 'dropped'}, git {'ignores' if path in ignored else 'keeps'} it")
+    return [] if ok else ["gitignore vs git"]
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(rows, baseline_path, threshold):
+    """Print time ratios against a previous --json run. Returns True if any stage regressed."""
+    with open(baseline_path, "r", encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    old = {(r["lang"], r["files"], r["stage"]): r for r in baseline["results"]}
+    regressed = False
+    print(f"\ncompared with {baseline.get('commit') or baseline_path}:")
+    for r in rows:
+        prev = old.get((r["lang"], r["files"], r["stage"]))
+        if not prev or not prev["seconds"]:
+            continue
+        ratio = r["seconds"] / prev["seconds"]
+        flag = "  REGRESSION" if ratio > threshold else ""
+        regressed = regressed or bool(flag)
+        print(f"  {r['lang']:<3} {r['files']:>6} {r['stage']:<24} {prev['seconds']:>9.4f}s -> {r['seconds']:>9.4f}s  x{ratio:.2f}{flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the codebase map pipeline.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma-separated file counts")
+    parser.add_argument("--langs", default=",".join(LANGS), help="py, js or py,js")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage; the best is reported")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc runs (faster)")
+    parser.add_argument("--json", help="write results to this path")
+    parser.add_argument("--compare", help="previous --json output to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio counted as a regression")
+    parser.add_argument("--check-targets", action="store_true", help="exit 1 if a language scans below its MB/s target")
+    parser.add_argument("--check-files", type=int, default=CHECK_FILES,
+                        help="repo size for the equivalence checks (0 skips them)")
+    args = parser.parse_args(argv)
+
+    rows = []
+    print(f"{'lang':<4} {'files':>6} {'stage':<24} {'seconds':>9} {'peak KB':>10}  extra")
+    for lang in args.langs.split(","):
+        for n in (int(x) for x in args.sizes.split(",")):
+            for r in bench_repo(lang, n, memory=not args.no_memory, repeat=args.repeat):
+                rows.append(r)
+                extra = {k: v for k, v in r.items() if k not in ("lang", "files", "stage", "seconds", "peak_kb")}
+                peak = f"{r['peak_kb']:.0f}" if r["peak_kb"] is not None else "-"
+                print(f"{lang:<4} {n:>6} {r['stage']:<24} {r['seconds']:>9.4f} {peak:>10}  {extra or ''}")
+
+    mismatched = []
+    if args.check_files:
+        print()
+        mismatched += check_gitignore()
+        for lang in args.langs.split(","):
+            mismatched += check_repo(lang, args.check_files)
+
+    if args.json:
+        report = {"commit": _git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+                  "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "results": rows}
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=1)
+        print(f"\nwrote {args.json}")
+    if args.compare and compare(rows, args.compare, args.threshold):
+        return 1
+    slow = [r for r in rows if r["stage"] == "scan_file" and r.get("target_mb_per_s") and r["mb_per_s"] < r["target_mb_per_s"]]
+    for r in slow:
+        print(f"  {r['lang']} {r['files']}: scan_file {r['mb_per_s']} MB/s is below the {r['target_mb_per_s']} MB/s target")
+    for name in mismatched:
+        print(f"  MISMATCH: {name}")
+    return 1 if mismatched or (slow and args.check_targets) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
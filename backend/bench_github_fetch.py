@@ -0,0 +1,384 @@
+"""
+Offline benchmark for github_fetcher against a local stand-in for the GitHub API.
+
+Serves a synthetic repo (tree, contents and tarball endpoints, with per-request
+latency and a few missing files) from a ThreadingHTTPServer on 127.0.0.1, points
+github_fetcher.GITHUB_API at it, and fetches the repo at several concurrency
+levels, with and without following imports (reporting dependency edges among
+the fetched files), for one subdirectory and in archive mode. Each run reports wall time, the slowest single
+request, requests made and TCP connections opened; it exits 1 if any contents
+run returns different files (order, max_files) than the serial fetch, or if the
+archive run disagrees with an unlimited contents fetch on paths or blob shas.
+Then it fetches with the github_cache stores in a temporary directory: cold,
+warm (one conditional tree request answered with 304) and after one file changes.
+Finally the server reports X-RateLimit headers: one run hits secondary rate
+limits (403 + Retry-After) and must still return the serial result, and one
+starts with a budget too small for max_files and must stay within it, fetching
+entry points before tests; their coverage reports are printed. Last, repo
+snapshots: eight concurrent repo_snapshot calls must share one fetch, and a
+repeat costs one conditional commit request.
+
+    python bench_github_fetch.py
+    python bench_github_fetch.py --files 200 --max-files 80 --latency-ms 80 --concurrency 1,4,8,16
+"""
+import argparse
+import hashlib
+import io
+import json
+import tarfile
+import tempfile
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+import codebase_parser
+import github_cache
+import github_fetcher
+import github_scheduler
+import repo_snapshots
+
+
+class StandInGitHub(ThreadingHTTPServer):
+    """Minimal /repos/{owner}/{repo}, /git/trees, /git/blobs and /contents endpoints over an in-memory repo."""
+
+    daemon_threads = True
+
+    def __init__(self, files, latency_s, jitter_s=0.0, missing=()):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.files = files  # path -> content
+        self.latency_s, self.jitter_s = latency_s, jitter_s
+        self.missing = set(missing)
+        self.lock = threading.Lock()
+        self.connections = set()
+        self.requests = 0
+        self.not_modified = 0
+        self.slowest_s = 0.0
+        self.rate_remaining = None  # None: no rate limit headers
+        self.secondary = 0  # content requests still to answer with a secondary rate limit
+        self.limited = 0
+        self._tarball = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset_stats(self):
+        with self.lock:
+            self.connections.clear()
+            self.requests = 0
+            self.not_modified = 0
+            self.slowest_s = 0.0
+            self.limited = 0
+
+    def change(self, path, content):
+        """Edit one file, as a push would (the tree, its ETag and the tarball change)."""
+        self.files[path] = content
+        self._tarball = None
+
+    def tarball(self):
+        """gzipped tar of the repo under an "acme-app-<sha>/" prefix, like GitHub's (missing files included)."""
+        if self._tarball is None:
+            buf = io.BytesIO()
+            with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+                for path, content in self.files.items():
+                    data = content.encode("utf-8")
+                    info = tarfile.TarInfo(f"acme-app-0123abc/{path}")
+                    info.size = len(data)
+                    tar.addfile(info, io.BytesIO(data))
+            self._tarball = buf.getvalue()
+        return self._tarball
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled sessions reuse connections
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json", headers=()):
+        data = body if isinstance(body, bytes) else body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if self.server.rate_remaining is not None:
+            headers = list(headers) + [("X-RateLimit-Limit", "60"), ("X-RateLimit-Remaining", str(self.server.rate_remaining)),
+                                       ("X-RateLimit-Reset", str(int(time.time()) + 3600))]
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _delay(self):
+        server = self.server
+        delay = server.latency_s + random.uniform(0, server.jitter_s)
+        time.sleep(delay)
+        with server.lock:
+            server.slowest_s = max(server.slowest_s, delay)
+
+    def _not_modified(self, etag):
+        """Answer 304 if If-None-Match matches; as on GitHub, that does not count against the rate limit."""
+        if self.headers.get("If-None-Match") != etag:
+            return False
+        with self.server.lock:
+            self.server.not_modified += 1
+        self._send(304, b"", headers=[("ETag", etag)])
+        return True
+
+    def _rate_limited(self):
+        """Spend one request of the rate limit; once it is spent, answer 403 and return True."""
+        server = self.server
+        with server.lock:
+            spent = server.rate_remaining == 0
+            if server.rate_remaining:
+                server.rate_remaining -= 1
+            if spent:
+                server.limited += 1
+        if spent:
+            self._send(403, json.dumps({"message": "API rate limit exceeded"}))
+        return spent
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.connections.add(self.client_address)
+            server.requests += 1
+        parts = unquote(urlparse(self.path).path).strip("/").split("/")
+        if len(parts) >= 5 and parts[3] == "commits":
+            tree = sorted((p, github_fetcher.git_blob_sha(c.encode("utf-8"))) for p, c in server.files.items())
+            sha = hashlib.sha1(json.dumps(tree).encode("utf-8")).hexdigest()
+            etag = '"%s"' % sha
+            if self._not_modified(etag) or self._rate_limited():
+                return
+            return self._send(200, sha, "application/vnd.github.sha", headers=[("ETag", etag)])
+        if len(parts) >= 5 and parts[3:5] == ["git", "trees"]:
+            tree = [{"path": p, "sha": github_fetcher.git_blob_sha(c.encode("utf-8")), "type": "blob",
+                     "size": len(c.encode("utf-8"))} for p, c in server.files.items()]
+            body = json.dumps({"tree": tree})
+            etag = '"%s"' % hashlib.sha1(body.encode("utf-8")).hexdigest()
+            if self._not_modified(etag) or self._rate_limited():
+                return
+            return self._send(200, body, headers=[("ETag", etag)])
+        if self._rate_limited():
+            return
+        if len(parts) == 3 and parts[0] == "repos":
+            return self._send(200, json.dumps({"default_branch": "main"}))
+        if len(parts) >= 4 and parts[3] == "tarball":
+            # GitHub answers with a redirect to codeload
+            return self._send(302, b"", headers=[("Location", f"{server.url}/codeload/{parts[1]}/{parts[2]}")])
+        if parts[0] == "codeload":
+            self._delay()
+            return self._send(200, server.tarball(), "application/x-gzip")
+        if len(parts) >= 5 and (parts[3] == "contents" or parts[3:5] == ["git", "blobs"]):
+            if parts[3] == "contents":
+                path = "/".join(parts[4:])
+            else:
+                shas = {github_fetcher.git_blob_sha(c.encode("utf-8")): p for p, c in server.files.items()}
+                path = shas.get(parts[5] if len(parts) > 5 else "")
+            self._delay()
+            with server.lock:
+                secondary = server.secondary > 0
+                server.secondary -= secondary
+                server.limited += secondary
+            if secondary:
+                return self._send(403, json.dumps({"message": "You have exceeded a secondary rate limit."}),
+                                  headers=[("Retry-After", "1")])
+            if path in server.missing or path not in server.files:
+                return self._send(404, json.dumps({"message": "Not Found"}))
+            return self._send(200, server.files[path], "text/plain")
+        return self._send(404, json.dumps({"message": "Not Found"}))
+
+
+def make_files(n_files, seed=0):
+    """path -> content for a small synthetic repo, with some non-code and binary files mixed in; .py files import two others."""
+    rng = random.Random(seed)
+    files = {}
+    exts = [rng.choice([".py", ".py", ".js", ".md", ".png"]) for _ in range(n_files)]
+    modules = [f"pkg{i % 7}.m{i}" for i in range(n_files) if exts[i] == ".py"]
+    for i, ext in enumerate(exts):
+        imports = "".join(f"import {m}\n" for m in rng.sample(modules, 2)) if ext == ".py" else ""
+        files[f"pkg{i % 7}/m{i}{ext}"] = f"# file {i}\n{imports}" + "x = 1\n" * rng.randint(1, 50)
+    files["node_modules/lib/index.js"] = "module.exports = 1\n"
+    files["tests/test_app.py"] = "def test_app():\n    pass\n"
+    files["pkg6/main.py"] = "import pkg0\n"
+    files["pkg3/compiled.js"] = "\0asm\1\0\0\0"  # binary under a code extension: skipped in every mode
+    files["pkg0/huge.py"] = "x = 1\n" * (github_fetcher.MAX_FILE_SIZE // 6 + 1)
+    return files
+
+
+def use_cache(cache_dir, memory=False):
+    """Point github_fetcher at fresh blob / response stores in cache_dir (None disables them unless memory)."""
+    github_fetcher.blob_store = github_cache.BlobStore(cache_dir, memory_bytes=github_cache.BLOB_MEMORY_BYTES
+                                                       if memory else 0)
+    github_fetcher.response_cache = github_cache.ResponseCache(cache_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark github_fetcher against a local stand-in server.")
+    parser.add_argument("--files", type=int, default=200, help="files in the synthetic repo tree")
+    parser.add_argument("--max-files", type=int, default=80)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="delay per content request")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="extra random delay per content request")
+    parser.add_argument("--missing", type=int, default=5, help="code files that return 404")
+    parser.add_argument("--concurrency", default="1,4,8,16", help="comma-separated levels; 1 is the serial baseline")
+    args = parser.parse_args(argv)
+
+    files = make_files(args.files)
+    missing = [p for p in files if p.endswith(".py")][:args.missing]
+    server = StandInGitHub(files, args.latency_ms / 1000, args.jitter_ms / 1000, missing)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    github_fetcher.GITHUB_API = server.url
+
+    baseline = None
+    mismatched = False
+    use_cache(None)
+    print(f"{'mode':<20} {'files':>6} {'seconds':>9} {'slowest req':>12} {'requests':>9} {'304s':>5} {'connections':>12}")
+
+    def run(label, **kwargs):
+        server.reset_stats()
+        start = time.perf_counter()
+        result = github_fetcher.fetch_repo_files("acme/app", **kwargs)
+        seconds = time.perf_counter() - start
+        print(f"{label:<20} {len(result):>6} {seconds:>9.3f} {server.slowest_s:>11.3f}s {server.requests:>9}"
+              f" {server.not_modified:>5} {len(server.connections):>12}", end="")
+        return result
+
+    try:
+        for level in (int(x) for x in args.concurrency.split(",")):
+            paths = [f["path"] for f in run(f"contents x{level}", max_files=args.max_files, concurrency=level)]
+            if baseline is None:
+                baseline = paths
+            mismatched = mismatched or paths != baseline
+            print("" if paths == baseline else "  MISMATCH vs serial")
+        fetched = run("contents all", max_files=10 ** 6, concurrency=32)
+        everything = {(f["path"], f["sha"]) for f in fetched}
+        # contents are the tree's blobs, whatever the default branch holds
+        pinned = all(github_fetcher.git_blob_sha(f["content"].encode("utf-8")) == f["sha"] for f in fetched)
+        mismatched = mismatched or not pinned
+        print("" if pinned else "  CONTENT DOES NOT MATCH TREE SHA")
+        # with imports followed, more of the fetched files are connected in the map
+        for label, follow in (("contents ranked", False), ("contents +imports", True)):
+            coverage = {}
+            picked = run(label, max_files=args.max_files, follow_imports=follow, coverage=coverage,
+                         **repo_snapshots.RANKING)
+            edges = sum(1 for _, _, kind in codebase_parser.build_codebase_graph(picked).edges if kind == "dependency")
+            print(f"  {edges} dependency edges, {coverage['followed']} followed")
+        # a subdirectory scope is applied to the tree, so only its files are requested
+        scoped = {(f["path"], f["sha"]) for f in run("contents pkg1/ only", max_files=10 ** 6, path="pkg1")}
+        expected = {(p[5:], sha) for p, sha in everything if p.startswith("pkg1/")}
+        mismatched = mismatched or scoped != expected
+        print("" if scoped == expected else "  MISMATCH vs contents all")
+        archive = {(f["path"], f["sha"]) for f in run("archive", mode="archive")}
+        # files that 404 through /contents are still in the tarball
+        expected = everything | {(p, github_fetcher.git_blob_sha(files[p].encode("utf-8"))) for p in missing}
+        mismatched = mismatched or archive != expected
+        print("" if archive == expected else "  MISMATCH vs contents")
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            use_cache(cache_dir)
+            cold = run("contents cold cache", max_files=args.max_files)
+            print()
+            warm = run("contents warm cache", max_files=args.max_files)
+            mismatched = mismatched or warm != cold
+            print("" if warm == cold else "  MISMATCH vs cold")
+            warm_requests = server.requests
+            server.change(cold[0]["path"], cold[0]["content"] + "# changed\n")
+            changed = run("contents 1 changed", max_files=args.max_files)
+            print()
+            mismatched = mismatched or [f["path"] for f in changed] != [f["path"] for f in cold]
+            use_cache(None)
+
+        # without a cache dir, blobs are still kept in memory: a warm run costs what it does with the disk
+        use_cache(None, memory=True)
+        cold = run("contents cold memory", max_files=args.max_files)
+        print()
+        warm = run("contents warm memory", max_files=args.max_files)
+        same = warm == cold and server.requests == warm_requests
+        print("" if same else "  MISMATCH vs warm cache")
+        mismatched = mismatched or not same
+        use_cache(None)
+
+        github_fetcher.scheduler = github_scheduler.RequestScheduler()
+        server.rate_remaining = 10 ** 6
+        server.secondary = 3
+        limited = run("secondary limits", max_files=args.max_files)
+        print(f"  {server.limited} limited" + ("" if [f["path"] for f in limited] == baseline else "  MISMATCH vs serial"))
+        mismatched = mismatched or [f["path"] for f in limited] != baseline
+
+        server.rate_remaining = budget = args.max_files // 4
+        coverage = {}
+        short = run("short budget", max_files=args.max_files, coverage=coverage)
+        print(f"  {server.limited} limited")
+        print("  coverage:", json.dumps({k: v for k, v in coverage.items() if k not in ("failedPaths", "rateLimit")}))
+        paths = [f["path"] for f in short]
+        # tree request + at most budget - BUDGET_RESERVE downloads, never a refused one; main.py before tests
+        within = server.requests <= budget - github_fetcher.BUDGET_RESERVE + 1 and server.limited == 0
+        if not within or "pkg6/main.py" not in paths or "tests/test_app.py" in paths:
+            mismatched = True
+            print("  BUDGET NOT RESPECTED")
+
+        server.rate_remaining = None
+        github_fetcher.scheduler = github_scheduler.RequestScheduler()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            use_cache(cache_dir)
+            store = repo_snapshots.snapshot_store = repo_snapshots.SnapshotStore(disk_dir=cache_dir,
+                                                                                   blobs=github_fetcher.blob_store)
+            server.reset_stats()
+            start = time.perf_counter()
+            snapshots = []
+            threads = [threading.Thread(target=lambda: snapshots.append(repo_snapshots.repo_snapshot("acme/app")))
+                       for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            seconds = time.perf_counter() - start
+            print(f"{'snapshot x8 callers':<20} {len(snapshots[0].files):>6} {seconds:>9.3f}"
+                  f" {server.slowest_s:>11.3f}s {server.requests:>9} {server.not_modified:>5} {len(server.connections):>12}"
+                  f"  {store.builds} build(s)")
+            mismatched = mismatched or store.builds != 1 or len(snapshots) != 8 or len({id(x) for x in snapshots}) != 1
+            server.reset_stats()
+            start = time.perf_counter()
+            again = repo_snapshots.repo_snapshot("acme/app")
+            seconds = time.perf_counter() - start
+            print(f"{'snapshot repeat':<20} {len(again.files):>6} {seconds:>9.3f} {server.slowest_s:>11.3f}s"
+                  f" {server.requests:>9} {server.not_modified:>5} {len(server.connections):>12}")
+            store.clear()  # as in a fresh worker: rebuilt from the manifest and local blobs
+            server.reset_stats()
+            restored = repo_snapshots.repo_snapshot("acme/app")
+            print(f"{'snapshot from disk':<20} {len(restored.files):>6} {'':>9} {'':>12} {server.requests:>9}"
+                  f" {server.not_modified:>5}")
+            same = [f["sha"] for f in restored.files] == [f["sha"] for f in again.files]
+            mismatched = mismatched or server.requests != 1 or not same or store.builds != 0
+            # with the budget spent, the commit check is still a free 304 and the snapshot is served
+            server.rate_remaining = 0
+            server.reset_stats()
+            try:
+                served = [repo_snapshots.repo_snapshot("acme/app") for _ in range(2)]
+            except github_scheduler.RateLimitError:
+                served = []
+            print(f"{'snapshot, no budget':<20} {len(served[-1].files) if served else 0:>6} {'':>9} {'':>12}"
+                  f" {server.requests:>9} {server.not_modified:>5}" + ("" if served else "  REFUSED"))
+            mismatched = mismatched or not served or any(s is not restored for s in served) or server.limited != 0
+            server.rate_remaining = None
+            github_fetcher.scheduler = github_scheduler.RequestScheduler()
+            # a streamed snapshot keeps only (path, sha); its contents are read back from the blobs
+            store.clear()
+            streamed = [(f["path"], f["sha"]) for f in repo_snapshots.iter_snapshot_files("acme/app", path="pkg2")]
+            server.reset_stats()
+            reread = repo_snapshots.repo_snapshot("acme/app", path="pkg2")
+            print(f"{'snapshot streamed':<20} {len(reread.files):>6} {'':>9} {'':>12} {server.requests:>9}"
+                  f" {server.not_modified:>5}  {store.builds} build(s)")
+            same = [(f["path"], f["sha"]) for f in reread.files] == streamed
+            mismatched = mismatched or not same or store.builds != 0 or server.requests != 1
+            use_cache(None)
+    finally:
+        server.shutdown()
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Which files are mapped: code extensions outside common non-source dirs, not
+binary and not oversized. Shared by every ingestion path (GitHub, archive
+uploads, server-side directories), along with the .gitignore glob syntax.
+"""
+import re
+
+MAX_FILE_SIZE = 500_000  # 500KB - skip larger files
+BINARY_SNIFF_BYTES = 64 * 1024  # a NUL byte this early marks a binary file
+# stylesheets are mapped so CSS imports resolve (codebase_parser.RESOLVE_EXTENSIONS), from every source
+CODE_EXTENSIONS = {".py", ".js", ".jsx", ".ts", ".tsx", ".css", ".scss", ".java", ".go", ".rb", ".rs", ".c", ".cpp", ".h", ".cc", ".cxx", ".hh", ".hpp"}
+SKIP_DIRS = {"node_modules", "__pycache__", ".git", "dist", "build", ".venv", "venv"}  # common non-source dirs
+
+
+def is_code_path(path: str) -> bool:
+    """Code extension and no common non-source dir (node_modules, .git, ...) in the path."""
+    parts = path.lower().split("/")
+    if any(skip in parts for skip in SKIP_DIRS):
+        return False
+    ext = "." + path.split(".")[-1].lower() if "." in path else ""
+    return ext in CODE_EXTENSIONS
+
+
+def is_binary(data: bytes) -> bool:
+    """NUL byte near the start: binary content under a code extension."""
+    return b"\0" in data[:BINARY_SNIFF_BYTES]
+
+
+def glob_regex(pattern: str, any_depth: bool = False, subtree: bool = False) -> str:
+    """
+    Translate one .gitignore glob to a regex body: * and ? stop at /, and ** as a
+    whole segment crosses directories (elsewhere it is a plain *, as in git).
+    any_depth lets the pattern start below the top; subtree lets the match be a
+    directory with anything below it. Every wildcard but the last takes its
+    leftmost match inside an atomic group (never revisited), so no pattern can
+    make a long path backtrack catastrophically.
+    """
+    parts = pattern.split("/")
+    parts = [p for i, p in enumerate(parts) if not (p == "**" and i and parts[i - 1] == "**")]
+    out, chunk, gap = [], [], False
+    for part in (["**"] if any_depth else []) + parts:
+        if part != "**":
+            chunk.append(_segment_regex(part))
+            continue
+        if chunk:
+            out.append(_gap_then("/".join(chunk) + "/", gap, atomic=True))
+            chunk = []
+        gap = True
+    if chunk and subtree:
+        out.append(_gap_then("/".join(chunk) + "(?=/|$)", gap, atomic=True) + "(?:/.*)?")
+    elif chunk:
+        out.append(_gap_then("/".join(chunk), gap, atomic=False))
+    elif gap:
+        out.append(".*")
+    return "".join(out)
+
+
+def _gap_then(chunk: str, gap: bool, atomic: bool) -> str:
+    if not gap:
+        return chunk
+    return f"(?>(?:[^/]*/)*?{chunk})" if atomic else f"(?:[^/]*/)*{chunk}"
+
+
+def _segment_regex(part: str) -> str:
+    """One path segment; the same leftmost-match scheme as glob_regex with * as the gap."""
+    chunks, chunk, i, n = [], [], 0, len(part)
+    while i < n:
+        if part[i] == "*":
+            chunks.append("".join(chunk))
+            chunk = []
+            while i < n and part[i] == "*":
+                i += 1
+        elif part[i] == "?":
+            chunk.append("[^/]")
+            i += 1
+        elif part[i] == "[" and "]" in part[i + 2:]:
+            j = part.index("]", i + 2)
+            body = part[i + 1:j].replace("\\", "\\\\")
+            chunk.append("[" + ("^" + body[1:] if body[0] in "!^" else body) + "]")
+            i = j + 1
+        elif part[i] == "\\" and i + 1 < n:
+            chunk.append(re.escape(part[i + 1]))
+            i += 2
+        else:
+            chunk.append(re.escape(part[i]))
+            i += 1
+    if not chunks:
+        return "".join(chunk)
+    middle = "".join(f"(?>[^/]*?{c})" for c in chunks[1:])
+    return chunks[0] + middle + "[^/]*" + "".join(chunk)
@@ -0,0 +1,229 @@
+"""
+In-memory graph used while building a codebase map.
+Nodes and edges are kept in insertion-ordered dicts (edges keyed by
+(source, target, type)), and parent -> children plus typed adjacency lists
+are indexed so lookups and removals never rescan the node or edge lists.
+To keep large maps small, nodes are slotted records, an edge's value is just
+its weight (None for most edges), and ids are interned so every index shares
+one string per id. JSON dicts are only built by to_dict / drain_journal.
+"""
+import sys
+from typing import List, Dict, Any, Tuple, Optional
+
+EdgeKey = Tuple[str, str, Optional[str]]
+NON_SYMBOL_TYPES = ("folder", "file", "route")  # every other node type is a named definition
+
+
+class Node:
+    """One folder, file or item (function/class/route/component)."""
+
+    __slots__ = ("id", "label", "type", "parent")
+
+    def __init__(self, id_: str, label: str, node_type: str, parent: Optional[str]):
+        self.id = id_
+        self.label = label
+        self.type = node_type
+        self.parent = parent
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "label": self.label, "type": self.type, "parent": self.parent}
+
+
+def edge_dict(key: EdgeKey, weight: Optional[int] = None) -> Dict[str, Any]:
+    """JSON shape of an edge: { source, target, type?, weight? }."""
+    source, target, edge_type = key
+    edge = {"source": source, "target": target}
+    if edge_type:
+        edge["type"] = edge_type
+    if weight is not None:
+        edge["weight"] = weight
+    return edge
+
+
+class CodebaseGraph:
+    """Nodes, edges and indexes for one codebase map. Serialize with to_dict()."""
+
+    def __init__(self):
+        self.nodes: Dict[str, Node] = {}
+        self.edges: Dict[EdgeKey, Optional[int]] = {}  # key -> weight
+        self.children: Dict[str, List[str]] = {}
+        self.out_edges: Dict[str, Dict[str, List[str]]] = {}
+        self.in_edges: Dict[str, Dict[str, List[str]]] = {}
+        # Per-file parse state, kept so the map can be updated incrementally
+        self.file_paths: Dict[str, None] = {}  # ordered set of file paths
+        self.file_imports: Dict[str, List[str]] = {}
+        self.importers: Dict[str, set] = {}  # import string -> paths importing it
+        self.path_index = None
+        # Symbol index: definition name -> item node ids, and each file's references
+        # as {scope node id: sorted identifiers used there}
+        self.symbols: Dict[str, List[str]] = {}
+        self.references: Dict[str, Dict[str, Tuple[str, ...]]] = {}
+        self.referrers: Dict[str, set] = {}  # identifier -> paths of files that reference it
+        # "uses" edge policy (None = codebase_parser defaults) and the current plan:
+        # (source file id, target file id) -> (expanded to item edges?, item pair count)
+        self.uses_mode: Optional[str] = None
+        self.uses_budget: Optional[int] = None
+        self.uses_plan: Dict[Tuple[str, str], Tuple[bool, int]] = {}
+        # The planned dependencies as (pairs, source, target), cheapest first; the first
+        # uses_cutoff are expanded, spending uses_spent of uses_total pairs
+        self.uses_order: List[Tuple[int, str, str]] = []
+        self.uses_cutoff = 0
+        self.uses_spent = 0
+        self.uses_total = 0
+        self.uses_by_file: Dict[str, set] = {}  # file id -> its planned dependencies
+        self.uses_summary: Optional[Dict[str, Any]] = None
+        # When a list, every added node/edge is also appended here (used for streaming)
+        self.journal: Optional[List[Tuple[str, Any]]] = None
+        # Derived per-node data (e.g. subtree counts); reset whenever nodes change
+        self.stats: Optional[Dict[str, Any]] = None
+        # Cached whole-graph query results (see map_queries); cleared whenever edges change
+        self.query_cache: Dict[str, Any] = {}
+        # True while the graph also belongs to a repo snapshot (see repo_snapshots); copy it before mutating
+        self.shared = False
+
+    def add_node(self, id_: str, label: str, node_type: str = "file", parent: str = None) -> bool:
+        """Add a node once. Returns False if it already existed."""
+        if id_ in self.nodes:
+            return False
+        id_ = sys.intern(id_)
+        parent = sys.intern(parent) if parent is not None else None
+        node = self.nodes[id_] = Node(id_, sys.intern(label), node_type, parent)
+        self.stats = None
+        if node_type not in NON_SYMBOL_TYPES:
+            self.symbols.setdefault(label, []).append(id_)
+        if self.journal is not None:
+            self.journal.append(("node", node))
+        if parent is not None:
+            self.children.setdefault(parent, []).append(id_)
+        return True
+
+    def remove_node(self, id_: str) -> None:
+        """Remove a node, its incident edges and its entry in the parent's children."""
+        node = self.nodes.pop(id_, None)
+        if node is None:
+            return
+        self.stats = None
+        if node.type not in NON_SYMBOL_TYPES:
+            definitions = self.symbols[node.label]
+            definitions.remove(id_)
+            if not definitions:
+                del self.symbols[node.label]
+        for adjacency, outgoing in ((self.out_edges, True), (self.in_edges, False)):
+            for edge_type, by_node in adjacency.items():
+                for other in list(by_node.get(id_, ())):
+                    if outgoing:
+                        self.remove_edge(id_, other, edge_type)
+                    else:
+                        self.remove_edge(other, id_, edge_type)
+        parent = node.parent
+        if parent is not None and parent in self.children:
+            self.children[parent].remove(id_)
+            if not self.children[parent]:
+                del self.children[parent]
+        self.children.pop(id_, None)
+
+    def add_edge(self, source: str, target: str, edge_type: str = None, weight: int = None) -> bool:
+        """Add an edge once per (source, target, type). Returns False for duplicates."""
+        key = (source, target, edge_type)
+        if key in self.edges:
+            return False
+        source, target = sys.intern(source), sys.intern(target)
+        key = (source, target, edge_type)
+        self.edges[key] = weight
+        if self.query_cache:
+            self.query_cache.clear()
+        if self.journal is not None:
+            self.journal.append(("edge", key))
+        self.out_edges.setdefault(edge_type, {}).setdefault(source, []).append(target)
+        self.in_edges.setdefault(edge_type, {}).setdefault(target, []).append(source)
+        return True
+
+    def remove_edge(self, source: str, target: str, edge_type: str = None) -> bool:
+        key = (source, target, edge_type)
+        if key not in self.edges:
+            return False
+        del self.edges[key]
+        if self.query_cache:
+            self.query_cache.clear()
+        for adjacency, a, b in ((self.out_edges, source, target), (self.in_edges, target, source)):
+            neighbours = adjacency[edge_type][a]
+            neighbours.remove(b)
+            if not neighbours:
+                del adjacency[edge_type][a]
+        return True
+
+    def has_edge(self, source: str, target: str, edge_type: str = None) -> bool:
+        return (source, target, edge_type) in self.edges
+
+    def edge_weight(self, source: str, target: str, edge_type: str = None) -> int:
+        """Weight of an existing edge; unweighted edges count as 1."""
+        weight = self.edges[(source, target, edge_type)]
+        return 1 if weight is None else weight
+
+    def items_of(self, file_id: str) -> List[str]:
+        """Function/class/route/component node ids declared in a file."""
+        return self.children.get(file_id, [])
+
+    def definitions(self, name: str) -> List[str]:
+        """Item node ids defining a function/class/component called `name`."""
+        return self.symbols.get(name, [])
+
+    def referencing_files(self, name: str) -> List[str]:
+        """Paths of files that mention the identifier `name`, sorted."""
+        return sorted(self.referrers.get(name, ()))
+
+    def set_references(self, path: str, scopes: Dict[str, Tuple[str, ...]]) -> None:
+        """Replace a file's references ({scope id: names}), keeping referrers in step."""
+        self.remove_references(path)
+        self.references[path] = scopes
+        for name in {name for names in scopes.values() for name in names}:
+            self.referrers.setdefault(name, set()).add(path)
+
+    def remove_references(self, path: str) -> None:
+        for name in {name for names in self.references.pop(path, {}).values() for name in names}:
+            paths = self.referrers[name]
+            paths.discard(path)
+            if not paths:
+                del self.referrers[name]
+
+    def successors(self, node_id: str, edge_type: str = None) -> List[str]:
+        return self.out_edges.get(edge_type, {}).get(node_id, [])
+
+    def predecessors(self, node_id: str, edge_type: str = None) -> List[str]:
+        return self.in_edges.get(edge_type, {}).get(node_id, [])
+
+    def is_connected(self, node_id: str) -> bool:
+        """True if the node is the source or target of at least one edge."""
+        return any(node_id in by_node for by_node in self.out_edges.values()) or any(
+            node_id in by_node for by_node in self.in_edges.values()
+        )
+
+    def connected_ids(self) -> set:
+        """Ids of every node that is the source or target of at least one edge."""
+        ids = set()
+        for source, target, _ in self.edges:
+            ids.add(source)
+            ids.add(target)
+        return ids
+
+    def drain_journal(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Return (as JSON dicts) and clear nodes/edges added since the last drain."""
+        entries, self.journal = self.journal or [], []
+        return [
+            (kind, entry.to_dict() if kind == "node" else edge_dict(entry, self.edges.get(entry)))
+            for kind, entry in entries
+        ]
+
+    def size(self) -> Tuple[int, int]:
+        return len(self.nodes), len(self.edges)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize to the { nodes, edges, files, usesEdges? } shape returned by /api/codebase-map."""
+        result = {
+            "nodes": [node.to_dict() for node in self.nodes.values()],
+            "edges": [edge_dict(key, weight) for key, weight in self.edges.items()],
+            "files": list(self.file_paths),
+        }
+        if self.uses_summary is not None:
+            result["usesEdges"] = self.uses_summary
+        return result
@@ -1,287 +1,887 @@
 """
 Parse code files to extract structure: folders, files, functions, classes, routes.
-Also extracts imports for dependency edges between files/components.
+Also extracts imports for dependency edges between files, and the identifiers
+each function/class/component references, which resolve "uses" edges through
+the graph's symbol index.
 """
+import bisect
+import importlib
+import itertools
+import keyword
+import multiprocessing
 import re
 import os
-from typing import List, Dict, Any, Tuple
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Tuple, Iterable, Iterator
 
+from codebase_graph import NON_SYMBOL_TYPES, CodebaseGraph
+from disk_cache import git_blob_sha
+from parse_cache import ParseCache, parse_cache
 
-def extract_python_imports(content: str, filepath: str) -> List[str]:
-    """Extract imported modules/paths from Python file (relative to project)."""
+PARSER_VERSION = "4"  # bump whenever scanner output changes, to invalidate cached parses
+
+
+RESOLVE_EXTENSIONS = [".js", ".jsx", ".ts", ".tsx", ".py", ".css", ".scss"]
+INDEX_BASENAMES = {"index", "__init__"}
+# Languages whose imports name a directory: Rust's foo/mod.rs is module foo,
+# and every file of a Go package stands for its directory
+EXTENSION_INDEX_BASENAMES = {".rs": {"mod"}}
+DIRECTORY_PACKAGE_EXTENSIONS = {".go"}
+
+
+def _extension_rank(path: str) -> int:
+    ext = os.path.splitext(path)[1].lower()
+    return RESOLVE_EXTENSIONS.index(ext) if ext in RESOLVE_EXTENSIONS else len(RESOLVE_EXTENSIONS)
+
+
+def _path_rank(path: str) -> Tuple[int, int]:
+    return path.count("/"), _extension_rank(path)
+
+
+def _index_keys(np: str) -> List[str]:
+    """Full path, extension-stripped path, and the directory for index.* / __init__.py / mod.rs / Go files."""
+    base, ext = os.path.splitext(np)
+    keys = [np, base]
+    folder, name = base.rsplit("/", 1) if "/" in base else ("", base)
+    if not folder:
+        return keys
+    ext = ext.lower()
+    if name in INDEX_BASENAMES or name in EXTENSION_INDEX_BASENAMES.get(ext, ()):
+        keys.append(folder)
+    elif ext in DIRECTORY_PACKAGE_EXTENSIONS and not name.endswith("_test"):
+        keys.append(folder)
+    return keys
+
+
+class PathIndex:
+    """
+    Lookup table for resolving import paths to files, built once per map.
+    Keys are the full path, the extension-stripped path, the directory for
+    index.* / __init__.py files, and every trailing segment suffix of those
+    (so `pkg/mod` finds `backend/pkg/mod.py`). Lookups are dict hits. Paths that
+    lost a key are remembered, so remove() hands it to the next best one.
+    """
+
+    def __init__(self, all_paths: List[str]):
+        self.exact: Dict[str, str] = {}
+        self.suffix: Dict[str, str] = {}
+        self.shadowed: Dict[Tuple[int, str], List[str]] = {}  # (table, key) -> paths that lost it
+        self.order: Dict[str, int] = {}  # path -> insertion number, for ties
+        self._added = 0
+        for np in sorted((p.replace("\\", "/") for p in all_paths), key=_path_rank):
+            self.add(np)
+
+    def add(self, np: str) -> None:
+        """Register one file path. Shallower paths and preferred extensions win; ties keep the earlier path."""
+        if np in self.order:
+            return
+        self._added += 1
+        self.order[np] = self._added
+        rank = _path_rank(np)
+        for table, key in self.keys_of(np):
+            self._claim(table, key, np, rank)
+
+    def remove(self, np: str) -> None:
+        """Unregister one file path; keys it held go to the best remaining path that had them."""
+        if self.order.pop(np, None) is None:
+            return
+        for table, key in self.keys_of(np):
+            tables = self.suffix if table else self.exact
+            losers = self.shadowed.get((table, key))
+            if tables.get(key) != np:
+                losers.remove(np)
+            elif losers:
+                tables[key] = min(losers, key=lambda p: (_path_rank(p), self.order[p]))
+                losers.remove(tables[key])
+            else:
+                del tables[key]
+            if losers is not None and not losers:
+                del self.shadowed[(table, key)]
+
+    @staticmethod
+    def keys_of(np: str) -> List[Tuple[int, str]]:
+        """(0, exact key) and (1, suffix key) pairs for one path, without repeats."""
+        keys = {}
+        for key in _index_keys(np):
+            keys[(0, key)] = None
+            parts = key.split("/")
+            for i in range(1, len(parts)):
+                keys[(1, "/".join(parts[i:]))] = None
+        return list(keys)
+
+    def _claim(self, table: int, key: str, np: str, rank: Tuple[int, int]) -> None:
+        tables = self.suffix if table else self.exact
+        current = tables.get(key)
+        if current is None:
+            tables[key] = np
+            return
+        if rank < _path_rank(current):
+            tables[key], np = np, current
+        self.shadowed.setdefault((table, key), []).append(np)
+
+    def resolve(self, imp_path: str) -> str | None:
+        """Return the file an import path refers to, or None."""
+        imp = imp_path.replace("\\", "/").strip("/")
+        if not imp:
+            return None
+        return self.exact.get(imp) or self.suffix.get(imp)
+
+
+def resolve_import_to_file(imp_path: str, all_paths: List[str], path_index: PathIndex = None) -> str | None:
+    """Resolve import path to actual file path in codebase. Pass a prebuilt PathIndex when resolving many imports."""
+    if path_index is None:
+        path_index = PathIndex(all_paths)
+    return path_index.resolve(imp_path)
+
+
+# (items, imports, references): references maps a scope ("" = module level,
+# else the name of the function/class/component it is in) to identifiers used there
+ScanResult = Tuple[List[Dict[str, Any]], List[str], Dict[str, List[str]]]
+
+PY_SKIP_MODULES = {"flask", "django", "requests", "os", "sys", "json", "re", "math", "random"}
+
+# One precompiled pattern per language, run with finditer over the whole
+# buffer (prefixed with "\n" so the first line looks like every other line).
+# Definitions and imports must start a line, so they are led by a literal
+# "\n" which lets the regex engine skip ahead quickly; routes, components
+# and JS import specifiers may appear anywhere in a line.
+PY_SCANNER = re.compile(
+    r"""\n[ \t]*(?:
+        class[ \t]+(?P<cls>\w+)[ \t]*[:(]
+      | (?:async[ \t]+)?def[ \t]+(?P<func>\w+)[ \t]*\(
+      | from[ \t]+(?P<dots>\.+)(?P<rel>[\w.]*)[ \t]+import
+      | from[ \t]+(?P<frm>\w[\w.]*)[ \t]+import
+      | import[ \t]+(?P<imp>\w[\w.]*)
+    )
+    | @\w+\.route[ \t]*\([ \t]*["'](?P<route>[^"'\n]+)["']
+    | path[ \t]*\([ \t]*["'](?P<path>[^"'\n]+)["']
+    """,
+    re.VERBOSE,
+)
+
+JS_SCANNER = re.compile(
+    r"""\n[ \t]*(?:
+        (?:export[ \t]+)?(?:async[ \t]+)?function[ \t]+(?P<func>\w+)[ \t]*\(
+      | (?:export[ \t]+)?const[ \t]+(?P<arrow>\w+)[ \t]*=[ \t]*(?:async[ \t]+)?\(
+    )
+    | function[ \t]+(?P<comp>[A-Z]\w*)[ \t]*\(
+    | from[ \t]+['"](?P<frm>[^'"\n]+)['"]
+    | import[ \t]+['"](?P<side>[^'"\n]+)['"]
+    """,
+    re.VERBOSE,
+)
+
+
+# Identifier tokenizing for scope_references: translate every other ASCII
+# character to a space and split (about twice as fast as a findall, and
+# offsets are preserved). WORDS suits any language with C-style identifiers.
+_WORD_CHARS = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_")
+WORDS = {c: " " for c in range(128) if chr(c) not in _WORD_CHARS}
+JS_WORDS = {c: " " for c in range(128) if chr(c) not in _WORD_CHARS | {"$"}}
+PY_STOPWORDS = frozenset(keyword.kwlist) | {"self", "cls"}
+JS_STOPWORDS = frozenset((
+    "break case catch class const continue default delete do else export extends false finally for from "
+    "function if import in instanceof let new null return super switch this throw true try typeof undefined "
+    "var void while with yield async await of"
+).split())
+
+
+def scope_references(text: str, scopes: List[Tuple[str, int, int]], words: Dict[int, str], stopwords) -> Dict[str, List[str]]:
+    """
+    Identifiers in each scope, given (name, header start, header end) per definition.
+    A scope runs from the end of its definition header to the start of the next
+    one; text before the first definition is module level ("").
+    """
+    refs: Dict[str, set] = {}
+    tokens = text.translate(words)
+    bounds = [("", 0, 0)] + scopes + [("", len(text), len(text))]
+    for (name, _, start), (_, end, _) in zip(bounds, bounds[1:]):
+        names = set(tokens[start:end].split())  # numbers too; they never match a definition
+        names.difference_update(stopwords)
+        if names:
+            refs.setdefault(name, set()).update(names)
+    return {name: list(names) for name, names in refs.items()}
+
+
+def _line_prefix(text: str, start: int) -> str:
+    """Text between the start of the line containing `start` and `start`, left-stripped."""
+    return text[text.rfind("\n", 0, start) + 1:start].lstrip()
+
+
+def scan_python(content: str, filepath: str, references: bool = True) -> ScanResult:
+    """Single pass over a Python file. Returns (items, imports, references); at most one item per line."""
+    items = []
     imports = []
+    scopes = []
     dir_path = os.path.dirname(filepath).replace("\\", "/")
-    for line in content.split("\n"):
-        stripped = line.strip()
-        if not stripped or stripped.startswith("#"):
-            continue
-        # from x.y.z import ... or import x.y
-        m = re.match(r"^(?:from\s+([\w\.]+)\s+import|import\s+([\w\.]+))", stripped)
-        if m:
-            mod = (m.group(1) or m.group(2) or "").strip()
-            if not mod or mod.startswith("_"):
+    text = "\n" + content
+    line, pos, item_line = 0, 0, 0
+    for m in PY_SCANNER.finditer(text):
+        start = m.start()
+        line += text.count("\n", pos, start + 1)
+        pos = start + 1
+        kind = m.lastgroup
+        if kind == "cls" or kind == "func":
+            items.append({"type": "class" if kind == "cls" else "function", "name": m.group(kind), "line": line})
+            scopes.append((m.group(kind), start, m.end()))
+            item_line = line
+        elif kind == "route" or kind == "path":
+            if item_line == line or _line_prefix(text, start).startswith("#"):
                 continue
-            skip = {"flask", "django", "requests", "os", "sys", "json", "re", "math", "random"}
-            if mod.split(".")[0].lower() in skip:
+            items.append({"type": "route", "name": m.group(kind), "line": line})
+            item_line = line
+        elif kind == "frm" or kind == "imp":
+            mod = m.group(kind)
+            if mod.startswith("_") or mod.split(".")[0].lower() in PY_SKIP_MODULES:
                 continue
             imports.append(mod.replace(".", "/"))
-        # from .x import or from ..x import (relative)
-        m = re.match(r"^from\s+(\.+)([\w\.]*)\s+import", stripped)
-        if m:
-            dots, rest = m.group(1), (m.group(2) or "").strip()
+        else:
+            # from .x import or from ..x import (relative)
+            dots, rest = m.group("dots"), m.group("rel") or ""
             base = dir_path
             for _ in range(len(dots) - 1):
                 base = os.path.dirname(base)
             resolved = os.path.normpath(os.path.join(base, rest.replace(".", "/"))).replace("\\", "/")
             if resolved:
                 imports.append(resolved)
-    return imports
+    return items, imports, scope_references(text, scopes, WORDS, PY_STOPWORDS) if references else {}
 
 
-def extract_js_imports(content: str, filepath: str) -> List[str]:
-    """Extract import paths from JS/TS/JSX file."""
+def scan_js(content: str, filepath: str, references: bool = True) -> ScanResult:
+    """Single pass over a JS/TS/JSX file. Returns (items, imports, references); only relative imports are kept."""
+    items = []
     imports = []
-    dir_path = os.path.dirname(filepath).replace("\\", "/")
-    for line in content.split("\n"):
-        stripped = line.strip()
-        if not stripped or stripped.startswith("//") or stripped.startswith("*"):
+    scopes = []
+    dir_path = os.path.dirname(filepath).replace("\\", "/") or "."
+    text = "\n" + content
+    line, pos, item_line, import_line = 0, 0, 0, 0
+    for m in JS_SCANNER.finditer(text):
+        start = m.start()
+        line += text.count("\n", pos, start + 1)
+        pos = start + 1
+        kind = m.lastgroup
+        if kind == "func" or kind == "arrow":
+            items.append({"type": "function", "name": m.group(kind), "line": line})
+            scopes.append((m.group(kind), start, m.end()))
+            item_line = line
             continue
-        # import X from './path' or import { X } from './path' or import './path'
-        m = re.search(r"from\s+['\"]([^'\"]+)['\"]", stripped)
-        if m:
-            imp = m.group(1)
-            if imp.startswith(".") and not imp.startswith(".."):
-                # Relative import
-                base = dir_path or "."
-                resolved = os.path.normpath(os.path.join(base, imp)).replace("\\", "/")
-                imports.append(resolved)
-            elif imp.startswith(".."):
-                base = dir_path or "."
-                resolved = os.path.normpath(os.path.join(base, imp)).replace("\\", "/")
-                imports.append(resolved)
-        else:
-            m = re.search(r"import\s+['\"]([^'\"]+)['\"]", stripped)
-            if m:
-                imp = m.group(1)
-                if imp.startswith("."):
-                    base = dir_path or "."
-                    resolved = os.path.normpath(os.path.join(base, imp)).replace("\\", "/")
-                    imports.append(resolved)
-    return imports
-
-
-def resolve_import_to_file(imp_path: str, all_paths: List[str]) -> str | None:
-    """Resolve import path to actual file path in codebase."""
-    imp = imp_path.replace("\\", "/").strip("/")
-    if not imp:
-        return None
-    for p in all_paths:
-        np = p.replace("\\", "/")
-        base, ext = os.path.splitext(np)
-        # Exact: imp matches path without extension
-        if base.endswith(imp) or imp in base or base == imp:
-            return np
-        # imp is "src/Components/PokemonThumbnail", file is "src/Components/PokemonThumbnail.js"
-        for e in [".js", ".jsx", ".ts", ".tsx", ".py", ".css", ".scss"]:
-            if (imp + e) in np or np == imp + e:
-                return np
-    # Try dir/index
-    for p in all_paths:
-        if imp in p or p.endswith(imp + "/index.js") or p.endswith(imp + "/index.jsx"):
-            return p.replace("\\", "/")
-    return None
+        prefix = _line_prefix(text, start)
+        if prefix.startswith("//") or prefix.startswith("*"):
+            continue
+        if kind == "comp":
+            if item_line != line:
+                items.append({"type": "component", "name": m.group("comp"), "line": line})
+                scopes.append((m.group("comp"), start, m.end()))
+                item_line = line
+        elif import_line != line:
+            import_line = line
+            imp = m.group(kind)
+            if imp.startswith("."):
+                imports.append(os.path.normpath(os.path.join(dir_path, imp)).replace("\\", "/"))
+    return items, imports, scope_references(text, scopes, JS_WORDS, JS_STOPWORDS) if references else {}
 
 
 def parse_python_file(content: str, filepath: str) -> List[Dict[str, Any]]:
     """Extract functions and classes from Python file."""
-    items = []
-    lines = content.split("\n")
+    return scan_python(content, filepath, references=False)[0]
 
-    for i, line in enumerate(lines, 1):
-        stripped = line.strip()
-        # Skip empty and comments
-        if not stripped or stripped.startswith("#"):
-            continue
-        # Class definition
-        m = re.match(r"^class\s+(\w+)\s*[:(]", stripped)
-        if m:
-            items.append({"type": "class", "name": m.group(1), "line": i})
-            continue
-        # Function definition (including async)
-        m = re.match(r"^(async\s+)?def\s+(\w+)\s*\(", stripped)
-        if m:
-            items.append({"type": "function", "name": m.group(2), "line": i})
-            continue
-        # Django/Flask route decorators
-        m = re.search(r'@\w+\.route\s*\(\s*["\']([^"\']+)["\']', stripped)
-        if m:
-            items.append({"type": "route", "name": m.group(1), "line": i})
-            continue
-        m = re.search(r"path\s*\(\s*[\"\']([^\"\']+)[\"\']", stripped)
-        if m:
-            items.append({"type": "route", "name": m.group(1), "line": i})
-            continue
 
-    return items
+def extract_python_imports(content: str, filepath: str) -> List[str]:
+    """Extract imported modules/paths from Python file (relative to project)."""
+    return scan_python(content, filepath, references=False)[1]
 
 
 def parse_js_file(content: str, filepath: str) -> List[Dict[str, Any]]:
     """Extract functions and exports from JS/TS/JSX file."""
-    items = []
-    lines = content.split("\n")
+    return scan_js(content, filepath, references=False)[0]
+
+
+def extract_js_imports(content: str, filepath: str) -> List[str]:
+    """Extract import paths from JS/TS/JSX file."""
+    return scan_js(content, filepath, references=False)[1]
 
-    for i, line in enumerate(lines, 1):
-        stripped = line.strip()
-        if not stripped or stripped.startswith("//") or stripped.startswith("*"):
-            continue
-        # function name() or const name = () =>
-        m = re.match(r"^(?:export\s+)?(?:async\s+)?function\s+(\w+)\s*\(", stripped)
-        if m:
-            items.append({"type": "function", "name": m.group(1), "line": i})
-            continue
-        m = re.match(r"^(?:export\s+)?const\s+(\w+)\s*=\s*(?:async\s+)?\(", stripped)
-        if m:
-            items.append({"type": "function", "name": m.group(1), "line": i})
-            continue
-        m = re.match(r"^(?:export\s+)?(?:async\s+)?function\s+(\w+)\s*\(", stripped)
-        if m:
-            items.append({"type": "function", "name": m.group(1), "line": i})
-            continue
-        # React component: export default function X or function X(
-        m = re.search(r"function\s+([A-Z]\w*)\s*\(", stripped)
-        if m:
-            items.append({"type": "component", "name": m.group(1), "line": i})
-            continue
 
-    return items
+# Scanner registry, keyed by extension. Other languages are plugins in parsers/
+# (modules exposing scan(content, filepath, references=True) -> ScanResult), imported the first
+# time a file with one of their extensions is scanned.
+_SCANNERS = {".py": scan_python, ".js": scan_js, ".jsx": scan_js, ".ts": scan_js, ".tsx": scan_js}
+LANGUAGE_PLUGINS = {
+    ".java": "parsers.java",
+    ".go": "parsers.go",
+    ".rs": "parsers.rust",
+    ".rb": "parsers.ruby",
+    **dict.fromkeys((".c", ".h", ".cc", ".cpp", ".cxx", ".hh", ".hpp"), "parsers.c_family"),
+}
 
 
-CODE_EXTENSIONS = {".py", ".js", ".jsx", ".ts", ".tsx", ".java", ".go", ".rb", ".rs"}
+def register_scanner(extensions: Iterable[str], scan) -> None:
+    """Use `scan(content, filepath, references=True) -> ScanResult` for files with these extensions."""
+    for ext in extensions:
+        _SCANNERS[ext.lower()] = scan
+
+
+def get_scanner(ext: str):
+    """The scanner for an extension (loading its plugin on first use), or None."""
+    scan = _SCANNERS.get(ext)
+    if scan is None and ext in LANGUAGE_PLUGINS:
+        scan = importlib.import_module(LANGUAGE_PLUGINS[ext]).scan
+        register_scanner([e for e, module in LANGUAGE_PLUGINS.items() if module == LANGUAGE_PLUGINS[ext]], scan)
+    return scan
 
 
 def parse_file(content: str, filepath: str) -> List[Dict[str, Any]]:
     """Dispatch to language-specific parser."""
-    ext = os.path.splitext(filepath)[1].lower()
-    if ext == ".py":
-        return parse_python_file(content, filepath)
-    if ext in {".js", ".jsx", ".ts", ".tsx"}:
-        return parse_js_file(content, filepath)
-    return []
+    return scan_file(content, filepath, references=False)[0]
 
 
 def extract_imports(content: str, filepath: str) -> List[str]:
     """Extract import paths for a file."""
-    ext = os.path.splitext(filepath)[1].lower()
-    if ext == ".py":
-        return extract_python_imports(content, filepath)
-    if ext in {".js", ".jsx", ".ts", ".tsx"}:
-        return extract_js_imports(content, filepath)
-    return []
+    return scan_file(content, filepath, references=False)[1]
 
 
-def build_codebase_map(files: List[Dict[str, str]]) -> Dict[str, Any]:
+def scan_file(content: str, filepath: str, references: bool = True) -> ScanResult:
     """
-    Build a graph for visualization from a list of {path, content} dicts.
-    Returns: { nodes: [...], edges: [...] } for React Flow.
-    Node: { id, label, type, parent? }
-    Edge: { source, target }
+    Items, imports and per-scope references for a file in one pass of the language
+    scanner. references=False skips tokenizing for references (returned empty).
     """
-    nodes = []
-    edges = []
-    node_ids = set()
+    scan = get_scanner(os.path.splitext(filepath)[1].lower())
+    return scan(content, filepath, references=references) if scan else ([], [], {})
 
-    def add_node(id_, label, node_type="file", parent=None):
-        if id_ in node_ids:
-            return
-        node_ids.add(id_)
-        nodes.append({"id": id_, "label": label, "type": node_type, "parent": parent})
 
-    # Group by folder
-    folders = set()
-    for f in files:
-        path = f.get("path", "")
-        parts = path.replace("\\", "/").split("/")
-        for i in range(1, len(parts)):
-            folder = "/".join(parts[:i])
-            folders.add(folder)
+PARALLEL_MIN_FILES = 300  # below this, pool startup costs more than it saves
+PARALLEL_CHUNK_SIZE = 64
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0")) or min(8, os.cpu_count() or 1)
+# Workers must not be forked from a process whose other threads (GitHub fetches) may hold locks
+PARSE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
 
-    # Add folder nodes (hierarchical) + folder->folder edges
-    sorted_folders = sorted(folders)
-    for folder in sorted_folders:
-        parts = folder.split("/")
-        parent_id = "/".join(parts[:-1]) if len(parts) > 1 else None
-        add_node(folder, parts[-1], "folder", parent=parent_id)
-        if parent_id:
-            edges.append({"source": parent_id, "target": folder})
+_parse_pool = None
 
-    # Add file nodes and their children (functions, classes, routes)
-    for f in files:
-        path = f.get("path", "")
-        content = f.get("content", "")
-        parts = path.replace("\\", "/").split("/")
-        folder = "/".join(parts[:-1]) if len(parts) > 1 else None
-        filename = parts[-1]
 
-        file_id = f"file:{path}"
-        add_node(file_id, filename, "file", parent=folder)
-        if folder:
-            edges.append({"source": folder, "target": file_id})
+def _parse_one(path: str, content: str) -> ScanResult:
+    """Items, import paths and references for one file (the per-file work build_codebase_map needs)."""
+    return scan_file(content, path.replace("\\", "/"))
 
-        items = parse_file(content, path)
-        for item in items:
-            item_id = f"{file_id}::{item['name']}"
-            add_node(item_id, item["name"], item.get("type", "function"), parent=file_id)
-            edges.append({"source": file_id, "target": item_id})
 
-    # Add dependency edges (imports) between files
-    all_paths = [f["path"].replace("\\", "/") for f in files]
-    path_to_id = {p: f"file:{p}" for p in all_paths}
+def _parse_chunk(chunk: List[Tuple[str, str]]) -> List[ScanResult]:
+    return [_parse_one(path, content) for path, content in chunk]
+
+
+def _get_parse_pool():
+    """Process pool shared by all requests in this worker, created on first large repo."""
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS,
+                                          mp_context=multiprocessing.get_context(PARSE_START_METHOD))
+    return _parse_pool
+
+
+def _parse_pairs(pairs: List[Tuple[str, str]], parallel: bool = None) -> List[ScanResult]:
+    """Parse (path, content) pairs serially or over the process pool, preserving order."""
+    global _parse_pool
+    if parallel is None:
+        parallel = len(pairs) >= PARALLEL_MIN_FILES and PARSE_WORKERS > 1
+    if not parallel:
+        return _parse_chunk(pairs)
+
+    chunks = [pairs[i:i + PARALLEL_CHUNK_SIZE] for i in range(0, len(pairs), PARALLEL_CHUNK_SIZE)]
+    try:
+        results = []
+        for chunk_result in _get_parse_pool().map(_parse_chunk, chunks):
+            results.extend(chunk_result)
+        return results
+    except (BrokenProcessPool, OSError):
+        # A killed child breaks the pool; drop it and finish this request serially
+        _parse_pool = None
+        return _parse_chunk(pairs)
 
+
+def parse_cache_key(f: Dict[str, str]) -> str:
+    """Cache key for a file: content hash (GitHub blob sha if known), path and PARSER_VERSION."""
+    content_hash = f.get("sha") or git_blob_sha((f.get("content", "") or "").encode("utf-8", errors="replace"))
+    return f"{PARSER_VERSION}:{content_hash}:{f.get('path', '')}"
+
+
+def parse_files(files: List[Dict[str, str]], parallel: bool = None, cache: ParseCache = parse_cache) -> List[ScanResult]:
+    """
+    Parse every file, returning (items, imports, references) per file in input order.
+    Results are cached by content hash, so only new or changed files are parsed.
+    Large sets of misses are split into chunks and fanned out over a process
+    pool; results are merged in chunk order so output is identical to a serial
+    run. parallel=None decides by PARALLEL_MIN_FILES; cache=None disables caching.
+    """
+    if cache is None:
+        return [_interned(r) for r in _parse_pairs([(f.get("path", ""), f.get("content", "") or "") for f in files], parallel)]
+
+    keys = [parse_cache_key(f) for f in files]
+    results = [cache.get(key) for key in keys]
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        pairs = [(files[i].get("path", ""), files[i].get("content", "") or "") for i in missing]
+        for i, parsed in zip(missing, _parse_pairs(pairs, parallel)):
+            parsed = _interned(parsed)
+            cache.put(keys[i], parsed)
+            results[i] = parsed
+    return results
+
+
+def import_follower(paths: List[str]):
+    """
+    For github_fetcher's import following: a function from a fetched file
+    {path, content, sha} to the `paths` its imports resolve to, as in the map.
+    """
+    index = PathIndex(paths)
+
+    def imported(f: Dict[str, str]) -> List[str]:
+        return [p for p in map(index.resolve, parse_files([f], parallel=False)[0][1]) if p]
+    return imported
+
+
+def _interned(parsed: ScanResult) -> ScanResult:
+    """
+    Intern item names and referenced identifiers (as sorted tuples) before a scan
+    result is cached, so cached results and the graphs built from them share one
+    string per distinct name instead of one per occurrence.
+    """
+    items, imports, refs = parsed
+    for item in items:
+        item["name"] = sys.intern(item["name"])
+    return items, imports, {scope: tuple(sorted(map(sys.intern, names))) for scope, names in refs.items()}
+
+
+def _folder_chain(path: str) -> List[str]:
+    """Folders containing a file path, outermost first: a/b/c.py -> [a, a/b]."""
+    parts = path.split("/")
+    return ["/".join(parts[:i]) for i in range(1, len(parts))]
+
+
+def _add_folder(graph: CodebaseGraph, folder: str) -> None:
+    parts = folder.split("/")
+    parent_id = "/".join(parts[:-1]) if len(parts) > 1 else None
+    if graph.add_node(folder, parts[-1], "folder", parent=parent_id) and parent_id:
+        graph.add_edge(parent_id, folder)
+
+
+def _add_file(graph: CodebaseGraph, path: str, items: List[Dict[str, Any]]) -> None:
+    """Add a file node and its children (functions, classes, routes)."""
+    parts = path.split("/")
+    folder = "/".join(parts[:-1]) if len(parts) > 1 else None
+    file_id = f"file:{path}"
+    graph.add_node(file_id, parts[-1], "file", parent=folder)
+    if folder:
+        graph.add_edge(folder, file_id)
+    _add_items(graph, file_id, items)
+
+
+def _add_items(graph: CodebaseGraph, file_id: str, items: List[Dict[str, Any]]) -> None:
+    for item in items:
+        item_id = f"{file_id}::{item['name']}"
+        graph.add_node(item_id, item["name"], item.get("type", "function"), parent=file_id)
+        graph.add_edge(file_id, item_id)
+
+
+def _set_imports(graph: CodebaseGraph, path: str, imports: List[str]) -> None:
+    """Record a file's import strings and the reverse import-string -> importer index."""
+    for imp in graph.file_imports.pop(path, ()):
+        importers = graph.importers.get(imp)
+        if importers is not None:
+            importers.discard(path)
+    graph.file_imports[path] = imports
+    for imp in imports:
+        graph.importers.setdefault(imp, set()).add(path)
+
+
+USES_MODES = ("referenced", "cross", "aggregate")
+USES_MODE = os.getenv("USES_MODE", "referenced")  # default mode for "uses" edges
+USES_EDGE_BUDGET = int(os.getenv("USES_EDGE_BUDGET", "20000"))  # item-level "uses" edges per map
+
+
+def _set_references(graph: CodebaseGraph, path: str, refs: Dict[str, List[str]]) -> None:
+    """Record a file's per-scope references (already sorted by parse_files) as tuples of interned names."""
+    file_id = f"file:{path}"
+    graph.set_references(path, {
+        sys.intern(f"{file_id}::{scope}" if scope else file_id): tuple(map(sys.intern, names))
+        for scope, names in refs.items()
+    })
+
+
+def _link_dependencies(graph: CodebaseGraph, path: str) -> None:
+    """Add dependency edges for one file's imports ("uses" edges follow in _sync_uses)."""
+    source_id = f"file:{path}"
+    for imp in graph.file_imports.get(path, ()):
+        resolved = graph.path_index.resolve(imp)
+        if resolved and resolved in graph.file_paths:
+            target_id = f"file:{resolved}"
+            if source_id != target_id:
+                graph.add_edge(source_id, target_id, "dependency")
+
+
+def _unlink_dependencies(graph: CodebaseGraph, path: str) -> None:
+    """Remove a file's outgoing dependency edges (their "uses" edges go in _sync_uses)."""
+    source_id = f"file:{path}"
+    for target_id in list(graph.successors(source_id, "dependency")):
+        graph.remove_edge(source_id, target_id, "dependency")
+
+
+def _uses_mode(graph: CodebaseGraph) -> str:
+    return graph.uses_mode or USES_MODE
+
+
+def _referenced_pairs(graph: CodebaseGraph, source_id: str, target_id: str) -> List[Tuple[str, str]]:
+    """(scope id, target item id) for each definition in target_id referenced from a scope of source_id."""
+    nodes = graph.nodes
+    defined = {nodes[ti].label for ti in graph.items_of(target_id) if nodes[ti].type not in NON_SYMBOL_TYPES}
+    pairs = []
+    for scope_id, names in graph.references.get(source_id[5:], {}).items():
+        pairs.extend((scope_id, f"{target_id}::{name}") for name in names if name in defined)
+    return pairs
+
+
+def _uses_pairs(graph: CodebaseGraph, source_id: str, target_id: str) -> int:
+    """Item-level "uses" edges a dependency would get when expanded."""
+    if _uses_mode(graph) == "referenced":
+        return len(_referenced_pairs(graph, source_id, target_id))
+    return len(graph.items_of(source_id)) * len(graph.items_of(target_id))
+
+
+def _plan_uses(graph: CodebaseGraph, dirty: set = None) -> Dict[Tuple[str, str], Tuple[Any, Any]]:
+    """
+    Decide, per file dependency, between item-level "uses" edges and one weighted
+    file -> file "uses" edge. Item-level edges are every item of the source file ->
+    every item of the target file ("cross") or only definitions the source actually
+    references, resolved through the symbol index ("referenced"). The cheapest
+    dependencies are expanded first until the edge budget is spent; "aggregate"
+    expands none. With `dirty` (file ids whose items, references or dependencies
+    changed) only dependencies touching them are recounted, and the end of the
+    expanded prefix of graph.uses_order moves from where it was; without it
+    everything is planned again. Either way the plan matches a rebuild.
+    Returns {dependency: (old plan, new plan)} (None if absent) for dependencies
+    that were recounted or changed side.
+    """
+    budget = USES_EDGE_BUDGET if graph.uses_budget is None else graph.uses_budget
+    budget = 0 if _uses_mode(graph) == "aggregate" else budget
+    plan, order, by_file = graph.uses_plan, graph.uses_order, graph.uses_by_file
+    full = dirty is None
+    if full:
+        stale = list(plan)
+    else:
+        stale = list(dict.fromkeys(dep for f in dirty for dep in by_file.get(f, ())))
+    changed = {dep: (plan[dep], None) for dep in stale}
+    cutoff = graph.uses_cutoff
+    for dep in stale:
+        pairs = plan.pop(dep)[1]
+        for f in dep:
+            by_file[f].discard(dep)
+        i = bisect.bisect_left(order, (pairs, *dep))
+        del order[i]
+        graph.uses_total -= pairs
+        if i < cutoff:
+            cutoff -= 1
+            graph.uses_spent -= pairs
+
+    if full:
+        fresh = [(f, t) for f, targets in graph.out_edges.get("dependency", {}).items() for t in targets]
+    else:
+        fresh = dict.fromkeys([(f, t) for f in dirty for t in graph.successors(f, "dependency")]
+                              + [(s, f) for f in dirty for s in graph.predecessors(f, "dependency")])
+    counted = [(pairs, *dep) for dep in fresh for pairs in (_uses_pairs(graph, *dep),) if pairs]
+    if order:
+        for entry in counted:
+            i = bisect.bisect_left(order, entry)
+            order.insert(i, entry)
+            if i < cutoff:
+                cutoff += 1
+                graph.uses_spent += entry[0]
+    else:
+        order.extend(sorted(counted))  # a full plan; cutoff is 0 and moves up below
+    for pairs, source_id, target_id in counted:
+        dep = (source_id, target_id)
+        plan[dep] = (False, pairs)
+        by_file.setdefault(source_id, set()).add(dep)
+        by_file.setdefault(target_id, set()).add(dep)
+        graph.uses_total += pairs
+        changed.setdefault(dep, (None, None))
+
+    before = cutoff
+    while graph.uses_spent > budget:
+        cutoff -= 1
+        graph.uses_spent -= order[cutoff][0]
+    while cutoff < len(order) and graph.uses_spent + order[cutoff][0] <= budget:
+        graph.uses_spent += order[cutoff][0]
+        cutoff += 1
+    graph.uses_cutoff = cutoff
+    for _, s, t in order[min(before, cutoff):max(before, cutoff)]:
+        changed.setdefault((s, t), (plan[(s, t)], None))
+    if full:
+        plan.update(((s, t), (True, pairs)) for pairs, s, t in order[:cutoff])
+    else:
+        for dep in changed:
+            if dep in plan:
+                pairs = plan[dep][1]
+                plan[dep] = (bisect.bisect_left(order, (pairs, *dep)) < cutoff, pairs)
+    for dep, (old, _) in changed.items():
+        changed[dep] = (old, plan.get(dep))
+    return changed
+
+
+def _link_uses(graph: CodebaseGraph, source_id: str, target_id: str, expanded: bool, pairs: int) -> None:
+    if not expanded:
+        graph.add_edge(source_id, target_id, "uses", weight=pairs)
+    elif _uses_mode(graph) == "referenced":
+        for scope_id, ti in _referenced_pairs(graph, source_id, target_id):
+            graph.add_edge(scope_id, ti, "uses")
+    else:
+        for si in graph.items_of(source_id):
+            for ti in graph.items_of(target_id):
+                graph.add_edge(si, ti, "uses")
+
+
+def _unlink_uses(graph: CodebaseGraph, source_id: str, target_id: str, touched: set) -> None:
+    if graph.remove_edge(source_id, target_id, "uses"):
+        touched.update((source_id, target_id))
+    target_items = set(graph.items_of(target_id))
+    for si in [source_id] + graph.items_of(source_id):
+        for ti in list(graph.successors(si, "uses")):
+            if ti in target_items and graph.remove_edge(si, ti, "uses"):
+                touched.update((si, ti))
+
+
+def _sync_uses(graph: CodebaseGraph, dirty: Iterable[str] = None) -> set:
+    """
+    Bring "uses" edges in line with _plan_uses. Dependencies whose plan changed,
+    or that touch a `dirty` file id (items added or removed), are relinked; without
+    `dirty` every dependency is planned and linked. Records graph.uses_summary and
+    returns node ids that lost "uses" edges.
+    """
+    dirty = None if dirty is None else set(dirty)
+    touched = set()
+    for dep, (old, new) in _plan_uses(graph, dirty).items():
+        if old == new and dirty is not None and not dirty.intersection(dep):
+            continue
+        if old is not None:
+            _unlink_uses(graph, *dep, touched)
+        if new is not None:
+            _link_uses(graph, *dep, *new)
+    graph.uses_summary = {
+        "mode": _uses_mode(graph),
+        "budget": USES_EDGE_BUDGET if graph.uses_budget is None else graph.uses_budget,
+        "itemEdges": graph.uses_spent,
+        "aggregateEdges": len(graph.uses_order) - graph.uses_cutoff,
+        "collapsedPairs": graph.uses_total - graph.uses_spent,
+    }
+    return touched
+
+
+def _fix_orphan(graph: CodebaseGraph, node_id: str) -> None:
+    """Ensure a node has at least one edge by connecting it to its parent."""
+    if node_id.startswith("file:") and "::" in node_id:
+        # Item (function/class/component): connect to parent file
+        parent_file = node_id.split("::")[0]
+        if parent_file in graph.nodes:
+            graph.add_edge(parent_file, node_id)
+    elif node_id.startswith("file:"):
+        # File: connect to parent folder
+        parts = node_id[5:].split("/")
+        if len(parts) > 1:
+            parent_folder = "/".join(parts[:-1])
+            if parent_folder in graph.nodes:
+                graph.add_edge(parent_folder, node_id)
+    else:
+        # Folder: connect to parent folder
+        parts = node_id.split("/")
+        if len(parts) > 1:
+            parent_folder = "/".join(parts[:-1])
+            if parent_folder in graph.nodes:
+                graph.add_edge(parent_folder, node_id)
+
+
+def build_codebase_graph(
+    files: List[Dict[str, str]], parallel: bool = None, uses_mode: str = None, uses_budget: int = None
+) -> CodebaseGraph:
+    """
+    Build the map graph from a list of {path, content} dicts.
+    The graph keeps each file's imports so update_codebase_graph can apply deltas.
+    uses_mode / uses_budget override USES_MODE / USES_EDGE_BUDGET (see _plan_uses).
+    """
+    graph = CodebaseGraph()
+    graph.uses_mode, graph.uses_budget = uses_mode, uses_budget
+    files = [{**f, "path": f.get("path", "").replace("\\", "/")} for f in files]
+    parsed = parse_files(files, parallel=parallel)
+
+    # Add folder nodes (hierarchical) + folder->folder edges
+    folders = set()
     for f in files:
-        path = f.get("path", "").replace("\\", "/")
-        content = f.get("content", "")
-        source_id = f"file:{path}"
-        for imp in extract_imports(content, path):
-            resolved = resolve_import_to_file(imp, all_paths)
-            if resolved and resolved in path_to_id:
-                target_id = path_to_id[resolved]
-                if source_id != target_id and {"source": source_id, "target": target_id} not in edges:
-                    edges.append({"source": source_id, "target": target_id, "type": "dependency"})
-                    # Also connect components: who uses whom (source file's components → target file's components)
-                    source_items = [n["id"] for n in nodes if n["id"].startswith(source_id + "::")]
-                    target_items = [n["id"] for n in nodes if n["id"].startswith(target_id + "::")]
-                    for si in source_items:
-                        for ti in target_items:
-                            if {"source": si, "target": ti} not in edges:
-                                edges.append({"source": si, "target": ti, "type": "uses"})
+        folders.update(_folder_chain(f["path"]))
+    for folder in sorted(folders):
+        _add_folder(graph, folder)
+
+    # Add file nodes and their children (functions, classes, routes)
+    for f, (items, imports, refs) in zip(files, parsed):
+        graph.file_paths[f["path"]] = None
+        _add_file(graph, f["path"], items)
+        _set_imports(graph, f["path"], imports)
+        _set_references(graph, f["path"], refs)
+
+    # Add dependency edges (imports) between files
+    graph.path_index = PathIndex(list(graph.file_paths))
+    for path in graph.file_paths:
+        _link_dependencies(graph, path)
+    _sync_uses(graph)
 
     # Ensure every node has at least one edge (fix orphans)
-    edge_sources = {e["source"] for e in edges}
-    edge_targets = {e["target"] for e in edges}
-    all_node_ids = {n["id"] for n in nodes}
-    connected = edge_sources | edge_targets
-    orphans = all_node_ids - connected
-
-    for node_id in orphans:
-        if node_id.startswith("file:") and "::" in node_id:
-            # Item (function/class/component): connect to parent file
-            parent_file = node_id.split("::")[0]
-            if parent_file in all_node_ids:
-                edges.append({"source": parent_file, "target": node_id})
-        elif node_id.startswith("file:"):
-            # File: connect to parent folder
-            path = node_id[5:]
-            parts = path.replace("\\", "/").split("/")
-            if len(parts) > 1:
-                parent_folder = "/".join(parts[:-1])
-                if parent_folder in all_node_ids:
-                    edges.append({"source": parent_folder, "target": node_id})
+    connected = graph.connected_ids()
+    for node_id in [n for n in graph.nodes if n not in connected]:
+        _fix_orphan(graph, node_id)
+    return graph
+
+
+def build_codebase_map(
+    files: List[Dict[str, str]], parallel: bool = None, uses_mode: str = None, uses_budget: int = None
+) -> Dict[str, Any]:
+    """
+    Build a graph for visualization from a list of {path, content} dicts.
+    parallel forces (True) or disables (False) multi-process parsing; see parse_files.
+    Returns: { nodes: [...], edges: [...], files: [...], usesEdges: {...} } for React Flow.
+    Node: { id, label, type, parent? }
+    Edge: { source, target, type?, weight? } (weight only on aggregated "uses" edges)
+    usesEdges: { mode, budget, itemEdges, aggregateEdges, collapsedPairs }
+    """
+    return build_codebase_graph(files, parallel=parallel, uses_mode=uses_mode, uses_budget=uses_budget).to_dict()
+
+
+STREAM_BATCH_SIZE = 32  # files parsed per step; bounds how many contents are held at once
+STREAM_FLUSH_SECONDS = 0.25  # slow sources (GitHub) flush partial batches this often
+
+
+def stream_codebase_graph(files: Iterable[Dict[str, str]], graph: CodebaseGraph = None) -> Iterator[Dict[str, Any]]:
+    """
+    Build a map while files are still arriving, yielding events as they are ready:
+    {"node": {...}} and {"edge": {...}} for each folder, file and item as its file
+    is parsed, then dependency/"uses" edges once every path is known (import
+    resolution needs the full path set), then {"done": True, "files": [...]}.
+    Only the current batch of file contents is held; the graph keeps parse results.
+    The node and edge sets equal build_codebase_map's for the same files.
+    """
+    graph = graph if graph is not None else CodebaseGraph()
+    graph.journal = []
+
+    def flush():
+        for kind, entry in graph.drain_journal():
+            yield {kind: entry}
+
+    batch = []
+    last_flush = time.monotonic()
+    for f in itertools.chain(files, [None]):
+        if f is not None:
+            batch.append({**f, "path": f.get("path", "").replace("\\", "/")})
+            if len(batch) < STREAM_BATCH_SIZE and time.monotonic() - last_flush < STREAM_FLUSH_SECONDS:
+                continue
+        last_flush = time.monotonic()
+        for f, (items, imports, refs) in zip(batch, parse_files(batch)):
+            path = f["path"]
+            if path in graph.file_paths:
+                continue
+            graph.file_paths[path] = None
+            for folder in _folder_chain(path):
+                _add_folder(graph, folder)
+            _add_file(graph, path, items)
+            _set_imports(graph, path, imports)
+            _set_references(graph, path, refs)
+        batch = []
+        yield from flush()
+
+    graph.path_index = PathIndex(list(graph.file_paths))
+    for path in graph.file_paths:
+        _link_dependencies(graph, path)
+    _sync_uses(graph)
+    connected = graph.connected_ids()
+    for node_id in [n for n in graph.nodes if n not in connected]:
+        _fix_orphan(graph, node_id)
+    yield from flush()
+    graph.journal = None
+    yield {"done": True, "files": list(graph.file_paths), "usesEdges": graph.uses_summary}
+
+
+def update_codebase_graph(
+    graph: CodebaseGraph,
+    added: List[Dict[str, str]] = (),
+    modified: List[Dict[str, str]] = (),
+    deleted: List[str] = (),
+) -> CodebaseGraph:
+    """
+    Apply a file delta to a graph from build_codebase_graph, in place.
+    Only changed files are parsed, and only edges touching them (including
+    dependency edges from unchanged files into them) are recomputed. The node
+    and edge sets equal those of a full rebuild where added files come last.
+    """
+    deleted = [p for p in dict.fromkeys(p.replace("\\", "/") for p in deleted) if p in graph.file_paths]
+    changed = [{**f, "path": f.get("path", "").replace("\\", "/")} for f in list(modified) + list(added)]
+    changed = [f for f in changed if f["path"] not in deleted]
+    # A re-sent existing path is a modification; a modified path we never saw is an addition
+    modified = [f for f in changed if f["path"] in graph.file_paths]
+    added = [f for f in changed if f["path"] not in graph.file_paths]
+    touched = set()  # nodes that may have lost their last edge
+    relink = set()  # files whose imports must be resolved again
+
+    # Unchanged importers of deleted files may now resolve elsewhere; importers of
+    # modified files keep their dependency edge and get fresh "uses" edges in _sync_uses.
+    for path in deleted:
+        relink.update(p[5:] for p in graph.predecessors(f"file:{path}", "dependency"))
+
+    for path in deleted + [f["path"] for f in modified]:
+        file_id = f"file:{path}"
+        _unlink_dependencies(graph, path)
+        for item_id in list(graph.items_of(file_id)):
+            touched.update(graph.predecessors(item_id, "uses"))
+            graph.remove_node(item_id)
+    for path in deleted:
+        graph.remove_node(f"file:{path}")
+        _set_imports(graph, path, [])
+        del graph.file_imports[path]
+        graph.remove_references(path)
+        del graph.file_paths[path]
+        for folder in reversed(_folder_chain(path)):
+            if folder in graph.nodes and not graph.children.get(folder):
+                graph.remove_node(folder)
+            elif folder in graph.nodes:
+                touched.add(folder)
+
+    parsed = parse_files(modified + added)
+    for f, (items, imports, refs) in zip(modified + added, parsed):
+        path = f["path"]
+        if path not in graph.file_paths:
+            graph.file_paths[path] = None
+            for folder in _folder_chain(path):
+                _add_folder(graph, folder)
+            _add_file(graph, path, items)
         else:
-            # Folder: connect to parent folder
-            parts = node_id.split("/")
-            if len(parts) > 1:
-                parent_folder = "/".join(parts[:-1])
-                if parent_folder in all_node_ids:
-                    edges.append({"source": parent_folder, "target": node_id})
-
-    return {"nodes": nodes, "edges": edges, "files": [f["path"] for f in files]}
+            _add_items(graph, f"file:{path}", items)
+        _set_imports(graph, path, imports)
+        _set_references(graph, path, refs)
+        relink.add(path)
+
+    # Keep the path index in step; imports whose resolution may change are the
+    # ones whose string is an index key of an added or deleted path.
+    for path in deleted:
+        graph.path_index.remove(path)
+    for f in added:
+        graph.path_index.add(f["path"])
+    for path in deleted + [f["path"] for f in added]:
+        for _, key in PathIndex.keys_of(path):
+            relink.update(graph.importers.get(key, ()))
+
+    relink &= graph.file_paths.keys()
+    for path in relink:
+        for target_id in graph.successors(f"file:{path}", "dependency"):
+            touched.add(target_id)
+        _unlink_dependencies(graph, path)
+        _link_dependencies(graph, path)
+    dirty = relink | set(deleted) | {f["path"] for f in modified}
+    touched |= _sync_uses(graph, {f"file:{p}" for p in dirty})
+
+    for node_id in touched:
+        if node_id in graph.nodes and not graph.is_connected(node_id):
+            _fix_orphan(graph, node_id)
+    return graph
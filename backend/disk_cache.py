@@ -0,0 +1,74 @@
+"""
+Helpers shared by the on-disk caches (parse_cache, github_cache, repo_snapshots).
+Entries live under <root>/ab/abcdef...: blobs by their own sha, anything
+else by the sha1 of its key. Directories are created 0700 and files 0600,
+since entries can hold private repo code. Size-capped tiers call prune()
+every PRUNE_EVERY writes.
+"""
+import hashlib
+import os
+import threading
+from typing import Optional
+
+PRUNE_EVERY = 500  # writes between disk usage checks
+
+
+def git_blob_sha(data: bytes) -> str:
+    """sha1 of 'blob <len>\\0<bytes>', i.e. what git (and the GitHub trees API) gives a file."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def token_fingerprint(token: Optional[str]) -> str:
+    """Short, non-reversible id for a credential; "anonymous" without a token."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16] if token else "anonymous"
+
+
+def shard_path(root: str, name: str) -> str:
+    """<root>/<first two chars of name>/<name>."""
+    return os.path.join(root, name[:2], name)
+
+
+def key_path(root: str, key: str, suffix: str = ".json") -> str:
+    """shard_path for an arbitrary key, by its sha1."""
+    return shard_path(root, hashlib.sha1(key.encode("utf-8")).hexdigest() + suffix)
+
+
+def write_atomic(path: str, data: bytes) -> bool:
+    """Write via a temp file and rename, so concurrent workers never read half a file. False on OSError."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+        return True
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return False  # caches are best effort
+
+
+def prune(root: str, max_bytes: int) -> None:
+    """Delete the least recently modified files under root until usage is below 90% of max_bytes."""
+    files = []
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            try:
+                st = os.stat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, os.path.join(dirpath, name)))
+    total = sum(size for _, size, _ in files)
+    if total <= max_bytes:
+        return
+    for _, size, path in sorted(files):
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        if total <= max_bytes * 0.9:
+            break
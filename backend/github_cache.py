@@ -0,0 +1,191 @@
+"""
+Local cache for GitHub API data.
+Blobs are immutable, so they are stored on disk by git blob sha and never
+revalidated; a blob is only stored if its content hashes to that sha.
+Mutable responses (trees, repo metadata) are stored with their ETag and
+revalidated with If-None-Match, so an unchanged repo costs one 304, which
+GitHub does not count against the rate limit.
+The disk tiers are opt-in (GITHUB_CACHE_DIR), since they hold private repo
+code; without it blobs and responses are kept in bounded memory tiers only.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from disk_cache import PRUNE_EVERY, git_blob_sha, key_path, prune, shard_path, token_fingerprint, write_atomic
+
+GITHUB_CACHE_DIR = (os.getenv("GITHUB_CACHE_DIR") or "").strip() or None
+GITHUB_CACHE_MAX_BYTES = int(os.getenv("GITHUB_CACHE_MAX_MB", "1024")) * 1024 * 1024
+BLOB_MEMORY_BYTES = int(os.getenv("GITHUB_BLOB_MEMORY_MB", "64")) * 1024 * 1024  # only without a disk tier
+RESPONSE_MEMORY_ENTRIES = 64
+RESPONSE_MEMORY_BYTES = int(os.getenv("GITHUB_RESPONSE_MEMORY_MB", "32")) * 1024 * 1024  # trees can be MBs each
+
+
+class BlobStore:
+    """
+    Content-addressed blobs on disk: <dir>/blobs/ab/abcdef..., pruned oldest-first past max_bytes.
+    Without a dir they are kept in memory instead, least recently used first out past memory_bytes.
+    """
+
+    def __init__(self, disk_dir: Optional[str], max_bytes: int = GITHUB_CACHE_MAX_BYTES,
+                 memory_bytes: int = BLOB_MEMORY_BYTES):
+        self.root = os.path.join(disk_dir, "blobs") if disk_dir else None
+        self.max_bytes = max_bytes
+        self.memory_bytes = 0 if self.root else memory_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sha: Optional[str]) -> Optional[bytes]:
+        if not sha or not (self.root or self.memory_bytes):
+            return None
+        if self.root:
+            try:
+                with open(shard_path(self.root, sha), "rb") as fh:
+                    data = fh.read()
+            except OSError:
+                data = None
+        else:
+            with self._lock:
+                data = self._memory.get(sha)
+                if data is not None:
+                    self._memory.move_to_end(sha)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def has(self, sha: Optional[str]) -> bool:
+        if not sha:
+            return False
+        if not self.root:
+            with self._lock:
+                return sha in self._memory
+        return os.path.exists(shard_path(self.root, sha))
+
+    def put(self, sha: Optional[str], data: bytes) -> bool:
+        """Store data under sha if it really is that blob. Returns False otherwise."""
+        if not sha or not (self.root or self.memory_bytes) or git_blob_sha(data) != sha:
+            return False
+        if not self.root:
+            return self._remember(sha, data)
+        path = shard_path(self.root, sha)
+        if os.path.exists(path) or not write_atomic(path, data):
+            return False
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+        return True
+
+    def _remember(self, sha: str, data: bytes) -> bool:
+        if len(data) > self.memory_bytes:
+            return False
+        with self._lock:
+            if sha in self._memory:
+                return False
+            self._memory[sha] = data
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_bytes:
+                self._memory_size -= len(self._memory.popitem(last=False)[1])
+        return True
+
+    def prune(self) -> None:
+        """Delete least recently modified blobs until usage is below 90% of max_bytes."""
+        if self.root:
+            prune(self.root, self.max_bytes)
+
+    def clear_stats(self) -> None:
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def clear(self) -> None:
+        """Drop the in-memory tier and counters (the disk tier stays)."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+            self.hits = self.misses = 0
+
+
+class ResponseCache:
+    """
+    JSON API responses with their ETag, in memory and (with a dir) under <dir>/http/, keyed by request.
+    The memory tier holds at most RESPONSE_MEMORY_ENTRIES entries and memory_bytes of serialized JSON.
+    """
+
+    def __init__(self, disk_dir: Optional[str], memory_bytes: int = RESPONSE_MEMORY_BYTES):
+        self.root = os.path.join(disk_dir, "http") if disk_dir else None
+        self.memory_bytes = memory_bytes
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.not_modified = 0
+
+    def _remember(self, key: str, entry: Dict[str, Any], size: int) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            if size > self.memory_bytes:
+                return
+            self._entries[key] = (entry, size)
+            self._size += size
+            while len(self._entries) > RESPONSE_MEMORY_ENTRIES or self._size > self.memory_bytes:
+                self._size -= self._entries.popitem(last=False)[1][1]
+
+    @staticmethod
+    def key(url: str, params: Optional[dict], token: Optional[str]) -> str:
+        """Per-credential key: ETags (and what a caller may see) depend on the Authorization header."""
+        query = "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+        return f"{token_fingerprint(token)} {url}?{query}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """{etag, body} or None."""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+        if cached is not None:
+            return cached[0]
+        if not self.root:
+            return None
+        try:
+            with open(key_path(self.root, key), "rb") as fh:
+                raw = fh.read()
+            entry = json.loads(raw)
+        except (OSError, ValueError):
+            return None
+        self._remember(key, entry, len(raw))
+        return entry
+
+    def put(self, key: str, etag: Optional[str], body: Any) -> None:
+        if not etag:
+            return
+        entry = {"etag": etag, "body": body}
+        raw = json.dumps(entry).encode("utf-8")
+        self._remember(key, entry, len(raw))
+        if self.root:
+            write_atomic(key_path(self.root, key), raw)
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self) -> None:
+        """Drop the in-memory tier and counters (the disk tier stays)."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.not_modified = 0
+
+
+blob_store = BlobStore(GITHUB_CACHE_DIR)
+response_cache = ResponseCache(GITHUB_CACHE_DIR)
@@ -1,13 +1,59 @@
 """
-Fetch public GitHub repo file tree and contents via GitHub API.
-No auth required for public repos (rate limited).
+Fetch a GitHub repo's file tree and code files, per file ("contents") or as one tarball ("archive").
+Requests go through github_scheduler (rate limits) and github_cache (blobs, conditional tree requests).
 """
+import os
 import re
+import tarfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from code_files import MAX_FILE_SIZE, glob_regex, is_binary, is_code_path
+from disk_cache import git_blob_sha
+from github_cache import blob_store, response_cache
+from github_scheduler import RateLimitError, credential_key, scheduler
+
+GITHUB_API = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+MAX_FETCH_CONCURRENCY = 32  # also the size of the session's connection pool
+FETCH_CONCURRENCY = min(MAX_FETCH_CONCURRENCY, max(1, int(os.getenv("GITHUB_FETCH_CONCURRENCY", "8"))))
+FETCH_MODES = ("contents", "archive")
+FETCH_MODE = os.getenv("GITHUB_FETCH_MODE", "contents")
+DEFAULT_MAX_FILES = 80  # contents mode: one request per file
+ARCHIVE_MAX_FILES = int(os.getenv("GITHUB_ARCHIVE_MAX_FILES", "2000"))
+ARCHIVE_MAX_BYTES = int(os.getenv("GITHUB_ARCHIVE_MAX_MB", "300")) * 1024 * 1024  # compressed download
+BUDGET_RESERVE = 5  # requests left unspent when the rate limit budget is short
+TEST_DIRS = {"test", "tests", "__tests__", "spec", "specs", "testdata", "fixtures", "examples", "docs"}
+VENDOR_DIRS = {"vendor", "third_party", "thirdparty", "external", "extern", "deps", "generated", "gen", "migrations"}
+SOURCE_DIRS = {"src", "lib", "app", "pkg", "cmd", "internal", "server", "api", "core"}
+ENTRY_STEMS = {"main", "app", "index", "server", "cli", "__main__", "manage", "wsgi", "asgi", "lib", "mod"}
+FOLLOW_IMPORTS = os.getenv("GITHUB_FOLLOW_IMPORTS", "").lower() in ("1", "true", "yes")
+FOLLOW_IMPORTS_SHARE = 0.5  # of max_files left for imported files when following imports
+MAX_SCOPE_PATTERNS = 50  # include + exclude globs per request
+MAX_SCOPE_PATTERN_LENGTH = 256
+MAX_SCOPE_WILDCARDS = 16  # * / ** runs per glob
+
+
+_session = None
+_session_lock = threading.Lock()
+
 
-GITHUB_API = "https://api.github.com"
-MAX_FILE_SIZE = 500_000  # 500KB - skip larger files
-CODE_EXTENSIONS = {".py", ".js", ".jsx", ".ts", ".tsx", ".css", ".scss", ".java", ".go", ".rb", ".rs", ".c", ".cpp", ".h"}
+def get_session() -> requests.Session:
+    """Process-wide keep-alive session, with a connection pool sized for MAX_FETCH_CONCURRENCY."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_FETCH_CONCURRENCY)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
 
 
 def parse_repo_url(url: str) -> tuple:
@@ -24,6 +70,83 @@ def parse_repo_url(url: str) -> tuple:
     return None
 
 
+def resolve_scope(url: str, ref: str = None, path: str = None, include=None, exclude=None) -> dict:
+    """
+    What part of a repo to map: {owner, repo, ref, path, include, exclude, include_regex, exclude_regex}.
+    ref and path default to those in .../tree/<ref>/<path> (or .../blob/<ref>/<file>,
+    which maps the file's directory) URLs; a URL ref is its first segment, so pass
+    ref explicitly for branch names containing "/". include / exclude are glob
+    lists (or comma-separated strings), compiled here into include_regex /
+    exclude_regex. Raises ValueError for invalid input, bad globs included.
+    """
+    parsed = parse_repo_url(url)
+    if not parsed:
+        raise ValueError("Invalid GitHub URL. Use: https://github.com/owner/repo")
+    m = re.search(r"github\.com[/:][\w\-\.]+/[\w\-\.]+/(tree|blob)/([^/?#]+)/?([^?#]*)", url or "", re.I)
+    url_ref, url_path = (unquote(m.group(2)), unquote(m.group(3))) if m else (None, "")
+    if m and m.group(1).lower() == "blob":
+        url_path = url_path.rstrip("/").rpartition("/")[0]
+    if (ref is not None and not isinstance(ref, str)) or (path is not None and not isinstance(path, str)):
+        raise ValueError("ref and path must be strings")
+    path = (url_path if path is None else path).strip().strip("/")
+    if path and any(part in ("", ".", "..") for part in path.split("/")):
+        raise ValueError(f"Invalid path: {path}")
+    include, exclude = _patterns(include), _patterns(exclude)
+    if len(include) + len(exclude) > MAX_SCOPE_PATTERNS:
+        raise ValueError(f"At most {MAX_SCOPE_PATTERNS} include / exclude patterns")
+    owner, repo = parsed
+    return {"owner": owner, "repo": repo, "ref": (ref or "").strip() or url_ref, "path": path,
+            "include": include, "exclude": exclude,
+            "include_regex": _globs_regex(include), "exclude_regex": _globs_regex(exclude)}
+
+
+def _patterns(value) -> tuple:
+    if not value:
+        return ()
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)) or not all(isinstance(v, str) for v in value):
+        raise ValueError("include and exclude must be glob strings or lists of them")
+    patterns = []
+    for v in value:
+        v = re.sub(r"(?:\*\*/)+", "**/", re.sub(r"\*{3,}", "**", v.strip().strip("/")))
+        if not v:
+            continue
+        if len(v) > MAX_SCOPE_PATTERN_LENGTH or len(re.findall(r"\*+", v)) > MAX_SCOPE_WILDCARDS:
+            raise ValueError(f"Glob too long (at most {MAX_SCOPE_PATTERN_LENGTH} characters and "
+                             f"{MAX_SCOPE_WILDCARDS} wildcards): {v[:40]}")
+        patterns.append(v)
+    return tuple(patterns)
+
+
+def _globs_regex(patterns: tuple):
+    """One regex for a glob list. As in .gitignore, a pattern without "/" matches at any depth,
+    and a matched directory covers everything below it."""
+    if not patterns:
+        return None
+    bodies = [glob_regex(p, any_depth="/" not in p, subtree=True) for p in patterns]
+    try:
+        return re.compile("^(?:" + "|".join(bodies) + ")$")
+    except re.error as e:
+        raise ValueError(f"Invalid include / exclude glob: {e}") from None
+
+
+def scope_filter(scope: dict):
+    """
+    Predicate on repo paths for resolve_scope's result: below scope["path"], matching
+    an include glob (if any) and no exclude glob. Globs are relative to scope["path"].
+    """
+    prefix = scope["path"] + "/" if scope["path"] else ""
+    include, exclude = scope["include_regex"], scope["exclude_regex"]
+
+    def keep(path: str) -> bool:
+        if not path.startswith(prefix):
+            return False
+        rel = path[len(prefix):]
+        return (include is None or bool(include.match(rel))) and not (exclude and exclude.match(rel))
+    return keep
+
+
 def _auth_headers(token: str = None):
     """Headers for GitHub API (with optional auth for private repos)."""
     h = {"Accept": "application/vnd.github.v3+json"}
@@ -32,78 +155,402 @@ def _auth_headers(token: str = None):
     return h
 
 
-def fetch_file_list(owner: str, repo: str, branch: str = None, token: str = None) -> list:
-    """Get recursive file tree. Returns list of {path, sha, type}."""
+def get_json(url: str, params: dict = None, token: str = None, timeout: int = 15, accept: str = None) -> tuple:
+    """
+    GET a JSON API resource, revalidating a cached copy with If-None-Match.
+    Returns (status, body); a 304 comes back as (200, cached body). With a
+    non-JSON `accept` media type a successful body is the response text.
+    """
     headers = _auth_headers(token)
-    if not branch:
-        r = requests.get(f"{GITHUB_API}/repos/{owner}/{repo}", headers=headers, timeout=10)
-        if r.status_code != 200:
-            raise RuntimeError(f"Repo not found: {owner}/{repo}")
-        branch = r.json().get("default_branch", "main")
-
-    r = requests.get(
-        f"{GITHUB_API}/repos/{owner}/{repo}/git/trees/{branch}",
-        params={"recursive": 1},
-        headers=headers,
-        timeout=15,
-    )
-    if r.status_code != 200:
-        raise RuntimeError(f"Failed to fetch tree: {r.json().get('message', r.text)}")
+    if accept:
+        headers["Accept"] = accept
+    key = response_cache.key(url, dict(params or {}, accept=accept) if accept else params, token)
+    cached = response_cache.get(key)
+    if cached is not None:
+        headers["If-None-Match"] = cached["etag"]
+    r = scheduler.get(get_session(), url, token=token, params=params, headers=headers, timeout=timeout)
+    if r.status_code == 304 and cached is not None:
+        response_cache.record_not_modified()
+        return 200, cached["body"]
+    if accept and r.status_code == 200:
+        body = r.text
+    else:
+        try:
+            body = r.json()
+        except ValueError:
+            body = {"message": r.text}
+    if r.status_code == 200:
+        response_cache.put(key, r.headers.get("ETag"), body)
+    return r.status_code, body
 
-    tree = r.json().get("tree", [])
+
+def resolve_commit(owner: str, repo: str, ref: str = None, token: str = None) -> str:
+    """
+    Commit sha of ref (default branch unless given). One conditional request for
+    the bare sha; when nothing was pushed GitHub answers 304, which is not rate limited.
+    """
+    status, body = get_json(f"{GITHUB_API}/repos/{owner}/{repo}/commits/{ref or 'HEAD'}", token=token,
+                            accept="application/vnd.github.sha")
+    sha = body.strip() if status == 200 and isinstance(body, str) else ""
+    if re.fullmatch(r"[0-9a-f]{40}", sha):
+        return sha
+    if status == 404:
+        raise RuntimeError(f"Repo not found: {owner}/{repo}")
+    if status == 422:
+        raise RuntimeError(f"{owner}/{repo} has no commits" if not ref else f"Unknown ref: {ref}")
+    raise RuntimeError(f"Failed to resolve commit: {body.get('message', status) if isinstance(body, dict) else status}")
+
+
+def fetch_file_list(owner: str, repo: str, branch: str = None, token: str = None) -> list:
+    """
+    Get recursive file tree (of the default branch via HEAD unless branch is given),
+    in one conditional request. Returns list of {path, sha, type, size}.
+    """
+    status, body = get_json(f"{GITHUB_API}/repos/{owner}/{repo}/git/trees/{branch or 'HEAD'}",
+                            params={"recursive": 1}, token=token)
+    if status == 404 and not branch:
+        raise RuntimeError(f"Repo not found: {owner}/{repo}")
+    if status != 200:
+        raise RuntimeError(f"Failed to fetch tree: {body.get('message', status) if isinstance(body, dict) else status}")
+
+    tree = body.get("tree", [])
     return [
-        {"path": t["path"], "sha": t.get("sha"), "type": t.get("type", "blob")}
+        {"path": t["path"], "sha": t.get("sha"), "type": t.get("type", "blob"), "size": t.get("size")}
         for t in tree
         if t.get("type") == "blob"
     ]
 
 
-def fetch_file_content(owner: str, repo: str, path: str, token: str = None) -> str:
-    """Fetch raw file content."""
+def _get_raw(url: str, token: str = None, params: dict = None, what: str = "") -> bytes:
+    """Raw body of a contents / blob resource. Raises FileNotFoundError on 404, RuntimeError on other failures."""
     headers = {"Accept": "application/vnd.github.raw+json"}
     if token:
         headers["Authorization"] = f"token {token}"
-    r = requests.get(
-        f"{GITHUB_API}/repos/{owner}/{repo}/contents/{path}",
-        headers=headers,
-        timeout=10,
-    )
+    r = scheduler.get(get_session(), url, token=token, params=params, headers=headers, timeout=10)
+    if r.status_code == 404:
+        raise FileNotFoundError(what)
     if r.status_code != 200:
-        raise RuntimeError(f"Failed to fetch {path}")
-    return r.text
+        raise RuntimeError(f"Failed to fetch {what}")
+    return r.content
+
+
+def fetch_file_bytes(owner: str, repo: str, path: str, token: str = None, ref: str = None) -> bytes:
+    """Fetch raw file content as bytes (at ref, default branch unless given). Raises FileNotFoundError on 404."""
+    return _get_raw(f"{GITHUB_API}/repos/{owner}/{repo}/contents/{path}", token=token,
+                    params={"ref": ref} if ref else None, what=path)
+
+
+def fetch_blob_bytes(owner: str, repo: str, sha: str, token: str = None) -> bytes:
+    """Fetch a blob by its git sha. Raises FileNotFoundError on 404, RuntimeError if the content is not that blob."""
+    data = _get_raw(f"{GITHUB_API}/repos/{owner}/{repo}/git/blobs/{sha}", token=token, what=sha)
+    if git_blob_sha(data) != sha:
+        raise RuntimeError(f"Blob {sha} content does not match its sha")
+    return data
+
+
+def fetch_file_content(owner: str, repo: str, path: str, token: str = None, ref: str = None) -> str:
+    """Fetch raw file content."""
+    return fetch_file_bytes(owner, repo, path, token=token, ref=ref).decode("utf-8", errors="replace")
 
 
-def fetch_repo_files(url: str, max_files: int = 80, token: str = None) -> list:
+def iter_repo_files(url: str, max_files: int = None, token: str = None, concurrency: int = None,
+                    mode: str = None, coverage: dict = None, ref: str = None, path: str = None,
+                    include=None, exclude=None, follow_imports: bool = None, entry_names=frozenset(),
+                    import_follower=None):
     """
-    Fetch code files from a public GitHub repo.
-    Returns list of {path, content}.
-    Skips node_modules, __pycache__, .git, etc.
+    Fetch code files from a GitHub repo lazily as {path, content, sha}.
+    The URL and tree are checked eagerly (ValueError / RuntimeError raised here).
+    ref, path, include and exclude narrow the fetch (see resolve_scope); mode picks
+    "contents" or "archive"; coverage (if given) is filled in as files are fetched.
     """
-    parsed = parse_repo_url(url)
-    if not parsed:
-        raise ValueError("Invalid GitHub URL. Use: https://github.com/owner/repo")
+    scope = resolve_scope(url, ref=ref, path=path, include=include, exclude=exclude)
+    mode = mode or FETCH_MODE
+    if mode not in FETCH_MODES:
+        raise ValueError(f"Unknown fetch mode {mode!r}; use one of: {', '.join(FETCH_MODES)}")
 
-    owner, repo = parsed
-    files = fetch_file_list(owner, repo, token=token)
-
-    # Filter to code files only, skip common non-source dirs
-    skip_dirs = {"node_modules", "__pycache__", ".git", "dist", "build", ".venv", "venv"}
-    results = []
-    for f in files:
-        path = f["path"]
-        parts = path.lower().split("/")
-        if any(skip in parts for skip in skip_dirs):
-            continue
-        ext = "." + path.split(".")[-1].lower() if "." in path else ""
-        if ext not in CODE_EXTENSIONS:
-            continue
-        if len(results) >= max_files:
-            break
+    owner, repo = scope["owner"], scope["repo"]
+    if mode == "archive":
+        response = open_archive(owner, repo, ref=scope["ref"], token=token)
+        return _iter_archive_files(response, max_files or ARCHIVE_MAX_FILES, coverage, scope)
+    code = list(_code_files(fetch_file_list(owner, repo, branch=scope["ref"], token=token)))
+    keep = scope_filter(scope)
+    files = [f for f in code if keep(f["path"])]
+    if not files and code:
+        raise RuntimeError(f"No code files in {owner}/{repo} match the requested path / include / exclude")
+    if coverage is not None:
+        coverage["excluded"] = len(code) - len(files)
+    return _iter_file_contents(owner, repo, files, max_files or DEFAULT_MAX_FILES, token, concurrency, coverage,
+                               scope["path"], follow_imports, scope["ref"], entry_names, import_follower)
+
+
+def _code_files(files: list):
+    """Tree entries that are code files outside common non-source dirs."""
+    return (f for f in files if is_code_path(f["path"]))
+
+
+def file_score(path: str, size: int = None, entry_names=frozenset()) -> float:
+    """
+    Cheap importance estimate from tree metadata alone, higher first. Entry point
+    and package names and source roots gain, depth costs a little, and tests,
+    docs, examples, vendored, generated or hidden (.github/) paths, stylesheets,
+    empty files and very large files lose.
+    """
+    parts = path.lower().split("/")
+    dirs, name = parts[:-1], parts[-1]
+    stem, _, ext = name.rpartition(".")
+    style = ext in ("css", "scss")
+    score = -0.3 * len(dirs)
+    if style:
+        score -= 1.0
+    elif name in entry_names or stem in ENTRY_STEMS:
+        score += 3.0
+    elif stem == "__init__" and size != 0:
+        score += 1.5
+    if dirs and dirs[0] in SOURCE_DIRS:
+        score += 0.5
+    if any(d in TEST_DIRS for d in dirs) or name.startswith("test_") or stem.endswith(("_test", ".test", ".spec")):
+        score -= 3.0
+    if any(d.startswith(".") for d in dirs):
+        score -= 4.0
+    if any(d in VENDOR_DIRS for d in dirs) or stem.endswith((".min", "_pb2", ".pb", ".generated", ".d")):
+        score -= 2.0
+    if size == 0:
+        score -= 3.0
+    elif size and size > 100_000:
+        score -= 1.0
+    return score
+
+
+def _rank_key(f: dict, entry_names=frozenset()) -> tuple:
+    return -file_score(f["path"], f.get("size"), entry_names), f["path"]
+
+
+def _fetch_entry(owner: str, repo: str, f: dict, token: str = None, ref: str = None):
+    """
+    (outcome, {path, content, sha} or None) for one tree entry; outcome is "cached",
+    "downloaded", "oversized", "binary", "missing" (404), "failed" or "rateLimited".
+    The blob is read from the local store by sha when present, else downloaded by
+    sha (so it is the tree's version whatever was pushed since) and stored.
+    """
+    data = blob_store.get(f.get("sha"))
+    outcome = "cached"
+    if data is None:
         try:
-            content = fetch_file_content(owner, repo, path, token=token)
-            if len(content) <= MAX_FILE_SIZE:
-                results.append({"path": path, "content": content})
+            if f.get("sha"):
+                data = fetch_blob_bytes(owner, repo, f["sha"], token=token)
+            else:
+                data = fetch_file_bytes(owner, repo, f["path"], token=token, ref=ref)
+        except RateLimitError:
+            return "rateLimited", None
+        except FileNotFoundError:
+            return "missing", None
         except Exception:
-            continue  # Skip files we can't fetch
+            return "failed", None
+        blob_store.put(f.get("sha"), data)
+        outcome = "downloaded"
+    if is_binary(data):
+        return "binary", None
+    content = data.decode("utf-8", errors="replace")
+    if len(content) > MAX_FILE_SIZE:
+        return "oversized", None
+    return outcome, {"path": f["path"], "content": content, "sha": f.get("sha")}
+
+
+class _Picker:
+    """
+    Chooses the next tree entry to download: by rank, or once the ranked share is
+    taken, the files already fetched ones import. Uncached downloads stop at the
+    known rate limit budget (less BUDGET_RESERVE); cached blobs are always used.
+    import_follower(paths) is supplied by the caller (the parser lives in the
+    analysis layer) and returns imported(entry) -> paths among `paths` it imports;
+    None disables following.
+    """
+
+    def __init__(self, ranked: list, max_files: int, token: str, base: str, import_follower=None):
+        self.ranked = iter(ranked)
+        self.taken = set()
+        self.frontier = deque()
+        follow = import_follower is not None
+        self.by_rank = max_files - int(max_files * FOLLOW_IMPORTS_SHARE) if follow else max_files
+        self.by_path = {f["path"][len(base) + 1:] if base else f["path"]: f for f in ranked} if follow else {}
+        self.imported = import_follower(list(self.by_path)) if follow else None
+        remaining = scheduler.remaining(credential_key(token))
+        self.allowance = None if remaining is None else max(0, remaining - BUDGET_RESERVE)
+        self.picked = 0
+        self.followed = 0
+        self.over_budget = 0
 
-    return results
+    def next(self, pending: bool = False):
+        """Next entry, or None when there is none (or, while following imports, when
+        results still pending may add imported files)."""
+        while True:
+            following = self.imported is not None and self.picked >= self.by_rank
+            if following and not self.frontier and pending:
+                return None
+            imported = following and bool(self.frontier)
+            f = self.frontier.popleft() if imported else next(self.ranked, None)
+            if f is None:
+                return None
+            if id(f) in self.taken:
+                continue
+            self.taken.add(id(f))
+            if self.allowance is not None and not blob_store.has(f.get("sha")):
+                if not self.allowance:
+                    self.over_budget += 1
+                    continue
+                self.allowance -= 1
+            self.picked += 1
+            self.followed += imported
+            return f
+
+    def learn(self, entry: dict) -> None:
+        """Queue the files a fetched entry (with its path as yielded) imports."""
+        if self.imported is None:
+            return
+        for path in self.imported(entry):
+            target = self.by_path.get(path)
+            if target is not None and id(target) not in self.taken:
+                self.frontier.append(target)
+
+
+def _iter_file_contents(owner: str, repo: str, files: list, max_files: int, token: str = None,
+                        concurrency: int = None, coverage: dict = None, base: str = "", follow_imports: bool = None,
+                        ref: str = None, entry_names=frozenset(), import_follower=None):
+    """
+    Yield up to max_files code files, best first (see _Picker), with paths relative to `base`,
+    keeping at most `concurrency` downloads in flight. coverage (if given) receives the counts.
+    """
+    concurrency = min(MAX_FETCH_CONCURRENCY, max(1, concurrency or FETCH_CONCURRENCY))
+    follow_imports = FOLLOW_IMPORTS if follow_imports is None else follow_imports
+    coverage = coverage if coverage is not None else {}
+    candidates = list(_code_files(files))
+    ranked = sorted((f for f in candidates if (f.get("size") or 0) <= MAX_FILE_SIZE),
+                    key=lambda f: _rank_key(f, entry_names))
+    coverage.update(mode="contents", candidates=len(candidates), files=0, cached=0, downloaded=0, missing=0, failed=0,
+                    oversized=len(candidates) - len(ranked), binary=0, rateLimited=0, followed=0, skippedByBudget=0,
+                    skippedByLimit=0, failedPaths=[])
+    picker = _Picker(ranked, max_files, token, base, import_follower if follow_imports else None)
+    window = deque()
+    submitted = 0
+    count = 0
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="github-fetch")
+    try:
+        while count < max_files:
+            while len(window) < concurrency and count + len(window) < max_files:
+                f = picker.next(pending=bool(window))
+                if f is None:
+                    break
+                window.append((f["path"], pool.submit(_fetch_entry, owner, repo, f, token, ref)))
+                submitted += 1
+            if not window:
+                break
+            path, future = window.popleft()
+            outcome, entry = future.result()
+            coverage[outcome] += 1
+            if outcome == "failed" and len(coverage["failedPaths"]) < 20:
+                coverage["failedPaths"].append(path)
+            if entry is not None:
+                count += 1
+                coverage["files"] = count
+                if base:
+                    entry["path"] = entry["path"][len(base) + 1:]
+                picker.learn(entry)
+                yield entry
+    finally:
+        cancelled = sum(1 for _, future in window if future.cancel())
+        pool.shutdown(wait=False)
+        # the budget only cost files that would have fit under max_files
+        coverage["skippedByBudget"] = min(picker.over_budget, max(0, max_files - count))
+        coverage["skippedByLimit"] = len(ranked) - submitted + cancelled - coverage["skippedByBudget"]
+        coverage["followed"] = picker.followed
+        coverage["rateLimit"] = scheduler.snapshot(credential_key(token))
+        coverage["complete"] = not (coverage["failed"] or coverage["rateLimited"] or coverage["skippedByBudget"])
+
+
+def open_archive(owner: str, repo: str, ref: str = None, token: str = None) -> requests.Response:
+    """Start downloading the repo tarball (default branch unless ref); returns the streaming response."""
+    url = f"{GITHUB_API}/repos/{owner}/{repo}/tarball" + (f"/{ref}" if ref else "")
+    r = scheduler.get(get_session(), url, token=token, headers=_auth_headers(token), stream=True, timeout=(10, 60))
+    if r.status_code != 200:
+        r.close()
+        if r.status_code == 404:
+            raise RuntimeError(f"Repo not found: {owner}/{repo}")
+        raise RuntimeError(f"Failed to download {owner}/{repo} archive (HTTP {r.status_code})")
+    return r
+
+
+class _LimitedReader:
+    """File-like view of a response body that raises RuntimeError after `limit` bytes."""
+
+    def __init__(self, raw, limit: int):
+        self.raw, self.limit, self.count = raw, limit, 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.raw.read(size)
+        self.count += len(data)
+        if self.count > self.limit:
+            raise RuntimeError(f"Repo archive is larger than {self.limit // (1024 * 1024)} MB")
+        return data
+
+
+def _iter_archive_files(response: requests.Response, max_files: int, coverage: dict = None, scope: dict = None):
+    """
+    Extract code files from a streaming tarball response, one member at a time.
+    Members are filtered on their tar header (type, size, path) before their
+    data is read, so only kept files are held in memory. The archive's
+    top-level "owner-repo-sha/" directory is dropped from paths. With a scope
+    (resolve_scope) only members in it are read, with paths relative to its path;
+    the tarball itself always holds the whole repo.
+    coverage (if given) receives files, oversized, binary, excluded and truncated (max_files reached).
+    """
+    coverage = coverage if coverage is not None else {}
+    coverage.update(mode="archive", files=0, oversized=0, binary=0, excluded=0, truncated=False, complete=True)
+    keep = scope_filter(scope) if scope else None
+    base = scope["path"] if scope else ""
+    count = 0
+    with response:
+        response.raw.decode_content = True
+        try:
+            with tarfile.open(fileobj=_LimitedReader(response.raw, ARCHIVE_MAX_BYTES), mode="r|*") as tar:
+                for member in tar:
+                    if not member.isreg():
+                        continue
+                    path = member.name.split("/", 1)[1] if "/" in member.name else ""
+                    if not path or not is_code_path(path):
+                        continue
+                    if keep is not None and not keep(path):
+                        coverage["excluded"] += 1
+                        continue
+                    if member.size > MAX_FILE_SIZE:
+                        coverage["oversized"] += 1
+                        continue
+                    if count >= max_files:
+                        coverage["truncated"] = True
+                        break
+                    data = tar.extractfile(member).read()
+                    if is_binary(data):
+                        coverage["binary"] += 1
+                        continue
+                    sha = git_blob_sha(data)
+                    blob_store.put(sha, data)
+                    count += 1
+                    coverage["files"] = count
+                    if base:
+                        path = path[len(base) + 1:]
+                    yield {"path": path, "content": data.decode("utf-8", errors="replace"), "sha": sha}
+        except (tarfile.TarError, EOFError, OSError, requests.RequestException) as e:
+            raise RuntimeError(f"Failed to read repo archive: {e}")
+
+
+def fetch_repo_files(url: str, max_files: int = None, token: str = None, concurrency: int = None,
+                     mode: str = None, coverage: dict = None, ref: str = None, path: str = None,
+                     include=None, exclude=None, follow_imports: bool = None, entry_names=frozenset(),
+                     import_follower=None) -> list:
+    """
+    Fetch code files from a public GitHub repo.
+    Returns list of {path, content, sha}; see iter_repo_files.
+    """
+    return list(iter_repo_files(url, max_files=max_files, token=token, concurrency=concurrency, mode=mode,
+                                coverage=coverage, ref=ref, path=path, include=include, exclude=exclude,
+                                follow_imports=follow_imports, entry_names=entry_names,
+                                import_follower=import_follower))
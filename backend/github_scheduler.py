@@ -0,0 +1,165 @@
+"""
+Rate-limit-aware scheduling of GitHub API requests, shared by every request in a worker.
+Each credential (a token, or the worker's own IP when unauthenticated) has a
+budget read from X-RateLimit-Remaining / X-RateLimit-Reset on every response.
+Requests are refused locally once a budget is spent, instead of burning more
+403s, except conditional ones: a 304 is not counted against the limit.
+Secondary rate limits (403/429 with Retry-After, or "secondary rate limit" in
+the message) pause that credential for every thread, then the request is
+retried with exponential backoff. 5xx and connection errors are retried too.
+"""
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+
+from disk_cache import token_fingerprint
+
+MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "3"))
+MAX_RETRY_WAIT = float(os.getenv("GITHUB_MAX_RETRY_WAIT", "30"))  # seconds one request may wait in total
+BACKOFF_BASE = 1.0  # seconds; doubled per attempt, with jitter, when there is no Retry-After
+
+
+class RateLimitError(RuntimeError):
+    """The primary rate limit for this credential is spent until `reset` (epoch seconds)."""
+
+    def __init__(self, message: str, reset: Optional[int] = None):
+        super().__init__(message)
+        self.reset = reset
+
+
+def credential_key(token: Optional[str]) -> str:
+    """Budget bucket: a token fingerprint, or "anonymous" (limits then apply to this worker's IP)."""
+    return token_fingerprint(token)
+
+
+def _is_secondary_limit(r: requests.Response) -> bool:
+    if r.status_code not in (403, 429):
+        return False
+    if r.headers.get("Retry-After"):
+        return True
+    return "secondary rate limit" in r.text[:500].lower()
+
+
+def _is_primary_limit(r: requests.Response) -> bool:
+    return r.status_code in (403, 429) and r.headers.get("X-RateLimit-Remaining") == "0"
+
+
+class RequestScheduler:
+    """Per-credential budgets and pauses; use get() instead of session.get()."""
+
+    def __init__(self, sleep=time.sleep, clock=time.time):
+        self._budgets: Dict[str, Dict[str, int]] = {}
+        self._paused_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._sleep, self._clock = sleep, clock
+
+    def observe(self, key: str, r: requests.Response) -> None:
+        """Record the budget reported by a response (if it carries rate limit headers)."""
+        remaining, reset = r.headers.get("X-RateLimit-Remaining"), r.headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        try:
+            budget = {"remaining": int(remaining), "reset": int(reset),
+                      "limit": int(r.headers.get("X-RateLimit-Limit", 0)) or None}
+        except ValueError:
+            return
+        with self._lock:
+            self._budgets[key] = budget
+
+    def remaining(self, key: str) -> Optional[int]:
+        """Requests left for this credential, or None if unknown (never seen, or the window has reset)."""
+        with self._lock:
+            budget = self._budgets.get(key)
+        if budget is None or budget["reset"] <= self._clock():
+            return None
+        return budget["remaining"]
+
+    def snapshot(self, key: str) -> Optional[Dict[str, Any]]:
+        """{remaining, limit, reset} as last reported, for coverage reports."""
+        with self._lock:
+            budget = self._budgets.get(key)
+        return dict(budget) if budget else None
+
+    def _spend(self, key: str, conditional: bool = False) -> None:
+        """
+        Refuse locally when the budget is known to be spent, unless the request is
+        conditional (its 304 would be free); otherwise count the request.
+        """
+        with self._lock:
+            budget = self._budgets.get(key)
+            if budget is None or budget["reset"] <= self._clock():
+                return
+            if budget["remaining"] <= 0:
+                if conditional:
+                    return
+                raise RateLimitError(_limit_message(budget["reset"]), budget["reset"])
+            budget["remaining"] -= 1  # corrected by the response headers
+
+    def _wait_for_pause(self, key: str) -> None:
+        with self._lock:
+            until = self._paused_until.get(key, 0.0)
+        delay = until - self._clock()
+        if delay > 0:
+            self._sleep(min(delay, MAX_RETRY_WAIT))
+
+    def _pause(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._paused_until[key] = max(self._paused_until.get(key, 0.0), self._clock() + seconds)
+
+    def get(self, session: requests.Session, url: str, token: str = None, **kwargs) -> requests.Response:
+        """
+        session.get with budget tracking and retries. Raises RateLimitError when the
+        primary limit is spent; after MAX_RETRIES (or MAX_RETRY_WAIT seconds of
+        waiting) the last error response is returned, or the connection error raised.
+        """
+        key = credential_key(token)
+        conditional = "If-None-Match" in (kwargs.get("headers") or {})
+        waited = 0.0
+        for attempt in range(MAX_RETRIES + 1):
+            self._wait_for_pause(key)
+            self._spend(key, conditional)
+            backoff = BACKOFF_BASE * 2 ** attempt * random.uniform(0.5, 1.0)
+            try:
+                r = session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == MAX_RETRIES or waited + backoff > MAX_RETRY_WAIT:
+                    raise
+                delay = backoff
+            else:
+                self.observe(key, r)
+                if _is_primary_limit(r) and not r.headers.get("Retry-After"):
+                    reset = int(r.headers.get("X-RateLimit-Reset", 0)) or None
+                    raise RateLimitError(_limit_message(reset), reset)
+                secondary = _is_secondary_limit(r)
+                if not (secondary or r.status_code >= 500) or attempt == MAX_RETRIES:
+                    return r
+                delay = _retry_after(r)
+                delay = backoff if delay is None else delay
+                if waited + delay > MAX_RETRY_WAIT:
+                    return r
+                if secondary:
+                    self._pause(key, delay)
+                r.close()
+            waited += delay
+            self._sleep(delay)
+        raise AssertionError("unreachable")
+
+
+def _retry_after(r: requests.Response) -> Optional[float]:
+    value = r.headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _limit_message(reset: Optional[int]) -> str:
+    when = time.strftime("%H:%M UTC", time.gmtime(reset)) if reset else "later"
+    return f"GitHub API rate limit exceeded (resets at {when}). Add a GitHub token or use fetchMode \"archive\"."
+
+
+scheduler = RequestScheduler()
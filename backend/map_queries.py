@@ -0,0 +1,288 @@
+"""
+Queries over the file dependency graph of a built CodebaseGraph.
+They walk the graph's out_edges / in_edges adjacency directly, so nothing is
+serialized: transitive dependents and dependencies, the shortest import path
+between two files, import cycles (strongly connected components), the files
+with the highest fan-in or fan-out, and a PageRank-based file ranking used to
+choose LLM context, boosted toward files the symbol index ties to identifiers
+in a chat message. Whole-graph results are cached on the graph until its
+edges change.
+"""
+import heapq
+import operator
+import re
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from codebase_graph import CodebaseGraph
+
+DEPENDENCY = "dependency"
+QUERY_RESULT_LIMIT = 500
+PAGERANK_DAMPING = 0.85
+PAGERANK_ITERATIONS = 50
+PAGERANK_TOLERANCE = 1e-4  # L1 change per iteration; the order settles well before this
+# Files nobody imports but where reading usually starts; they get ENTRY_POINT_BONUS
+# (PageRank is normalized to 0..1) so they are not crowded out by imported hubs.
+ENTRY_POINT_NAMES = {
+    "main.py", "app.py", "__main__.py", "manage.py", "wsgi.py", "server.py", "cli.py",
+    "index.js", "index.ts", "index.jsx", "index.tsx", "main.js", "main.ts", "main.jsx", "main.tsx",
+    "app.js", "app.jsx", "app.tsx", "server.js", "server.ts", "main.go", "main.rs", "lib.rs",
+    "main.c", "main.cpp", "application.java", "main.java",
+}
+ENTRY_POINT_BONUS = 0.5
+# Files that define (or reference) an identifier a chat message names
+DEFINITION_BONUS = 1.0
+REFERENCE_BONUS = 0.25
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def file_id(graph: CodebaseGraph, path_or_id: str) -> str:
+    """Accept "src/a.py" or "file:src/a.py"; raise KeyError if the file is not in the map."""
+    node_id = path_or_id if path_or_id.startswith("file:") else f"file:{path_or_id}"
+    node = graph.nodes.get(node_id)
+    if node is None or node.type != "file":
+        raise KeyError(path_or_id)
+    return node_id
+
+
+def _adjacency(graph: CodebaseGraph, reverse: bool) -> Dict[str, List[str]]:
+    return (graph.in_edges if reverse else graph.out_edges).get(DEPENDENCY, {})
+
+
+def transitive(graph: CodebaseGraph, path: str, direction: str = "dependents",
+               max_depth: Optional[int] = None, limit: int = QUERY_RESULT_LIMIT) -> Dict[str, Any]:
+    """
+    Breadth-first closure of one file. "dependents" follows importers (who breaks
+    if this file changes), "dependencies" follows imports. Returns
+    {files: [{id, depth}], total, truncated}, nearest first.
+    """
+    if direction not in ("dependents", "dependencies"):
+        raise ValueError("direction must be dependents or dependencies")
+    start = file_id(graph, path)
+    adjacency = _adjacency(graph, reverse=direction == "dependents")
+    depth = {start: 0}
+    queue = deque([start])
+    found = []
+    while queue:
+        current = queue.popleft()
+        d = depth[current]
+        if max_depth is not None and d >= max_depth:
+            continue
+        for nxt in adjacency.get(current, ()):
+            if nxt not in depth:
+                depth[nxt] = d + 1
+                found.append(nxt)
+                queue.append(nxt)
+    return {
+        "files": [{"id": n, "depth": depth[n]} for n in found[:limit]],
+        "total": len(found),
+        "truncated": len(found) > limit,
+    }
+
+
+def shortest_path(graph: CodebaseGraph, source: str, target: str) -> Optional[List[str]]:
+    """Fewest-hops import chain source -> ... -> target as file ids, or None if target is unreachable."""
+    start, goal = file_id(graph, source), file_id(graph, target)
+    if start == goal:
+        return [start]
+    adjacency = _adjacency(graph, reverse=False)
+    parent = {start: None}
+    queue = deque([start])
+    while queue:
+        current = queue.popleft()
+        for nxt in adjacency.get(current, ()):
+            if nxt in parent:
+                continue
+            parent[nxt] = current
+            if nxt == goal:
+                path = [nxt]
+                while parent[path[-1]] is not None:
+                    path.append(parent[path[-1]])
+                return path[::-1]
+            queue.append(nxt)
+    return None
+
+
+def import_cycles(graph: CodebaseGraph) -> List[List[str]]:
+    """
+    Strongly connected components with more than one file (or a file importing
+    itself), largest first. Iterative Tarjan, O(files + dependency edges); cached.
+    """
+    cached = graph.query_cache.get("cycles")
+    if cached is not None:
+        return cached
+    adjacency = _adjacency(graph, reverse=False)
+    index: Dict[str, int] = {}
+    low: Dict[str, int] = {}
+    on_stack = set()
+    stack: List[str] = []
+    components = []
+    for root in graph.file_paths:
+        root = f"file:{root}"
+        if root in index:
+            continue
+        work = [(root, iter(adjacency.get(root, ())))]
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, neighbours = work[-1]
+            for nxt in neighbours:
+                if nxt not in index:
+                    index[nxt] = low[nxt] = len(index)
+                    stack.append(nxt)
+                    on_stack.add(nxt)
+                    work.append((nxt, iter(adjacency.get(nxt, ()))))
+                    break
+                if nxt in on_stack:
+                    low[node] = min(low[node], index[nxt])
+            else:
+                work.pop()
+                if work:
+                    caller = work[-1][0]
+                    low[caller] = min(low[caller], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or graph.has_edge(node, node, DEPENDENCY):
+                        components.append(sorted(component))
+    components.sort(key=lambda c: (-len(c), c[0]))
+    graph.query_cache["cycles"] = components
+    return components
+
+
+def top_files(graph: CodebaseGraph, by: str = "fanIn", k: int = 20) -> List[Dict[str, Any]]:
+    """Files with the most importers ("fanIn") or imports ("fanOut"): [{id, fanIn, fanOut}], ties by id."""
+    if by not in ("fanIn", "fanOut"):
+        raise ValueError("by must be fanIn or fanOut")
+    degrees = graph.query_cache.get("degrees")
+    if degrees is None:
+        incoming, outgoing = _adjacency(graph, reverse=True), _adjacency(graph, reverse=False)
+        degrees = graph.query_cache["degrees"] = [
+            (f"file:{p}", len(incoming.get(f"file:{p}", ())), len(outgoing.get(f"file:{p}", ())))
+            for p in graph.file_paths
+        ]
+    column = 1 if by == "fanIn" else 2
+    best = heapq.nsmallest(max(0, k), degrees, key=lambda row: (-row[column], row[0]))
+    return [{"id": node_id, "fanIn": fan_in, "fanOut": fan_out} for node_id, fan_in, fan_out in best]
+
+
+def entry_points(graph: CodebaseGraph) -> set:
+    """File ids with a conventional entry name (main.py, index.js, ...) or that declare routes."""
+    found = {node.parent for node in graph.nodes.values() if node.type == "route"}
+    found.update(f"file:{p}" for p in graph.file_paths if p.rsplit("/", 1)[-1].lower() in ENTRY_POINT_NAMES)
+    return found
+
+
+def _pagerank(graph: CodebaseGraph, ids: List[str]) -> Dict[str, float]:
+    """
+    Power iteration over dependency edges (importer -> imported), pulling each
+    file's rank from its importers; dangling mass is spread evenly.
+    """
+    n = len(ids)
+    position = {node_id: i for i, node_id in enumerate(ids)}
+    outgoing, incoming = _adjacency(graph, reverse=False), _adjacency(graph, reverse=True)
+    out_degree = [sum(1 for t in outgoing.get(node_id, ()) if t in position) for node_id in ids]
+    sources = [[position[s] for s in incoming.get(node_id, ()) if s in position] for node_id in ids]
+    dangling = [i for i in range(n) if not out_degree[i]]
+    inverse = [PAGERANK_DAMPING / d if d else 0.0 for d in out_degree]
+    rank = [1.0 / n] * n
+    for _ in range(PAGERANK_ITERATIONS):
+        share = [r * w for r, w in zip(rank, inverse)]
+        base = (1.0 - PAGERANK_DAMPING) / n + PAGERANK_DAMPING * sum(rank[i] for i in dangling) / n
+        nxt = [base + sum(map(share.__getitem__, src)) for src in sources]
+        delta = sum(map(abs, map(operator.sub, nxt, rank)))
+        rank = nxt
+        if delta < PAGERANK_TOLERANCE:
+            break
+    return dict(zip(ids, rank))
+
+
+def file_scores(graph: CodebaseGraph) -> Dict[str, float]:
+    """
+    {file id: importance}: PageRank on the import graph normalized to 0..1, plus
+    ENTRY_POINT_BONUS for entry points. Computed once per map and cached.
+    """
+    cached = graph.query_cache.get("scores")
+    if cached is not None:
+        return cached
+    ids = [f"file:{p}" for p in graph.file_paths if f"file:{p}" in graph.nodes]
+    rank = _pagerank(graph, ids) if ids else {}
+    top = max(rank.values(), default=0.0) or 1.0
+    entries = entry_points(graph)
+    scores = {
+        node_id: score / top + (ENTRY_POINT_BONUS if node_id in entries else 0.0)
+        for node_id, score in rank.items()
+    }
+    graph.query_cache["scores"] = scores
+    return scores
+
+
+def ranked_files(graph: CodebaseGraph) -> List[str]:
+    """File paths, most important first (ties keep map order). Cached."""
+    cached = graph.query_cache.get("ranked")
+    if cached is not None:
+        return cached
+    scores = file_scores(graph)
+    order = sorted(scores, key=lambda node_id: -scores[node_id])
+    graph.query_cache["ranked"] = ranked = [node_id[5:] for node_id in order]
+    return ranked
+
+
+def mentioned_files(graph: CodebaseGraph, text: str) -> Dict[str, float]:
+    """
+    {file id: bonus} for identifiers in `text` that the map defines: DEFINITION_BONUS
+    per definition in a file, REFERENCE_BONUS per file referencing the name.
+    """
+    bonus: Dict[str, float] = {}
+    for name in dict.fromkeys(IDENTIFIER.findall(text or "")):
+        definitions = graph.definitions(name)
+        if not definitions:
+            continue
+        for item_id in definitions:
+            file_node = graph.nodes[item_id].parent
+            bonus[file_node] = bonus.get(file_node, 0.0) + DEFINITION_BONUS
+        for path in graph.referencing_files(name):
+            bonus[f"file:{path}"] = bonus.get(f"file:{path}", 0.0) + REFERENCE_BONUS
+    return bonus
+
+
+def select_context(graph: CodebaseGraph, files: List[Dict[str, Any]], max_files: int,
+                   max_nodes: int = 0, max_edges: int = 0, query: str = ""):
+    """
+    Pick what to show an LLM when the whole repo does not fit: the max_files most
+    important files, the nodes of the most important files (each file followed by
+    its functions/classes) and the dependency edges into the most important targets.
+    With a query (a chat message), files tied to its identifiers rank higher (see
+    mentioned_files). Returns (files, node dicts, edge dicts); files missing from
+    the map come last.
+    """
+    scores = file_scores(graph)
+    ranked = ranked_files(graph)
+    bonus = mentioned_files(graph, query) if query else {}
+    if bonus:
+        scores = {node_id: score + bonus.get(node_id, 0.0) for node_id, score in scores.items()}
+        ranked = sorted(ranked, key=lambda path: -scores.get(f"file:{path}", 0.0))
+    by_path = {f.get("path", ""): f for f in files}
+    picked = [by_path[p] for p in ranked if p in by_path][:max_files]
+    if len(picked) < max_files:
+        seen = {f.get("path", "") for f in picked}
+        picked += [f for f in files if f.get("path", "") not in seen][:max_files - len(picked)]
+    nodes = []
+    for path in ranked:
+        if len(nodes) >= max_nodes:
+            break
+        file_node = f"file:{path}"
+        for node_id in [file_node] + graph.children.get(file_node, []):
+            nodes.append(graph.nodes[node_id].to_dict())
+    edges = heapq.nsmallest(
+        max_edges,
+        ((source, target) for source, targets in _adjacency(graph, reverse=False).items() for target in targets),
+        key=lambda edge: (-scores.get(edge[1], 0.0), -scores.get(edge[0], 0.0)),
+    )
+    return picked, nodes[:max_nodes], [{"source": s, "target": t, "type": DEPENDENCY} for s, t in edges]
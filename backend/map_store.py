@@ -0,0 +1,42 @@
+"""
+Server-side store of built codebase graphs, so follow-up requests (incremental
+updates, queries) can work on a map without the client re-sending the repo.
+Per worker process and bounded by an LRU; clients rebuild when an id expires.
+"""
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from codebase_graph import CodebaseGraph
+
+MAP_STORE_SIZE = int(os.getenv("MAP_STORE_SIZE", "16"))  # graphs kept per worker
+
+
+class MapStore:
+    """Thread-safe LRU of map id -> CodebaseGraph."""
+
+    def __init__(self, max_maps: int = MAP_STORE_SIZE):
+        self.max_maps = max_maps
+        self._maps: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, graph: CodebaseGraph, map_id: str = None) -> str:
+        map_id = map_id or uuid.uuid4().hex
+        with self._lock:
+            self._maps[map_id] = graph
+            self._maps.move_to_end(map_id)
+            while len(self._maps) > self.max_maps:
+                self._maps.popitem(last=False)
+        return map_id
+
+    def get(self, map_id: str) -> Optional[CodebaseGraph]:
+        with self._lock:
+            graph = self._maps.get(map_id or "")
+            if graph is not None:
+                self._maps.move_to_end(map_id)
+            return graph
+
+
+map_store = MapStore()
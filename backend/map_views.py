@@ -0,0 +1,130 @@
+"""
+Level-of-detail views over a built CodebaseGraph.
+summarize_map returns folders down to a depth with aggregate counts, and
+expand_node returns one node's children on demand. Dependency and "uses"
+edges are rolled up to the nearest visible ancestor and weighted, so the
+payload depends on what is on screen rather than on repo size.
+"""
+from typing import List, Dict, Any, Iterable
+
+from codebase_graph import CodebaseGraph
+
+DEFAULT_DEPTH = 2
+ROLLUP_EDGE_TYPES = ("dependency", "uses")
+
+
+def node_depth(node_id: str) -> int:
+    """Folder a/b -> 2, file:a/b/c.py -> 3, file:a/b/c.py::fn -> 4."""
+    if node_id.startswith("file:"):
+        path, _, item = node_id[5:].partition("::")
+        return path.count("/") + 1 + (1 if item else 0)
+    return node_id.count("/") + 1
+
+
+def subtree_counts(graph: CodebaseGraph) -> Dict[str, Dict[str, int]]:
+    """{node_id: {folders, files, items}} totals below each node, cached until the graph changes."""
+    if graph.stats is not None:
+        return graph.stats
+    counts = {node_id: {"folders": 0, "files": 0, "items": 0} for node_id in graph.nodes}
+    for node_id, node in graph.nodes.items():
+        kind = "folders" if node.type == "folder" else "files" if node.type == "file" else "items"
+        parent = node.parent
+        while parent is not None and parent in counts:
+            counts[parent][kind] += 1
+            parent = graph.nodes[parent].parent
+    graph.stats = counts
+    return counts
+
+
+def _with_counts(graph: CodebaseGraph, node_id: str, counts: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    node = graph.nodes[node_id].to_dict()
+    node["counts"] = counts[node_id]
+    node["expandable"] = bool(graph.children.get(node_id))
+    return node
+
+
+def _rollup(graph: CodebaseGraph, node_id: str, visible: set) -> str:
+    """Nearest ancestor-or-self of node_id that is visible, or None."""
+    while node_id is not None and node_id not in visible:
+        node = graph.nodes.get(node_id)
+        node_id = node.parent if node else None
+    return node_id
+
+
+def _descendants(graph: CodebaseGraph, node_id: str) -> Iterable[str]:
+    stack = [node_id]
+    while stack:
+        current = stack.pop()
+        yield current
+        stack.extend(graph.children.get(current, ()))
+
+
+def _rolled_up_edges(graph: CodebaseGraph, sources: Iterable[str], visible: set) -> List[Dict[str, Any]]:
+    """
+    Aggregate typed edges leaving or entering `sources`, between visible nodes, with
+    weights (an aggregated "uses" edge counts as the item pairs it stands for).
+    """
+    sources = set(sources)
+    weights: Dict[tuple, int] = {}
+    for node_id in sources:
+        for edge_type in ROLLUP_EDGE_TYPES:
+            for other in graph.successors(node_id, edge_type):
+                key = (_rollup(graph, node_id, visible), _rollup(graph, other, visible), edge_type)
+                weights[key] = weights.get(key, 0) + graph.edge_weight(node_id, other, edge_type)
+            for other in graph.predecessors(node_id, edge_type):
+                if other in sources:
+                    continue  # already counted as the other node's successor
+                key = (_rollup(graph, other, visible), _rollup(graph, node_id, visible), edge_type)
+                weights[key] = weights.get(key, 0) + graph.edge_weight(other, node_id, edge_type)
+    return [
+        {"source": s, "target": t, "type": edge_type, "weight": w}
+        for (s, t, edge_type), w in weights.items()
+        if s is not None and t is not None and s != t
+    ]
+
+
+def summarize_map(graph: CodebaseGraph, depth: int = DEFAULT_DEPTH) -> Dict[str, Any]:
+    """
+    Folders (and root-level files) down to `depth`, each with subtree counts,
+    folder -> folder edges, and dependency edges rolled up to those folders.
+    """
+    counts = subtree_counts(graph)
+    visible = [
+        node_id for node_id, node in graph.nodes.items()
+        if (node.type == "folder" and node_depth(node_id) <= depth)
+        or (node.type == "file" and node.parent is None)
+    ]
+    visible_set = set(visible)
+    nodes = [_with_counts(graph, node_id, counts) for node_id in visible]
+    edges = [
+        {"source": node["parent"], "target": node["id"]}
+        for node in nodes if node.get("parent") in visible_set
+    ]
+    # files and their items: item-level "uses" edges count like the aggregated ones they replace
+    sources = [n for n, node in graph.nodes.items() if node.type != "folder"]
+    edges.extend(_rolled_up_edges(graph, sources, visible_set))
+    return {
+        "nodes": nodes,
+        "edges": edges,
+        "depth": depth,
+        "totals": {"nodes": len(graph.nodes), "edges": len(graph.edges), "files": len(graph.file_paths)},
+        "usesEdges": graph.uses_summary,
+    }
+
+
+def expand_node(graph: CodebaseGraph, node_id: str, visible: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Direct children of a folder or file, with counts, parent -> child edges, and
+    dependency/"uses" edges touching the node's subtree rolled up to the new
+    children or to the client's currently `visible` nodes.
+    Raises KeyError if the node is not in the graph.
+    """
+    if node_id not in graph.nodes:
+        raise KeyError(node_id)
+    counts = subtree_counts(graph)
+    children = list(graph.children.get(node_id, ()))
+    visible_set = (set(visible) - {node_id}) | set(children)
+    nodes = [_with_counts(graph, child, counts) for child in children]
+    edges = [{"source": node_id, "target": child} for child in children]
+    edges.extend(_rolled_up_edges(graph, _descendants(graph, node_id), visible_set))
+    return {"nodeId": node_id, "nodes": nodes, "edges": edges}
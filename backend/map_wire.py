@@ -0,0 +1,121 @@
+"""
+Compact wire format for codebase maps (opt-in, content type
+application/vnd.codeflow.map+json).
+Every id/label/path string is stored once in a string table; nodes and edges
+are parallel integer arrays (string indices, node indices, type enums), so
+long ids are not repeated in every edge. Bodies are gzip- or brotli-encoded
+per the client's Accept-Encoding.
+"""
+import gzip
+import json
+from typing import List, Dict, Any, Tuple
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+COMPACT_CONTENT_TYPE = "application/vnd.codeflow.map+json"
+COMPACT_FORMAT = "codeflow-compact/1"
+
+
+class _Interner:
+    def __init__(self):
+        self.strings: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def __call__(self, value: str) -> int:
+        i = self.index.get(value)
+        if i is None:
+            i = self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return i
+
+
+def encode_compact(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a { nodes, edges, files, filesWithContent? } map into the compact shape:
+    strings[], nodeTypes[], edgeTypes[] (index 0 = untyped), nodes {id, label, type, parent}
+    and edges {source, target, type, weight?} as parallel int arrays (parent -1 = none,
+    weight 0 = unweighted; the array is omitted when no edge is weighted),
+    files as string indices and contents aligned with files. Other keys pass through.
+    """
+    intern = _Interner()
+    node_types: Dict[str, int] = {}
+    edge_types: Dict[Any, int] = {None: 0}
+    nodes = result.get("nodes") or []
+    node_index = {n["id"]: i for i, n in enumerate(nodes)}
+
+    ids, labels, types, parents = [], [], [], []
+    for n in nodes:
+        ids.append(intern(n["id"]))
+        labels.append(intern(n.get("label", "")))
+        types.append(node_types.setdefault(n.get("type"), len(node_types)))
+        parents.append(node_index.get(n.get("parent"), -1))
+
+    sources, targets, etypes, eweights = [], [], [], []
+    for e in result.get("edges") or []:
+        sources.append(node_index[e["source"]])
+        targets.append(node_index[e["target"]])
+        etypes.append(edge_types.setdefault(e.get("type"), len(edge_types)))
+        eweights.append(e.get("weight", 0))
+
+    payload = {k: v for k, v in result.items() if k not in ("nodes", "edges", "files", "filesWithContent")}
+    payload.update({
+        "format": COMPACT_FORMAT,
+        "nodeTypes": list(node_types),
+        "edgeTypes": list(edge_types),
+        "nodes": {"id": ids, "label": labels, "type": types, "parent": parents},
+        "edges": {"source": sources, "target": targets, "type": etypes},
+        "files": [intern(p) for p in result.get("files") or []],
+    })
+    if any(eweights):
+        payload["edges"]["weight"] = eweights
+    if "filesWithContent" in result:
+        contents = {f["path"]: f.get("content", "") for f in result["filesWithContent"]}
+        payload["contents"] = [contents.get(intern.strings[i], "") for i in payload["files"]]
+    payload["strings"] = intern.strings
+    return payload
+
+
+def decode_compact(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of encode_compact (used by benchmarks and non-JS clients)."""
+    strings = payload["strings"]
+    n, e = payload["nodes"], payload["edges"]
+    ids = [strings[i] for i in n["id"]]
+    nodes = [
+        {"id": ids[i], "label": strings[n["label"][i]], "type": payload["nodeTypes"][n["type"][i]],
+         "parent": ids[n["parent"][i]] if n["parent"][i] >= 0 else None}
+        for i in range(len(ids))
+    ]
+    edges = []
+    weights = e.get("weight") or [0] * len(e["source"])
+    for s, t, et, w in zip(e["source"], e["target"], e["type"], weights):
+        edge = {"source": ids[s], "target": ids[t]}
+        if payload["edgeTypes"][et]:
+            edge["type"] = payload["edgeTypes"][et]
+        if w:
+            edge["weight"] = w
+        edges.append(edge)
+    result = {"nodes": nodes, "edges": edges, "files": [strings[i] for i in payload["files"]]}
+    if "usesEdges" in payload:
+        result["usesEdges"] = payload["usesEdges"]
+    if "contents" in payload:
+        result["filesWithContent"] = [{"path": p, "content": c} for p, c in zip(result["files"], payload["contents"])]
+    return result
+
+
+def compress_body(body: bytes, accept_encoding: str) -> Tuple[bytes, str]:
+    """Compress with brotli if accepted and installed, else gzip if accepted. Returns (body, encoding or None)."""
+    accepted = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    if brotli is not None and "br" in accepted:
+        return brotli.compress(body, quality=5), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
+
+
+def compact_body(result: Dict[str, Any], accept_encoding: str) -> Tuple[bytes, str]:
+    """Serialize a map in the compact format and compress it for the response."""
+    body = json.dumps(encode_compact(result), separators=(",", ":")).encode("utf-8")
+    return compress_body(body, accept_encoding)
@@ -0,0 +1,88 @@
+"""
+Parse-result cache shared by every codebase endpoint.
+Entries are keyed by (content hash, path, parser version): the hash is the
+GitHub blob sha when the fetcher supplied one, otherwise the same git blob
+sha computed locally, so zip/JSON uploads and GitHub fetches share entries.
+An in-memory LRU sits in front of an optional on-disk tier (PARSE_CACHE_DIR)
+that survives worker restarts and is pruned oldest-first past PARSE_CACHE_MAX_BYTES.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from disk_cache import PRUNE_EVERY, key_path, prune, write_atomic
+
+PARSE_CACHE_SIZE = int(os.getenv("PARSE_CACHE_SIZE", "20000"))  # entries (one per file)
+PARSE_CACHE_DIR = (os.getenv("PARSE_CACHE_DIR") or "").strip() or None
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+
+class ParseCache:
+    """Thread-safe LRU of parse results with an optional JSON-on-disk second tier."""
+
+    def __init__(self, max_entries: int = PARSE_CACHE_SIZE, disk_dir: str = None,
+                 max_disk_bytes: int = PARSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._writes = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, value)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._store(key, value)
+        if not self._write_disk(key, value):
+            return
+        with self._lock:
+            self._writes += 1
+            due = self._writes % PRUNE_EVERY == 0
+        if due:
+            prune(self.disk_dir, self.max_disk_bytes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def _store(self, key: str, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Any]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(key_path(self.disk_dir, key), "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, value: Any) -> bool:
+        if not self.disk_dir:
+            return False
+        return write_atomic(key_path(self.disk_dir, key), json.dumps(value).encode("utf-8"))
+
+
+parse_cache = ParseCache(disk_dir=PARSE_CACHE_DIR)
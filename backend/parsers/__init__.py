@@ -0,0 +1,8 @@
+"""
+Language scanner plugins for codebase_parser.
+Each module exposes scan(content, filepath, references=True) -> (items, imports,
+references), the same shape as codebase_parser.scan_python, and is imported only when a
+file with one of its extensions is scanned (see codebase_parser.LANGUAGE_PLUGINS).
+Scanners make one regex pass over the file; imports are returned as project
+paths (without extension where the language omits it) for PathIndex.
+"""
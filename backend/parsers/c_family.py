@@ -0,0 +1,65 @@
+"""C and C++: top-level function definitions, structs/classes/unions/enums; project #includes."""
+import os
+import re
+
+from codebase_parser import WORDS, ScanResult, scope_references
+
+# Function definitions are only recognised at column 0 with a return type and a
+# body brace on the same or next line, which skips prototypes, calls and macros.
+# Return type tokens and the separators between them share no characters, so a
+# line that does not match fails in linear time (no backtracking over `a * * *`).
+C_SCANNER = re.compile(
+    r"""\n(?:
+        [ \t]*\#[ \t]*include[ \t]*(?:"(?P<inc>[^"\n]+)"|<(?P<sys>[^>\n]+)>)
+      | (?:typedef[ \t]+)?(?:template[ \t]*<[^>\n]*>[ \t]*)?(?:struct|class|union|enum(?:[ \t]+class)?)[ \t]+
+        (?:\w+[ \t]+)*?(?P<cls>[A-Za-z_]\w*)[ \t]*(?:final[ \t]*)?(?=[:{\n])
+      | (?P<ret>[A-Za-z_][\w:<>,]*(?:[ \t*&]+[\w:<>,]+)*?)[ \t*&]+(?P<func>~?[A-Za-z_][\w:~]*)[ \t]*
+        \([^;{}()]*(?:\([^;{}()]*\)[^;{}()]*)*\)[ \t]*(?:(?:const|noexcept|override|final)[ \t]*)*(?:\n[ \t]*)?\{
+    )""",
+    re.VERBOSE,
+)
+HEADER_EXTENSIONS = (".h", ".hh", ".hpp", ".hxx")
+NOT_RETURN_TYPES = {"return", "else", "if", "while", "for", "switch", "do", "case", "goto", "typedef", "using",
+                    "delete", "new", "throw", "sizeof", "define"}
+C_STOPWORDS = frozenset((
+    "auto break case char const continue default do double else enum extern float for goto if inline int long "
+    "register return short signed sizeof static struct switch typedef union unsigned void volatile while bool "
+    "class namespace template typename public private protected virtual override new delete this true false "
+    "nullptr using std const_cast static_cast dynamic_cast reinterpret_cast noexcept constexpr NULL include define"
+).split())
+
+
+def scan(content: str, filepath: str, references: bool = True) -> ScanResult:
+    """
+    Single pass over a C/C++ file. "x.h" includes starting with . resolve against
+    the including file's directory; other quoted includes, and <a/b.h> includes
+    with a directory, are looked up as repo paths. Qualified names (Foo::bar)
+    are recorded by their last segment.
+    """
+    items, imports, scopes = [], [], []
+    dir_path = os.path.dirname(filepath).replace("\\", "/")
+    text = "\n" + content
+    line, pos = 0, 0
+    for m in C_SCANNER.finditer(text):
+        start = m.start()
+        line += text.count("\n", pos, start + 1)
+        pos = start + 1
+        if m.group("inc"):
+            inc = m.group("inc")
+            if inc.startswith("."):
+                inc = os.path.normpath(os.path.join(dir_path, inc)).replace("\\", "/")
+            imports.append(inc)
+        elif m.group("sys"):
+            inc = m.group("sys")
+            if "/" in inc and inc.endswith(HEADER_EXTENSIONS):
+                imports.append(inc)
+        elif m.group("cls"):
+            items.append({"type": "class", "name": m.group("cls"), "line": line})
+            scopes.append((m.group("cls"), start, m.end()))
+        else:
+            if m.group("ret").split()[0] in NOT_RETURN_TYPES:
+                continue
+            name = m.group("func").rsplit("::", 1)[-1]
+            items.append({"type": "function", "name": name, "line": line})
+            scopes.append((name, start, m.end()))
+    return items, imports, scope_references(text, scopes, WORDS, C_STOPWORDS) if references else {}
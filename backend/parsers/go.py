@@ -0,0 +1,51 @@
+"""Go: functions, methods and struct/interface types; imports as package directories."""
+import re
+
+from codebase_parser import WORDS, ScanResult, scope_references
+
+GO_SCANNER = re.compile(
+    r"""\n(?:
+        func[ \t]+(?:\([^)\n]*\)[ \t]*)?(?P<func>\w+)[ \t]*[\[(]
+      | type[ \t]+(?P<type>\w+)(?:\[[^\]\n]*\])?[ \t]+(?:struct|interface)\b
+      | import[ \t]+(?:[\w.]+[ \t]+)?"(?P<imp>[^"\n]+)"
+      | import[ \t]*\((?P<block>[^)]*)\)
+    )""",
+    re.VERBOSE,
+)
+GO_IMPORT_PATH = re.compile(r'"([^"\n]+)"')
+GO_STOPWORDS = frozenset((
+    "break case chan const continue default defer else fallthrough for func go goto if import interface map "
+    "package range return select struct switch type var nil true false"
+).split())
+
+
+def _package_dir(import_path: str) -> str:
+    """
+    Module import path -> directory inside the repo: the host/owner/repo prefix
+    (github.com/acme/app/pkg/util -> pkg/util) is dropped. Standard library
+    paths have no dot in their first segment and are skipped ("").
+    """
+    parts = import_path.split("/")
+    if "." not in parts[0]:
+        return ""
+    return "/".join(parts[3:])
+
+
+def scan(content: str, filepath: str, references: bool = True) -> ScanResult:
+    """Single pass over a Go file. Returns (items, imports, references)."""
+    items, imports, scopes = [], [], []
+    text = "\n" + content
+    line, pos = 0, 0
+    for m in GO_SCANNER.finditer(text):
+        start = m.start()
+        line += text.count("\n", pos, start + 1)
+        pos = start + 1
+        kind = m.lastgroup
+        if kind == "func" or kind == "type":
+            name = m.group(kind)
+            items.append({"type": "function" if kind == "func" else "class", "name": name, "line": line})
+            scopes.append((name, start, m.end()))
+            continue
+        paths = [m.group("imp")] if kind == "imp" else GO_IMPORT_PATH.findall(m.group("block"))
+        imports.extend(d for d in map(_package_dir, paths) if d)
+    return items, imports, scope_references(text, scopes, WORDS, GO_STOPWORDS) if references else {}
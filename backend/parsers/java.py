@@ -0,0 +1,49 @@
+"""Java: classes, interfaces, enums, records and methods; imports as package paths."""
+import re
+
+from codebase_parser import WORDS, ScanResult, scope_references
+
+JAVA_SCANNER = re.compile(
+    r"""\n[ \t]*(?:
+        import[ \t]+(?P<static>static[ \t]+)?(?P<imp>\w+(?:\.\w+)*)(?P<star>\.\*)?[ \t]*;
+      | (?:(?:public|protected|private|static|final|abstract|sealed|non-sealed|strictfp)[ \t]+)*
+        (?:class|interface|enum|record|@interface)[ \t]+(?P<cls>\w+)
+      | (?:(?:public|protected|private|static|final|abstract|synchronized|native|default|strictfp)[ \t]+)+
+        (?:<[^>\n]*>[ \t]+)?(?:[\w$.<>\[\],? ]*?[ \t])?(?P<method>\w+)[ \t]*\(
+    )""",
+    re.VERBOSE,
+)
+JDK_PACKAGES = ("java.", "javax.", "jdk.", "sun.")
+JAVA_STOPWORDS = frozenset((
+    "abstract assert boolean break byte case catch char class const continue default do double else enum "
+    "extends final finally float for if implements import instanceof int interface long native new null "
+    "package private protected public return short static super switch synchronized this throw throws "
+    "transient try void volatile while var record true false"
+).split())
+
+
+def scan(content: str, filepath: str, references: bool = True) -> ScanResult:
+    """Single pass over a Java file. `import a.b.C;` -> a/b/C; static imports drop the member; * imports are skipped."""
+    items, imports, scopes = [], [], []
+    text = "\n" + content
+    line, pos = 0, 0
+    for m in JAVA_SCANNER.finditer(text):
+        start = m.start()
+        line += text.count("\n", pos, start + 1)
+        pos = start + 1
+        if m.group("imp"):
+            imp = m.group("imp")
+            if m.group("star") or imp.startswith(JDK_PACKAGES):
+                continue
+            parts = imp.split(".")
+            if m.group("static"):
+                parts = parts[:-1]
+            imports.append("/".join(parts))
+            continue
+        kind = "cls" if m.group("cls") else "method"
+        name = m.group(kind)
+        if name in JAVA_STOPWORDS:
+            continue
+        items.append({"type": "class" if kind == "cls" else "function", "name": name, "line": line})
+        scopes.append((name, start, m.end()))
+    return items, imports, scope_references(text, scopes, WORDS, JAVA_STOPWORDS) if references else {}
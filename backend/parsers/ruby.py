@@ -0,0 +1,42 @@
+"""Ruby: classes, modules and methods; require / require_relative paths."""
+import os
+import re
+
+from codebase_parser import WORDS, ScanResult, scope_references
+
+RUBY_SCANNER = re.compile(
+    r"""\n[ \t]*(?:
+        (?P<kind>class|module)[ \t]+(?:\w+::)*(?P<cls>[A-Z]\w*)
+      | def[ \t]+(?:self\.)?(?P<func>\w+)[?!=]?
+      | require[ \t(]+['"](?P<req>[^'"\n]+)['"]
+      | require_relative[ \t(]+['"](?P<rel>[^'"\n]+)['"]
+    )""",
+    re.VERBOSE,
+)
+RUBY_STOPWORDS = frozenset((
+    "alias and begin break case class def defined do else elsif end ensure false for if in module next nil "
+    "not or redo rescue retry return self super then true undef unless until when while yield require "
+    "require_relative attr_accessor attr_reader attr_writer"
+).split())
+
+
+def scan(content: str, filepath: str, references: bool = True) -> ScanResult:
+    """Single pass over a Ruby file. Method names drop a trailing ?, ! or = so they match call sites."""
+    items, imports, scopes = [], [], []
+    dir_path = os.path.dirname(filepath).replace("\\", "/")
+    text = "\n" + content
+    line, pos = 0, 0
+    for m in RUBY_SCANNER.finditer(text):
+        start = m.start()
+        line += text.count("\n", pos, start + 1)
+        pos = start + 1
+        if m.group("cls") or m.group("func"):
+            name = m.group("cls") or m.group("func")
+            items.append({"type": "class" if m.group("cls") else "function", "name": name, "line": line})
+            scopes.append((name, start, m.end()))
+        elif m.group("req"):
+            imports.append(m.group("req").rsplit(".rb", 1)[0])
+        else:
+            rel = os.path.normpath(os.path.join(dir_path, m.group("rel"))).replace("\\", "/")
+            imports.append(rel[:-3] if rel.endswith(".rb") else rel)
+    return items, imports, scope_references(text, scopes, WORDS, RUBY_STOPWORDS) if references else {}
@@ -0,0 +1,85 @@
+"""Rust: functions, structs, enums, traits and type aliases; `mod x;` and crate-local `use` paths."""
+import os
+import re
+
+from codebase_parser import WORDS, ScanResult, scope_references
+
+RUST_SCANNER = re.compile(
+    r"""\n[ \t]*(?:pub(?:\([^)\n]*\))?[ \t]+)?(?:
+        (?:(?:const|async|unsafe|extern(?:[ \t]+"[^"\n]*")?)[ \t]+)*fn[ \t]+(?P<func>\w+)
+      | (?:struct|enum|trait|union|type)[ \t]+(?P<type>\w+)
+      | mod[ \t]+(?P<mod>\w+)[ \t]*;
+      | use[ \t]+(?P<use>[^;]+);
+    )""",
+    re.VERBOSE,
+)
+USE_RENAME = re.compile(r"\s+as\s+\w+")
+MODULE_ROOTS = {"mod", "lib", "main"}
+RUST_STOPWORDS = frozenset((
+    "as async await break const continue crate dyn else enum extern false fn for if impl in let loop match mod "
+    "move mut pub ref return self Self static struct super trait true type unsafe use where while"
+).split())
+
+
+def _module_dir(filepath: str) -> str:
+    """Directory holding a module's children: src/net/mod.rs -> src/net, src/net.rs -> src/net."""
+    base, _ = os.path.splitext(filepath.replace("\\", "/"))
+    folder, name = base.rsplit("/", 1) if "/" in base else ("", base)
+    return folder if name in MODULE_ROOTS else base
+
+
+def _use_paths(tree: str) -> list:
+    """Expand one level of braces and drop renames: a::{b, c::D as E} -> [a::b, a::c::D]."""
+    tree = "".join(USE_RENAME.sub("", tree).split())
+    if "{" not in tree:
+        return [tree]
+    prefix, _, rest = tree.partition("{")
+    return [prefix + part for part in rest.rstrip("}").split(",") if part and "{" not in part and "}" not in part]
+
+
+def _use_imports(path: str, module_dir: str) -> list:
+    """
+    crate::a::b::C -> [a/b/C, a/b] (the last segment may be a module or an item);
+    self:: and super:: resolve against the current module. Other crates are skipped.
+    """
+    head, _, rest = path.partition("::")
+    segments = [s for s in rest.split("::") if s and s not in ("*", "self")]
+    if head == "crate":
+        base = ""
+    elif head == "self":
+        base = module_dir
+    elif head == "super":
+        base = os.path.dirname(module_dir)
+        while segments and segments[0] == "super":
+            base, segments = os.path.dirname(base), segments[1:]
+    else:
+        return []
+    if not segments:
+        return []
+    prefix = [base] if base else []
+    full = "/".join(prefix + segments)
+    parent = "/".join(prefix + segments[:-1])
+    return [full, parent] if parent else [full]
+
+
+def scan(content: str, filepath: str, references: bool = True) -> ScanResult:
+    """Single pass over a Rust file. Returns (items, imports, references)."""
+    items, imports, scopes = [], [], []
+    module_dir = _module_dir(filepath)
+    text = "\n" + content
+    line, pos = 0, 0
+    for m in RUST_SCANNER.finditer(text):
+        start = m.start()
+        line += text.count("\n", pos, start + 1)
+        pos = start + 1
+        kind = m.lastgroup
+        if kind == "func" or kind == "type":
+            name = m.group(kind)
+            items.append({"type": "function" if kind == "func" else "class", "name": name, "line": line})
+            scopes.append((name, start, m.end()))
+        elif kind == "mod":
+            imports.append(f"{module_dir}/{m.group('mod')}" if module_dir else m.group("mod"))
+        else:
+            for path in _use_paths(m.group("use")):
+                imports.extend(_use_imports(path, module_dir))
+    return items, imports, scope_references(text, scopes, WORDS, RUST_STOPWORDS) if references else {}
@@ -0,0 +1,257 @@
+"""
+Commit-pinned snapshots of GitHub repos, shared by every codebase endpoint.
+A githubUrl is first resolved to its current commit sha with one conditional
+request (answered 304 while nothing is pushed, which is not rate limited).
+Files fetched at that commit never change, so they are kept with the maps and
+LLM contexts derived from them, keyed by (owner, repo, sha, fetch mode, scope), in a
+memory LRU bounded by SNAPSHOT_CACHE_MB. A manifest of (path, blob sha) pairs
+is also written next to the blob store, so another worker (or a restarted one)
+rebuilds the snapshot from local blobs without downloading anything.
+Concurrent requests for the same snapshot wait for a single build.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from codebase_graph import CodebaseGraph
+from codebase_parser import import_follower
+from disk_cache import key_path, write_atomic
+from github_cache import GITHUB_CACHE_DIR, blob_store
+from github_fetcher import FETCH_MODE, FOLLOW_IMPORTS, iter_repo_files, resolve_commit, resolve_scope
+from map_queries import ENTRY_POINT_NAMES
+
+SNAPSHOT_CACHE_BYTES = int(os.getenv("SNAPSHOT_CACHE_MB", "256")) * 1024 * 1024
+# Rough in-memory cost of graph records, used only to weigh snapshots for eviction
+NODE_BYTES = 400
+EDGE_BYTES = 150
+FILE_BYTES = 200  # per-file dict and path
+# How github_fetcher ranks and follows files, supplied from the analysis side
+RANKING = {"entry_names": ENTRY_POINT_NAMES, "import_follower": import_follower}
+
+
+class Snapshot:
+    """Files of one repo at one commit, plus values derived from them (maps, LLM contexts)."""
+
+    def __init__(self, key: str, commit: str, files: List[Dict[str, Any]], coverage: Dict[str, Any]):
+        self.key = key
+        self.commit = commit
+        self.files = files
+        self.coverage = coverage
+        self.nbytes = sum(len(f.get("content", "")) + FILE_BYTES for f in files)
+        self.on_grow: Optional[Callable[[], None]] = None  # set by the store holding it, to re-check its bound
+        self._derived: Dict[Any, Any] = {}
+        self._lock = threading.RLock()
+
+    def derive(self, name: Any, build: Callable[[], Any]) -> Any:
+        """
+        build() once per snapshot and name; concurrent callers wait for the first.
+        Names must come from a small fixed set, since every value is kept.
+        Graphs are marked shared: copy them before mutating (see /api/codebase-map/update).
+        """
+        with self._lock:
+            grew = name not in self._derived
+            if grew:
+                value = build()
+                if isinstance(value, CodebaseGraph):
+                    value.shared = True
+                    nodes, edges = value.size()
+                    self.nbytes += nodes * NODE_BYTES + edges * EDGE_BYTES
+                self._derived[name] = value
+            value = self._derived[name]
+        if grew and self.on_grow is not None:
+            self.on_grow()
+        return value
+
+
+class SnapshotStore:
+    """Thread-safe LRU of key -> Snapshot bounded by total nbytes, with on-disk manifests (off without a dir)."""
+
+    def __init__(self, max_bytes: int = SNAPSHOT_CACHE_BYTES, disk_dir: Optional[str] = GITHUB_CACHE_DIR,
+                 blobs=blob_store):
+        self.max_bytes = max_bytes
+        self.root = os.path.join(disk_dir, "snapshots") if disk_dir else None
+        self.blobs = blobs
+        self._snapshots: "OrderedDict[str, Snapshot]" = OrderedDict()
+        self._building: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def get(self, key: str) -> Optional[Snapshot]:
+        """Snapshot from memory, or rebuilt from its manifest and local blobs; None if neither has it."""
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                self._snapshots.move_to_end(key)
+                self.hits += 1
+                return snapshot
+        snapshot = self._read_manifest(key)
+        if snapshot is not None:
+            with self._lock:
+                self.hits += 1
+            self._remember(snapshot)
+        return snapshot
+
+    def put(self, snapshot: Snapshot, in_memory: bool = True) -> None:
+        """
+        Keep a snapshot, unless its fetch was incomplete (rate limited or failed files).
+        in_memory=False only writes its manifest: files then need just path and sha,
+        and get() reads the contents back from the blob store.
+        """
+        if snapshot.coverage.get("complete") is False:
+            return
+        if in_memory:
+            self._remember(snapshot)
+        self._write_manifest(snapshot)
+
+    def get_or_build(self, key: str, build: Callable[[], Snapshot]) -> Snapshot:
+        """The cached snapshot, or build() it; concurrent callers for one key share a single build."""
+        snapshot = self.get(key)
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            pending = self._building.get(key)
+            if pending is None:
+                pending = self._building[key] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return pending.result()
+        try:
+            snapshot = build()
+            self.put(snapshot)
+            with self._lock:
+                self.builds += 1
+            pending.set_result(snapshot)
+            return snapshot
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+
+    def evict(self) -> None:
+        """Drop least recently used snapshots until the rest fit in max_bytes (derived graphs grow them)."""
+        with self._lock:
+            total = sum(s.nbytes for s in self._snapshots.values())
+            while total > self.max_bytes and len(self._snapshots) > 1:
+                _, dropped = self._snapshots.popitem(last=False)
+                total -= dropped.nbytes
+
+    def clear(self) -> None:
+        """Drop the in-memory tier and counters (manifests on disk stay)."""
+        with self._lock:
+            self._snapshots.clear()
+            self.hits = self.builds = 0
+
+    def _remember(self, snapshot: Snapshot) -> None:
+        snapshot.on_grow = self.evict
+        with self._lock:
+            self._snapshots[snapshot.key] = snapshot
+            self._snapshots.move_to_end(snapshot.key)
+        self.evict()
+
+    def _write_manifest(self, snapshot: Snapshot) -> None:
+        if not self.root or any(not f.get("sha") for f in snapshot.files):
+            return
+        manifest = {
+            "key": snapshot.key,
+            "commit": snapshot.commit,
+            "files": [[f["path"], f["sha"]] for f in snapshot.files],
+            "coverage": snapshot.coverage,
+        }
+        write_atomic(key_path(self.root, snapshot.key), json.dumps(manifest).encode("utf-8"))
+
+    def _read_manifest(self, key: str) -> Optional[Snapshot]:
+        if not self.root:
+            return None
+        try:
+            with open(key_path(self.root, key), "r", encoding="utf-8") as fh:
+                manifest = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("key") != key:
+            return None
+        files = []
+        for path, sha in manifest.get("files", []):
+            data = self.blobs.get(sha)
+            if data is None:
+                return None  # a blob was pruned; fetch the snapshot again
+            files.append({"path": path, "content": data.decode("utf-8", errors="replace"), "sha": sha})
+        return Snapshot(key, manifest.get("commit"), files, manifest.get("coverage") or {})
+
+
+snapshot_store = SnapshotStore()
+
+
+def _resolve(url: str, token: Optional[str], mode: Optional[str], follow_imports: Optional[bool],
+             options: Dict[str, Any]):
+    """(snapshot key, commit sha) for the requested ref's current commit. Raises ValueError / RuntimeError."""
+    scope = resolve_scope(url, **options)
+    commit = resolve_commit(scope["owner"], scope["repo"], ref=scope["ref"], token=token)
+    follow = FOLLOW_IMPORTS if follow_imports is None else bool(follow_imports)
+    how = json.dumps([mode or FETCH_MODE, follow, scope["path"], sorted(scope["include"]), sorted(scope["exclude"])],
+                     separators=(",", ":"))
+    return f"{scope['owner'].lower()}/{scope['repo'].lower()}@{commit}:{how}", commit
+
+
+def repo_snapshot(url: str, token: str = None, mode: str = None, follow_imports: bool = None,
+                  **options) -> Snapshot:
+    """
+    Snapshot of a GitHub repo at the current commit of its ref (default branch),
+    from the cache or fetched once (concurrent callers share the fetch). options
+    are ref / path / include / exclude (see github_fetcher.resolve_scope).
+    Raises ValueError / RuntimeError like github_fetcher.fetch_repo_files.
+    """
+    key, commit = _resolve(url, token, mode, follow_imports, options)
+
+    def build():
+        coverage = {}
+        files = list(iter_repo_files(url, token=token, mode=mode, coverage=coverage, follow_imports=follow_imports,
+                                     **RANKING, **dict(options, ref=commit)))
+        return Snapshot(key, commit, files, coverage)
+
+    return snapshot_store.get_or_build(key, build)
+
+
+def iter_snapshot_files(url: str, token: str = None, mode: str = None, coverage: dict = None,
+                        follow_imports: bool = None, **options):
+    """
+    Lazy variant for streaming: the cached snapshot's files, or files fetched at
+    the current commit as they arrive, stored as a snapshot once all were read.
+    Only (path, sha) is kept while streaming when there is a disk tier (contents are
+    read back from blobs); without one, contents are kept only while they fit the cache.
+    The commit (and fetch) are checked eagerly, like github_fetcher.iter_repo_files.
+    """
+    coverage = coverage if coverage is not None else {}
+    key, commit = _resolve(url, token, mode, follow_imports, options)
+    snapshot = snapshot_store.get(key)
+    if snapshot is not None:
+        coverage.update(snapshot.coverage)
+        return iter(snapshot.files)
+    files = iter_repo_files(url, token=token, mode=mode, coverage=coverage, follow_imports=follow_imports,
+                            **RANKING, **dict(options, ref=commit))
+
+    def collect():
+        on_disk = snapshot_store.root is not None
+        kept, nbytes = [], 0
+        for f in files:
+            yield f
+            if kept is None:
+                continue
+            nbytes += len(f["content"]) + FILE_BYTES
+            if on_disk:
+                kept.append({"path": f["path"], "sha": f.get("sha")})
+            elif nbytes <= snapshot_store.max_bytes:
+                kept.append(f)
+            else:
+                kept = None  # larger than the whole cache
+        if kept is not None:
+            snapshot_store.put(Snapshot(key, commit, kept, dict(coverage)), in_memory=not on_disk)
+
+    return collect()
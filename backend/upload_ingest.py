@@ -0,0 +1,266 @@
+"""
+Bounded ingestion of project sources: uploaded .zip and .tar.gz archives, and
+directories that already sit on the server.
+
+Uploads are copied in chunks into a spooled temporary file (kept in memory
+while small, on disk beyond ZIP_SPOOL_MEMORY), and members are read one at a
+time, so memory stays flat regardless of archive size. Zip members are filtered
+on their central-directory header before anything is decompressed: directories,
+non-code extensions, oversized files and suspicious compression ratios are
+skipped. Reads are capped as well, since headers can lie. The same per-file and
+total budgets apply to tarballs and server-side directories.
+"""
+import mmap
+import os
+import re
+import tarfile
+import tempfile
+import zipfile
+
+from code_files import BINARY_SNIFF_BYTES, MAX_FILE_SIZE, SKIP_DIRS, glob_regex, is_binary, is_code_path
+
+MB = 1024 * 1024
+ZIP_MAX_UPLOAD_BYTES = int(os.getenv("ZIP_MAX_UPLOAD_MB", "200")) * MB
+ZIP_MAX_TOTAL_BYTES = int(os.getenv("ZIP_MAX_TOTAL_MB", "100")) * MB  # uncompressed code actually read
+ZIP_MAX_RATIO = int(os.getenv("ZIP_MAX_RATIO", "100"))  # uncompressed / compressed, per member
+ZIP_MAX_MEMBERS = int(os.getenv("ZIP_MAX_MEMBERS", "100000"))
+ZIP_SPOOL_MEMORY = 8 * MB
+CHUNK_SIZE = 64 * 1024
+# Server-side directories may only be mapped below these roots (os.pathsep-separated); unset disables them.
+LOCAL_REPO_ROOTS = [os.path.realpath(p) for p in (os.getenv("LOCAL_REPO_ROOTS") or "").split(os.pathsep) if p.strip()]
+TAR_EXTENSIONS = (".tar.gz", ".tgz", ".tar")
+
+
+def spool_upload(stream, limit: int = ZIP_MAX_UPLOAD_BYTES):
+    """Copy a file-like upload into a spooled temp file in chunks. Raises ValueError past `limit` bytes."""
+    spool = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MEMORY)
+    total = 0
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > limit:
+            spool.close()
+            raise ValueError(f"Upload is larger than {limit // MB} MB")
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def _is_code_member(info: zipfile.ZipInfo) -> bool:
+    """Header-only checks: regular code file, not too large, not compressed suspiciously well."""
+    name = info.filename
+    if info.is_dir() or name.startswith("__MACOSX/"):
+        return False
+    if not is_code_path(name) or info.file_size > MAX_FILE_SIZE:
+        return False
+    return info.file_size <= max(1, info.compress_size) * ZIP_MAX_RATIO
+
+
+def _read_member(z: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """Decompress one member, at most MAX_FILE_SIZE bytes. None for binary (NUL byte) or oversized data."""
+    with z.open(info) as fh:
+        first = fh.read(CHUNK_SIZE)
+        if is_binary(first):
+            return None
+        rest = fh.read(MAX_FILE_SIZE + 1 - len(first)) if len(first) == CHUNK_SIZE else b""
+    data = first + rest
+    return data if len(data) <= MAX_FILE_SIZE else None
+
+
+def iter_zip_files(stream):
+    """
+    Spool a zip upload and return an iterator of its code files as {path, content}.
+    Raises ValueError for oversized or corrupt archives up front; the iterator
+    raises ValueError if the code it reads exceeds ZIP_MAX_TOTAL_BYTES, or if
+    every member was skipped.
+    """
+    spool = spool_upload(stream)
+    try:
+        z = zipfile.ZipFile(spool, "r")
+    except (zipfile.BadZipFile, OSError):
+        spool.close()
+        raise ValueError("Invalid zip file")
+    if len(z.filelist) > ZIP_MAX_MEMBERS:
+        z.close()
+        spool.close()
+        raise ValueError(f"Zip has more than {ZIP_MAX_MEMBERS} entries")
+
+    def members():
+        total = found = 0
+        with spool, z:
+            for info in z.infolist():
+                if not _is_code_member(info):
+                    continue
+                try:
+                    data = _read_member(z, info)
+                except (zipfile.BadZipFile, OSError, RuntimeError, NotImplementedError, EOFError):
+                    continue  # encrypted, unsupported compression or corrupt member
+                if data is None:
+                    continue
+                total += len(data)
+                if total > ZIP_MAX_TOTAL_BYTES:
+                    raise ValueError(f"Zip contains more than {ZIP_MAX_TOTAL_BYTES // MB} MB of code")
+                found += 1
+                yield {"path": info.filename, "content": data.decode("utf-8", errors="replace")}
+        if not found:
+            raise ValueError("No code files found in archive")
+    return members()
+
+
+def iter_tar_files(stream):
+    """
+    Spool a .tar / .tar.gz upload and return an iterator of its code files as {path, content}.
+    The archive is read in stream mode, one member at a time. Since gzip hides
+    per-member sizes, the ratio budget applies to the whole archive: the iterator
+    raises ValueError once the expanded tar exceeds ZIP_MAX_RATIO times the upload,
+    the code read exceeds ZIP_MAX_TOTAL_BYTES, or every member was skipped.
+    """
+    spool = spool_upload(stream)
+    compressed = max(1, spool.seek(0, os.SEEK_END))
+    spool.seek(0)
+    try:
+        tar = tarfile.open(fileobj=spool, mode="r|*")
+    except (tarfile.TarError, OSError):
+        spool.close()
+        raise ValueError("Invalid tar archive")
+
+    def members():
+        total = expanded = found = 0
+        with spool, tar:
+            try:
+                for member in tar:
+                    expanded += member.size
+                    if expanded > compressed * ZIP_MAX_RATIO:
+                        raise ValueError("Archive expands too much; refusing to unpack it")
+                    if not member.isreg() or member.size > MAX_FILE_SIZE or not is_code_path(member.name):
+                        continue
+                    data = tar.extractfile(member).read(MAX_FILE_SIZE + 1)
+                    if is_binary(data) or len(data) > MAX_FILE_SIZE:
+                        continue
+                    total += len(data)
+                    if total > ZIP_MAX_TOTAL_BYTES:
+                        raise ValueError(f"Archive contains more than {ZIP_MAX_TOTAL_BYTES // MB} MB of code")
+                    path = member.name[2:] if member.name.startswith("./") else member.name
+                    found += 1
+                    yield {"path": path, "content": data.decode("utf-8", errors="replace")}
+            except (tarfile.TarError, EOFError, OSError) as e:
+                raise ValueError(f"Invalid tar archive: {e}")
+        if not found:
+            raise ValueError("No code files found in archive")
+    return members()
+
+
+def resolve_local_path(path: str) -> str:
+    """Real path of a server-side directory inside LOCAL_REPO_ROOTS. Raises ValueError otherwise."""
+    if not LOCAL_REPO_ROOTS:
+        raise ValueError("Mapping server-side directories is disabled (set LOCAL_REPO_ROOTS)")
+    real = os.path.realpath(path)
+    if not any(os.path.commonpath([real, root]) == root for root in LOCAL_REPO_ROOTS):
+        raise ValueError("localPath must be inside one of LOCAL_REPO_ROOTS")
+    if not os.path.isdir(real):
+        raise ValueError(f"Not a directory: {path}")
+    return real
+
+
+def parse_gitignore(text: str, base: str = "") -> list:
+    """
+    .gitignore lines -> rules (base, regex, negated, dir_only). Patterns with a
+    slash before their last character are anchored to `base`; others match at any depth.
+    """
+    rules = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negated = line.startswith("!")
+        line = line[1:] if negated else line
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        try:
+            regex = re.compile("^" + glob_regex(line.lstrip("/"), any_depth="/" not in line) + "$")
+        except re.error:
+            continue  # git skips patterns it cannot parse
+        rules.append((base, regex, negated, dir_only))
+    return rules
+
+
+def is_ignored(rules: list, rel_path: str, is_dir: bool) -> bool:
+    """Last matching rule wins, as in git."""
+    for base, regex, negated, dir_only in reversed(rules):
+        if dir_only and not is_dir:
+            continue
+        if base:
+            if not rel_path.startswith(base + "/"):
+                continue
+            sub = rel_path[len(base) + 1:]
+        else:
+            sub = rel_path
+        if regex.match(sub):
+            return not negated
+    return False
+
+
+def _read_mapped(path: str, size: int):
+    """File text via mmap (no intermediate read buffer). None for binary files."""
+    if size == 0:
+        return ""
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm.find(b"\0", 0, BINARY_SNIFF_BYTES) != -1:
+            return None
+        return str(mm, "utf-8", errors="replace")
+
+
+def iter_directory_files(root: str):
+    """
+    Walk a server-side directory with os.scandir and yield its code files as
+    {path, content} (paths relative to root, sorted per directory). Honours
+    .gitignore files at every level plus SKIP_DIRS; symlinks are not followed.
+    Raises ValueError up front for paths outside LOCAL_REPO_ROOTS; the iterator
+    raises ValueError if the code read exceeds ZIP_MAX_TOTAL_BYTES.
+    """
+    return _walk_directory(resolve_local_path(root))
+
+
+def _walk_directory(real: str):
+    total = 0
+    stack = [(real, "", [])]
+    while stack:
+        abs_dir, rel_dir, rules = stack.pop()
+        try:
+            with os.scandir(abs_dir) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        ignore = next((e for e in entries if e.name == ".gitignore" and e.is_file(follow_symlinks=False)), None)
+        if ignore is not None:
+            with open(ignore.path, "r", encoding="utf-8", errors="replace") as fh:
+                rules = rules + parse_gitignore(fh.read(), rel_dir)
+        subdirs = []
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_symlink():
+                continue
+            if entry.is_dir():
+                if entry.name.lower() not in SKIP_DIRS and not is_ignored(rules, rel, True):
+                    subdirs.append((entry.path, rel, rules))
+                continue
+            if not is_code_path(entry.name) or is_ignored(rules, rel, False):
+                continue
+            try:
+                size = entry.stat().st_size
+                if size > MAX_FILE_SIZE:
+                    continue
+                content = _read_mapped(entry.path, size)
+            except (OSError, ValueError):
+                continue
+            if content is None:
+                continue
+            total += size
+            if total > ZIP_MAX_TOTAL_BYTES:
+                raise ValueError(f"Directory contains more than {ZIP_MAX_TOTAL_BYTES // MB} MB of code")
+            yield {"path": rel, "content": content}
+        stack.extend(reversed(subdirs))